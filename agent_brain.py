@@ -5,17 +5,27 @@ agent_brain.py — 브릿지 에이전트 (v3.4)
 - 이미지 기반 버튼 클릭 지원 (icon_*.png)
 - /auto: 실시간 자동 아이콘 감시 & 클릭
 """
-import os, json, time, threading, tempfile, ctypes, requests
-import pyautogui, pyperclip, win32gui, win32con
+import os, time, threading, ctypes, requests
+import pyautogui, pyperclip
 import numpy as np
 from PIL import Image
 from io import BytesIO
 from dotenv import load_dotenv
-
-try:
-    from scipy import ndimage
-except ImportError:
-    ndimage = None
+from mailbox_store import claim, ack, doorbell
+import brain_rpc
+from command_scheduler import CommandScheduler, SingleFlight
+from command_protocol import HANDLERS, command_handler, decode, INVALID
+from window_tracker import tracker as window_tracker, chat_panel_region
+from capture import FrameGrabber, screenshot
+from frame_ring import FrameRing
+from icon_templates import registry as icon_registry
+import color_buttons
+from change_detector import ChangeDetector, overlaps, bounding
+from button_tracker import ButtonTracker
+from ocr_worker import worker as ocr_worker, OCR_TIMEOUT
+from ocr_cache import IncrementalOcr
+from ocr_profile import AdaptiveOcr
+from ocr_text import rules as ocr_rules, format_ocr
 
 # 🛠️ 디버그 설정: 클릭 지점을 사진으로 확인하고 싶을 때만 True로 변경하세요.
 DEBUG_IMAGE = False
@@ -31,17 +41,6 @@ load_dotenv()
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 CHAT_ID = os.getenv("TELEGRAM_CHAT_ID", "0")
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-MAILBOX_PATH = os.path.join(BASE_DIR, "mailbox.json")
-
-def read_mailbox():
-    try:
-        with open(MAILBOX_PATH, "r", encoding="utf-8") as f: return json.load(f)
-    except: return {"inbound": [], "outbound": [], "approval_request": None}
-
-def write_mailbox(box):
-    fd, tmp = tempfile.mkstemp(dir=BASE_DIR, suffix=".tmp")
-    with os.fdopen(fd, "w", encoding="utf-8") as f: json.dump(box, f, ensure_ascii=False, indent=2)
-    os.replace(tmp, MAILBOX_PATH)
 
 def push_msg(msg: str):
     if not BOT_TOKEN: return
@@ -59,51 +58,40 @@ def push_img(img_obj, caption=""):
                       files={'photo': buf}, data={'chat_id': int(CHAT_ID), 'caption': caption}, timeout=10)
     except: pass
 
-def get_vscode_window_rect():
-    found = []
-    win32gui.EnumWindows(lambda hwnd, res: res.append((hwnd, win32gui.GetWindowText(hwnd))) if win32gui.IsWindowVisible(hwnd) else None, found)
-    target = None
-    for hwnd, title in found:
-        class_name = win32gui.GetClassName(hwnd)
-        if class_name == "Chrome_WidgetWin_1" and any(x in title for x in ["Visual Studio Code", "Antigravity", "OpenClaw"]):
-            if not any(title.endswith(x) for x in [" - Chrome", " - Microsoft Edge"]):
-                target = (hwnd, title)
-                break
-    if not target: return None, None, None
-    hwnd, title = target
-    placement = win32gui.GetWindowPlacement(hwnd)
-    if placement[1] == win32con.SW_SHOWMINIMIZED: win32gui.ShowWindow(hwnd, win32con.SW_RESTORE)
-    else: win32gui.ShowWindow(hwnd, win32con.SW_SHOW)
-    try: win32gui.SetForegroundWindow(hwnd)
-    except: pass
-    time.sleep(0.5)
-    rect = win32gui.GetWindowRect(hwnd)
-    return hwnd, rect, title
+def get_vscode_window_rect(focus: bool = True, restore: bool = False):
+    """캐시된 VS Code 창 (hwnd, rect, title). 포커스는 전면 창이 아닐 때만 가져옴 (window_tracker)
+    restore: focus=False 일 때 최소화된 창을 포커스 없이 복원"""
+    return window_tracker.get(focus=focus, restore=restore)
 
 # ── 이미지 기반 버튼 클릭 ──────────────────────────────────────────────────────
 
-ICON_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".instruction")
+_icon_grabber = None
 
-def click_icon(icon_name: str, confidence: float = 0.8, timeout: float = 0.0) -> bool:
+def click_icon(icon_name: str, confidence: float = 0.8, timeout: float = 0.0, cancel=None) -> bool:
     """화면에서 아이콘 이미지를 찾아 클릭합니다.
-    timeout > 0 이면 해당 초만큼 반복 탐색합니다.
+    timeout > 0 이면 해당 초만큼 반복 탐색합니다. cancel() 이 True 가 되면 즉시 중단합니다.
     """
-    icon_path = os.path.join(ICON_DIR, f"icon_{icon_name}.png")
-    if not os.path.exists(icon_path):
+    global _icon_grabber
+    if icon_registry.get(icon_name) is None:
         push_msg(f"⚠️ 아이콘 파일 없음: icon_{icon_name}.png")
         return False
+    if _icon_grabber is None: _icon_grabber = FrameGrabber()
 
     deadline = time.time() + max(timeout, 0)
     while True:
         try:
-            pos = pyautogui.locateCenterOnScreen(icon_path, confidence=confidence)
-            if pos:
-                pyautogui.moveTo(pos, duration=0.2)
+            # 미리 로드된 템플릿으로 전체 화면 프레임에서 탐색 (시도마다 PNG 를 다시 읽지 않음)
+            frame = _icon_grabber.grab(_icon_grabber.source.bounds())
+            # 창 기준으로 마지막 위치를 기억 → 다음 시도는 그 주변부터
+            _, anchor, _ = window_tracker.get(focus=False)
+            hit = icon_registry.match(frame, [icon_name], confidence=confidence, anchor=anchor).get(icon_name)
+            if hit:
+                pyautogui.moveTo(hit.center, duration=0.2)
                 pyautogui.click()
                 return True
-        except Exception:
-            pass  # opencv 미설치 등 — 아래서 별도 안내
-        if time.time() >= deadline:
+        except Exception as e:
+            print(f"[!] 아이콘 탐색 실패 ({icon_name}): {e}")
+        if time.time() >= deadline or (cancel and cancel()):
             break
         time.sleep(0.5)
     return False
@@ -149,101 +137,94 @@ def type_into_chatwindow(text: str) -> bool:
     return True
 
 
-def execute_brain_task(command: str) -> bool:
+# ── 명령 핸들러 (command_protocol 레지스트리) ──────────────────────────────────
+
+@command_handler("AUTO_WATCH_ON", needs_window=False)
+def cmd_auto_watch_on(args, rect):
     global _auto_watch_active
+    _auto_watch_active = True
+    push_msg("🤖 Auto Watch ON: accept_all / proceed / run / scrolldown 감시 시작!")
+    return True
+
+@command_handler("AUTO_WATCH_OFF", needs_window=False)
+def cmd_auto_watch_off(args, rect):
+    global _auto_watch_active
+    _auto_watch_active = False
+    push_msg("⏹️ Auto Watch OFF: 자동 감시 중단")
+    return True
+
+@command_handler("SCROLL")
+def cmd_scroll(args, rect):
+    l, t, r, b = rect
+    w, h = r - l, b - t
+    steps = int(args.get("steps", 1))   # 스케줄러가 병합한 연속 스크롤 횟수
+    scroll_x = int(l + w * 0.85)
+    scroll_y = int(t + h * 0.5)
+    pyautogui.moveTo(scroll_x, scroll_y)
+    amount = 800 if args.get("direction") == "UP" else -800
+    pyautogui.scroll(amount * steps)
+    return True
 
-    # 0. VS Code 없이도 처리 가능한 명령어 (Auto Watch 등)
-    if command.startswith("__COMMAND:"):
-        clean_command = command[:-2] if command.endswith("__") else command
-        parts = clean_command.split(":")
-        cmd_type = parts[1]
+@command_handler("CLICK")
+def cmd_click(args, rect):
+    pyautogui.moveTo(int(args["x"]), int(args["y"]), duration=0.5)
+    pyautogui.click()
+    return True
 
-        if cmd_type == "AUTO_WATCH_ON":
-            _auto_watch_active = True
-            push_msg("🤖 Auto Watch ON: accept_all / proceed / run / scrolldown 감시 시작!")
-            return True
+@command_handler("CLICK_RUN_ONCE")
+def cmd_click_run_once(args, rect):
+    l, t, r, b = rect
+    btn_x = int(l + (r - l) * 0.78)
+    btn_y = int(t + (b - t) * 0.88)
+    pyautogui.moveTo(btn_x, btn_y, duration=0.5)
+    pyautogui.click()
+    return True
 
-        elif cmd_type == "AUTO_WATCH_OFF":
-            _auto_watch_active = False
-            push_msg("⏹️ Auto Watch OFF: 자동 감시 중단")
-            return True
+@command_handler("CLICK_RUN_ALL")
+def cmd_click_run_all(args, rect):
+    l, t, r, b = rect
+    btn_x = int(l + (r - l) * 0.85)
+    btn_y = int(t + (b - t) * 0.88)
+    pyautogui.moveTo(btn_x, btn_y, duration=0.5)
+    pyautogui.click()
+    return True
 
-    # 1. VS Code 창 필요한 명령어
-    hwnd, rect, title = get_vscode_window_rect()
-    if not rect:
-        push_msg("❌ VS Code 창을 찾을 수 없습니다.")
+@command_handler("ICON")
+def cmd_icon(args, rect):
+    icon_name = args.get("name", "")
+    if not icon_name:
+        push_msg("❌ ICON 명령에 아이콘 이름이 없습니다.")
+        return False
+    # 5초 동안 버튼이 나타날 때까지 반복 탐색 (신뢰성 상승)
+    # 긴급 명령(stop 등)이 들어오면 탐색을 중단하고 양보
+    found = click_icon(icon_name, confidence=0.8, timeout=5.0, cancel=_preempted)
+    if not found and not _preempted():
+        push_msg(f"⚠️ 5초 동안 기다렸지만 '{icon_name}' 버튼을 찾지 못했습니다.")
+    return found
+
+@command_handler("ICON_TYPE", needs_window=False)
+def cmd_icon_type(args, rect):
+    text = args.get("text", "")
+    if not text:
+        push_msg("❌ ICON_TYPE 명령에 텍스트가 없습니다.")
         return False
+    push_msg(f"🔍 입력 타겟: '{text[:40]}'")
+    return type_into_chatwindow(text)
 
+@command_handler("TEXT")
+def cmd_text(args, rect):
+    """일반 텍스트 입력 처리"""
+    text = args.get("text", "")
     l, t, r, b = rect
     w, h = r - l, b - t
 
-    # 2. 시스템 명령어 처리 (매크로)
-    if command.startswith("__COMMAND:"):
-        clean_command = command[:-2] if command.endswith("__") else command
-        parts = clean_command.split(":")
-        cmd_type = parts[1]
-        
-        if cmd_type == "SCROLL":
-            direction = parts[2]
-            scroll_x = int(l + w * 0.85)
-            scroll_y = int(t + h * 0.5)
-            pyautogui.moveTo(scroll_x, scroll_y)
-            amount = 800 if direction == "UP" else -800
-            pyautogui.scroll(amount)
-            return True
-        
-        elif cmd_type == "CLICK":
-            target_x, target_y = int(parts[2]), int(parts[3])
-            pyautogui.moveTo(target_x, target_y, duration=0.5)
-            pyautogui.click()
-            return True
-
-        elif cmd_type == "CLICK_RUN_ONCE":
-            btn_x = int(l + w * 0.78) 
-            btn_y = int(t + h * 0.88)
-            pyautogui.moveTo(btn_x, btn_y, duration=0.5)
-            pyautogui.click()
-            return True
-
-        elif cmd_type == "CLICK_RUN_ALL":
-            btn_x = int(l + w * 0.85) 
-            btn_y = int(t + h * 0.88)
-            pyautogui.moveTo(btn_x, btn_y, duration=0.5)
-            pyautogui.click()
-            return True
-
-        elif cmd_type == "ICON":
-            icon_name = parts[2] if len(parts) > 2 else ""
-            if not icon_name:
-                push_msg("❌ ICON 명령에 아이콘 이름이 없습니다.")
-                return False
-            # 5초 동안 버튼이 나타날 때까지 반복 탐색 (신뢰성 상승)
-            found = click_icon(icon_name, confidence=0.8, timeout=5.0)
-            if not found:
-                push_msg(f"⚠️ 5초 동안 기다렸지만 '{icon_name}' 버튼을 찾지 못했습니다.")
-            return found
-
-        elif cmd_type == "ICON_TYPE":
-            raw = ":".join(parts[2:]) if len(parts) > 2 else ""
-            text = raw[:-2] if raw.endswith("__") else raw
-            if not text:
-                push_msg("❌ ICON_TYPE 명령에 텍스트가 없습니다.")
-                return False
-            push_msg(f"🔍 입력 타겟: '{text[:40]}'")
-            return type_into_chatwindow(text)
-
-    # 2. 일반 텍스트 입력 처리
-    text = command
-    if text.startswith("[📱MOBILE]"):
-        text = text.replace("[📱MOBILE]", "").strip()
-
     # 📌 125% 배율 환경의 채팅 입력창 좌표
     click_x = int(l + w * 0.88) 
     click_y = int(t + h * 0.927)
 
     if DEBUG_IMAGE:
         try:
-            shot = pyautogui.screenshot(region=(click_x-100, click_y-100, 200, 200))
+            shot = screenshot(region=(click_x-100, click_y-100, 200, 200))
             push_img(shot, f"📊 클릭 위치 디버그 ({click_x}, {click_y})")
         except: pass
 
@@ -269,18 +250,48 @@ def execute_brain_task(command: str) -> bool:
     
     return True
 
+def execute_brain_task(command) -> bool:
+    """봉투/구버전 문자열/텍스트를 디코드해 레지스트리 핸들러로 디스패치"""
+    cmd = decode(command)
+    if cmd.type == INVALID:   # 해석 불가 명령은 알리고 버림 (호출 측에서 ack → 큐가 막히지 않음)
+        print(f"[!] 해석할 수 없는 명령 무시: {cmd.args['raw']} ({cmd.args['error']})")
+        push_msg(f"❌ 해석할 수 없는 명령을 무시했습니다: {cmd.args['raw']}")
+        return False
+    entry = HANDLERS.get(cmd.type)
+    if entry is None:
+        push_msg(f"❌ 알 수 없는 명령: {cmd.type}")
+        return False
+    handler, needs_window = entry
+
+    rect = None
+    if needs_window:
+        hwnd, rect, title = get_vscode_window_rect()
+        if not rect:
+            push_msg("❌ VS Code 창을 찾을 수 없습니다.")
+            return False
+    return handler(cmd.args, rect)
+
+# mailbox 명령 실행을 직렬화 (마우스/키보드를 동시에 잡지 않도록)
+_action_lock = threading.Lock()
+_scheduler = None
+
+def _preempted() -> bool:
+    return _scheduler is not None and _scheduler.preempted()
+
+def _run_task(command) -> bool:
+    with _action_lock: return execute_brain_task(command)
+
 def inbound_loop():
+    global _scheduler
     print("🚀 [Inbound Thread] v3.4 시작")
+    # 긴급 명령 우선 + 연속 스크롤/중복 클릭 병합. 실행이 끝난 뒤에 ack → 도중에 죽으면 재시작 후 다시 실행
+    _scheduler = CommandScheduler(lambda: claim("inbound"), lambda token: ack("inbound", token), _run_task)
+    bell = doorbell("inbound")
     while True:
         try:
-            box = read_mailbox()
-            tasks = box.get("inbound", [])
-            if tasks:
-                box["inbound"] = []
-                write_mailbox(box)
-                for task in tasks: execute_brain_task(task)
+            _scheduler.run_once()
         except Exception as e: print(f"Error: {e}")
-        time.sleep(1)
+        bell.wait(1.0)   # 적재 즉시 깨어남 (초인종 실패 시 1초 폴링)
 
 
 # ── Auto Watcher ─────────────────────────────────────────────────────────────────
@@ -298,149 +309,102 @@ AUTO_ICONS = [
 ]
 
 def find_color_buttons(img_pil):
-    """auto_approver.py에서 가져온 색상 기반 버튼 감지 로직"""
-    if ndimage is None: return []
-    try:
-        img = np.array(img_pil)
-        R, G, B = img[:, :, 0], img[:, :, 1], img[:, :, 2]
-        mask_blue = (B > 130) & (B > R * 1.5) & (B > G * 1.1)
-        mask_green = (G > 130) & (G > R * 1.2)
-        mask_combined = mask_blue | mask_green
-        labeled, _ = ndimage.label(mask_combined)
-        objects = ndimage.find_objects(labeled)
-        buttons = []
-        for i, slices in enumerate(objects):
-            if slices is None: continue
-            sy, sx = slices
-            h, w = sy.stop - sy.start, sx.stop - sx.start
-            area = np.sum(labeled[slices] == (i + 1))
-            if w < 40 or h < 20 or w > 350 or h > 80: continue
-            if area < 350 or (w/h) < 1.1 or (w/h) > 7.0: continue
-            # Solidity 체크: 사각형 면적 대비 실제 색상이 60% 이상 채워져야 버튼으로 인정
-            if area / (w * h) < 0.60: continue
-            buttons.append({"x": sx.start + w // 2, "y": sy.start + h // 2})
-        return buttons
+    """색상 기반 승인 버튼 감지 (color_buttons 공용 감지기, brain 프로필: 채움률 0.60)"""
+    try: return color_buttons.find_buttons(img_pil, "brain")
     except Exception: return []
 
-_ocr_reader = None
-_ocr_lock = threading.Lock()
-
-# 무시할 UI 텍스트 목록 (블랙리스트)
-OCR_BLACKLIST = [
-    "0 Files With Changes", "Review Changes", "Ask anything", "mention", 
-    "workflows", "Fast", "Gemini 3 Flash", "Screen Reader Optimized", 
-    "Antigravity - Settings", "Usage", "Thought for", "Open Agent Manager",
-    "Running background command", "Relocate", "Cancel", "Good", "Bad", "Always run"
-]
+# 교정표 / 무시할 UI 텍스트 목록(블랙리스트)은 ocr_corrections.json — 한 번 컴파일해 한 번의 훑기로 적용 (ocr_text)
+# 리포트 조립(format_ocr)도 ocr_text — 화면 없이 ocr_tuner 벤치에서 같은 후처리를 쓰도록
+OCR_BLACKLIST = ocr_rules.current().blacklist
 
 def clean_ocr_text(text):
-    """OCR 엔진이 자주 틀리는 한국어/영어 패턴 지능형 교정 (데이터 기반)"""
-    corrections = {
-        "I니다": "합니다", "습I니다": "습니다", "I니": "하니", "I다": "하다",
-        "인스템스": "인스턴스", "붓이": "봇이", "리모건": "리모컨", "캠처": "캡처",
-        "전승": "전송", "kil": "kill", "인스템": "인스턴", "충들": "충돌",
-        "성올": "성을", "중은": "좋은", "활성화면": "할 수 있게", "루프과부": "루프 과부",
-        "하서도": "하셔도", "I니다!": "합니다!", "I니다.": "합니다.", "I니다?": "합니다?",
-        "시I": "사용자", "시의": "사용자의", "입에서": "앱에서", "젊습니다": "졌습니다",
-        "나p": "up", "로그록": "로그를", "리포트록": "리포트가", "Antigrav": "Antigravity",
-        "Objec": "Object", "Intjg": "Antig", "lntegration": "Integration"
-    }
-    for wrong, right in corrections.items():
-        text = text.replace(wrong, right)
-    return text
+    """OCR 엔진이 자주 틀리는 한국어/영어 패턴 지능형 교정 (데이터 기반, 가장 긴 패턴 우선)"""
+    return ocr_rules.correct(text)
+
+# 줄 해시 캐시 — 이전 스냅샷에서 인식한 줄은 재사용하고 새/변경 줄만 워커로 (튜닝 결과(ocr_tuner.py)에 따라 2.0배 확대)
+_incremental_ocr = IncrementalOcr(ocr_worker, scale=2.0)
+# 프로필 선택 — 수동 /ocr 은 accurate, 자동 알림은 예산(OCR_AUTO_BUDGET_MS) 안에 끝나는 프로필
+_adaptive_ocr = AdaptiveOcr(_incremental_ocr)
+
+def submit_ocr(img_pil, key=None, profile="accurate"):
+    """OCR 작업 제출 → 리포트 텍스트 Future (fut.profile 에 사용한 프로필). key 가 같은 이전 작업이 아직 대기 중이면 취소됨
+    profile: "fast" / "balanced" / "accurate", "auto" 면 지연 시간 예산으로 선택"""
+    return _adaptive_ocr.submit(img_pil.convert("RGB"), key=key, then=format_ocr,
+                                profile=None if profile == "auto" else profile)
 
 def get_local_ocr(img_pil):
-    """2.0x 정밀 스케일링 + 지능형 교정 기반의 최적화된 OCR"""
-    global _ocr_reader
+    """OCR 워커 결과를 기다려 반환 (RPC 스레드 등 기다려도 되는 곳에서만 사용)"""
     try:
-        import easyocr
-        with _ocr_lock:
-            if _ocr_reader is None:
-                _ocr_reader = easyocr.Reader(['ko', 'en'])
-        
-        # 튜닝 결과(ocr_tuner.py)에 따라 2.0배 확대가 가장 신뢰도가 높음
-        w, h = img_pil.size
-        img_resized = img_pil.resize((int(w * 2.0), int(h * 2.0)), Image.Resampling.LANCZOS)
-        img_np = np.array(img_resized.convert('L'))
-        
-        # OCR 판독
-        results = _ocr_reader.readtext(img_np, detail=1, paragraph=False)
-        
-        if not results: return ""
-        
-        # 유효한 텍스트 필터링
-        valid_blocks = []
-        for (bbox, text, conf) in results:
-            text = text.strip()
-            if len(text) < 1 or conf < 0.20: continue
-            
-            if any(bl.lower() in text.lower() for bl in OCR_BLACKLIST): continue
-            
-            y_top = bbox[0][1]
-            x_left = bbox[0][0]
-            valid_blocks.append({'y': y_top, 'x': x_left, 'text': text})
-            
-        if not valid_blocks: return ""
-        
-        # 스마트 문장 병합 (2.0배 확대에 맞춰 임계값 30px로 상향)
-        valid_blocks.sort(key=lambda b: b['y'])
-        
-        lines = []
-        if valid_blocks:
-            current_line = valid_blocks[0]['text']
-            last_y = valid_blocks[0]['y']
-            threshold = 30
-            
-            for i in range(1, len(valid_blocks)):
-                block = valid_blocks[i]
-                if block['y'] - last_y > threshold: 
-                    lines.append(current_line)
-                    current_line = block['text']
-                else:
-                    current_line += " " + block['text']
-                last_y = block['y']
-            lines.append(current_line)
-        
-        full_text = "\n".join(lines)
-        corrected_text = clean_ocr_text(full_text)
-        
-        return f"📖 **Full Text OCR 전문 (AI 교정):**\n\n{corrected_text.strip()[:2000]}" 
+        return submit_ocr(img_pil).result(OCR_TIMEOUT)
     except Exception as e:
         return f"⚠️ OCR 오류 발생: {str(e)}"
 
 get_gemini_ocr = get_local_ocr 
 
-def send_chat_snapshot(caption="📊 [Auto] 변화 감지", include_ocr=True):
-    """채팅 본문만 정밀 캡처 + 리모컨 인라인 버튼 전송 + 진단 정보 제공"""
-    hwnd, rect, _ = get_vscode_window_rect()
-    if not rect: return None
-    l, t, r, b = rect
-    w, h = r - l, b - t
-    
-    # 🎯 이미지 캡처 영역 정밀 조절
-    # 1. 좌측 여백 건너뛰기: 오른쪽 35% 영역 중에서도 100px 더 오른쪽에서 시작 (사이드바/라인넘버 제거)
-    chat_x = int(l + w * 0.65) + 100
-    chat_w = int(w * 0.35) - 100
-    
-    # 2. 상하단 헤더/푸터 건너뛰기
-    chat_y = t + 65 # 헤더 약 65px 무시
-    chat_h = h - 65 - 200 # 하단 입력창/푸터 약 200px 무시 (더 강화)
-    
-    if chat_w <= 0 or chat_h <= 0: return
+def capture_chat_panel(frame=None):
+    """채팅 본문 캡처 → (PIL 이미지, (x, y, w, h)) / 실패 시 (None, None)
+    frame 을 주면 새로 캡처하지 않고 그 프레임에서 잘라냄 (이때는 포커스를 가져오지 않음 — 감시 루프용)"""
+    hwnd, rect, _ = get_vscode_window_rect(focus=frame is None)
+    if not rect: return None, None
+    region = chat_panel_region(rect)
+    if region[2] <= 0 or region[3] <= 0: return None, None
+
+    if frame is not None and frame.clip(region) == region:
+        shot = frame.image(region)
+    else:
+        shot = screenshot(region=region)
+
+    # [DEBUG 전 전용] 로컬에 캡처본 저장하여 확인 가능케 함
+    debug_dir = os.path.join(os.getcwd(), ".debug")
+    os.makedirs(debug_dir, exist_ok=True)
+    shot.save(os.path.join(debug_dir, "last_capture.png"))
+    return shot, region
+
+def _send_ocr_report(future):
+    """OCR 워커 Future 완료 시 리포트 전송 (Telegram 요청은 별도 스레드에서)"""
+    if future.cancelled():
+        print("[*] OCR skipped (superseded by a newer snapshot).")
+        return
+    try: ocr_text = future.result()
+    except Exception as e: ocr_text = f"⚠️ OCR 오류 발생: {str(e)}"
+
+    def send():
+        try: deliver()
+        except Exception as e: print(f"[!] OCR report delivery failed: {e}")
+
+    def deliver():
+        if ocr_text and len(ocr_text.strip()) > 0:
+            print(f"[*] Sending OCR report ({len(ocr_text)} chars)...")
+            # MarkdownV2 대신 일반 Markdown을 쓰되, 특수문자 충돌 방지를 위해 실패 시 일반 텍스트로 재시도
+            msg_res = requests.post(f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage",
+                        data={
+                            'chat_id': int(CHAT_ID),
+                            'text': ocr_text,
+                            'parse_mode': 'Markdown'
+                        }, timeout=15)
+            
+            if msg_res.status_code != 200:
+                print(f"[!] Markdown OCR delivery failed ({msg_res.status_code}), retrying as plain text...")
+                requests.post(f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage",
+                            data={
+                                'chat_id': int(CHAT_ID),
+                                'text': ocr_text
+                            }, timeout=15)
+        else:
+            print("[!] OCR text is empty, skipping message.")
 
+    threading.Thread(target=send, daemon=True).start()
+
+def send_chat_snapshot(caption="📊 [Auto] 변화 감지", include_ocr=True, frame=None, ocr_profile="accurate"):
+    """채팅 본문만 정밀 캡처 + 리모컨 인라인 버튼 전송 + 진단 정보 제공
+    OCR 은 워커에 맡기고 기다리지 않음 — 리포트는 완료되는 대로 따로 전송 (감시 루프를 막지 않음)"""
     try:
-        shot = pyautogui.screenshot(region=(chat_x, chat_y, chat_w, chat_h))
-        
-        # [DEBUG 전 전용] 로컬에 캡처본 저장하여 확인 가능케 함
-        debug_dir = os.path.join(os.getcwd(), ".debug")
-        os.makedirs(debug_dir, exist_ok=True)
-        debug_path = os.path.join(debug_dir, "last_capture.png")
-        shot.save(debug_path)
-
-        # OCR 처리 여부 선택
-        ocr_text = None
-        if include_ocr:
-            ocr_text = get_gemini_ocr(shot)
+        shot, region = capture_chat_panel(frame)
+        if shot is None: return None
+        chat_x, chat_y, chat_w, chat_h = region
+
+        # OCR 처리 여부 선택 (새 스냅샷이 오면 아직 시작 안 한 이전 스냅샷 OCR 은 취소)
+        ocr_future = submit_ocr(shot, key="snapshot", profile=ocr_profile) if include_ocr else None
         
         # 디버그 정보 추가 (캡처 영역 좌표)
         debug_info = ""
@@ -463,26 +427,9 @@ def send_chat_snapshot(caption="📊 [Auto] 변화 감지", include_ocr=True):
                       }, 
                       timeout=15)
         
-        # 2. OCR 리포트 별도 전송 (요청 시에만)
-        if include_ocr and ocr_text and len(ocr_text.strip()) > 0:
-            print(f"[*] Sending OCR report ({len(ocr_text)} chars)...")
-            # MarkdownV2 대신 일반 Markdown을 쓰되, 특수문자 충돌 방지를 위해 실패 시 일반 텍스트로 재시도
-            msg_res = requests.post(f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage",
-                        data={
-                            'chat_id': int(CHAT_ID),
-                            'text': ocr_text,
-                            'parse_mode': 'Markdown'
-                        }, timeout=15)
-            
-            if msg_res.status_code != 200:
-                print(f"[!] Markdown OCR delivery failed ({msg_res.status_code}), retrying as plain text...")
-                requests.post(f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage",
-                            data={
-                                'chat_id': int(CHAT_ID),
-                                'text': ocr_text
-                            }, timeout=15)
-        else:
-            print("[!] OCR text is empty, skipping message.")
+        # 2. OCR 리포트 별도 전송 (요청 시에만, 완료되는 대로)
+        if ocr_future is not None:
+            ocr_future.add_done_callback(_send_ocr_report)
 
         return shot
     except Exception as e: 
@@ -491,18 +438,38 @@ def send_chat_snapshot(caption="📊 [Auto] 변화 감지", include_ocr=True):
         traceback.print_exc()
         return None
 
+_frame_ring = None
+
+def open_frame_ring():
+    """감시 루프가 프레임을 게시할 링 버퍼 (봇의 /screenshot, /ss, /debug 용). 만들 수 없으면 None"""
+    global _frame_ring
+    if _frame_ring is None:
+        try: _frame_ring = FrameRing(create=True)
+        except (OSError, ValueError) as e: print(f"[!] frame ring 생성 실패 (링 없이 계속): {e}")
+    return _frame_ring
+
 def auto_watcher_loop():
     """7초마다 감시, 변화 감지 시 즉시 스냅샷(버튼 포함) 전송"""
     global _auto_watch_active
-    COOLDOWN = 5.0 
-    last_click: dict = {}
+    # 버튼별 추적: 아이콘(A)/색상(C) 어느 쪽이 눌렀든 같은 버튼은 cooldown 동안 다시 누르지 않음
+    buttons = ButtonTracker(cooldown=5.0)
     
-    # 변화 감지용 변수
-    prev_chat_thumb = None
+    # 변화 감지용 변수 (타일 해시 → 바뀐 영역만 후속 단계에 전달)
+    detector = ChangeDetector()
     last_change_time = 0
     change_notified = True
     last_interval_snapshot = 0 # 1분 간격 스냅샷용
 
+    # 창이 이동/크기 변경/재발견되면 이전 프레임과 비교가 무의미 → 베이스라인 초기화
+    geometry_changed = threading.Event()
+    window_tracker.add_listener(lambda event, hwnd, rect: geometry_changed.set())
+    grabber = FrameGrabber()
+    ring = open_frame_ring()
+    FULL_SCAN_EVERY = 10   # 클릭 실패 등으로 남은 버튼을 놓치지 않도록 주기적으로 전체 탐색
+    tick = 0
+    rescan = False   # 직전 tick 에 액션이 있었으면 전체 탐색 (액션 후 프레임은 베이스라인에 흡수되므로)
+    paused = False   # 창을 못 찾아 감시를 쉬는 중 (로그는 상태가 바뀔 때만)
+
     while True:
         with _auto_watch_lock:
             active = _auto_watch_active
@@ -510,67 +477,123 @@ def auto_watcher_loop():
             time.sleep(1)
             continue
 
-        hwnd, rect, _ = get_vscode_window_rect()
+        # 감시만 할 때는 포커스를 가져오지 않음 — 클릭 직전에만 window_tracker.focus()
+        # 최소화된 창은 포커스 없이 복원 (기존처럼 복원은 하되 사용자가 쓰던 창을 가리지 않음)
+        hwnd, rect, _ = get_vscode_window_rect(focus=False, restore=True)
         if not rect:
+            if not paused: print("⏸️ [Auto] VS Code 창을 찾을 수 없어 감시 일시 중지 (7초마다 재시도)")
+            paused = True
             time.sleep(7)
             continue
+        if paused:
+            print("▶️ [Auto] VS Code 창을 다시 찾아 감시 재개")
+            paused = False
+        if geometry_changed.is_set():
+            geometry_changed.clear()
+            detector.reset()
+            buttons.reset()
         
         l, t, r, b = rect
         w, h = r - l, b - t
 
+        def grab():
+            """창 영역 캡처 + 봇이 바로 읽을 수 있도록 링 버퍼에 게시"""
+            f = grabber.grab((l, t, w, h))
+            if ring is not None: ring.publish(f.pixels, f.left, f.top, rect, f.timestamp)
+            return f
+
+        # 0. 이번 tick 의 프레임을 한 번만 캡처 → 아래 단계는 모두 이 프레임의 view 사용
+        try:
+            frame = grab()
+        except Exception as e:
+            print(f"[!] 캡처 실패: {e}")
+            time.sleep(1)
+            continue
+        acted = False
+        chat_region = (int(l + w * 0.50), t, int(w * 0.50), h)   # 윈도우의 우측 50% 영역 (변화 감지)
+        tick += 1
+
+        def dirty_rects(f):
+            """프레임을 감지기에 반영하고 바뀐 영역을 화면 좌표로 반환"""
+            return [(f.left + x, f.top + y, dw, dh) for x, y, dw, dh in detector.update(f.pixels)]
+
+        dirty = dirty_rects(frame)
+        baseline = detector.baseline   # 창을 처음 잡았거나 reset 직후 — 비교 대상이 없음
+        full_scan = tick % FULL_SCAN_EVERY == 0 or baseline or rescan
+
+        def scan_region(region, pad):
+            """바뀐 부분과 겹치는 곳만 탐색 (전체 탐색 tick 이면 region 전체)"""
+            if region is None: return None
+            if full_scan: return region
+            return bounding(overlaps(dirty, region), pad=pad, limit=region)
+
         # A. 아이콘 감시 (모양 인식) - 윈도우 우측 영역(0.4~1.0)으로 제한하여 에디터 클릭 방지
-        search_region = (int(l + w * 0.4), t, int(w * 0.6), h)
-        for icon_name, label, conf in AUTO_ICONS:
-            icon_path = os.path.join(ICON_DIR, f"icon_{icon_name}.png")
-            if not os.path.exists(icon_path): continue
-            now = time.time()
-            if now - last_click.get(icon_name, 0) < COOLDOWN: continue
+        search_region = scan_region(frame.clip((int(l + w * 0.4), t, int(w * 0.6), h)), pad=64)
+        try:
+            hits = icon_registry.match(frame, [name for name, _, _ in AUTO_ICONS], search_region,
+                                       {name: conf for name, _, conf in AUTO_ICONS}, anchor=rect) if search_region else {}
+        except Exception as e:
+            print(f"[!] 아이콘 매칭 실패: {e}")
+            hits = {}
+        found = [(name, label) for name, label, _ in AUTO_ICONS if name in hits]
+        tracks = buttons.update("icon", [(hits[n].x, hits[n].y, hits[n].w, hits[n].h) for n, _ in found],
+                                [n for n, _ in found])
+        for (icon_name, label), track in zip(found, tracks):
+            if not buttons.ready(track): continue
             try:
-                pos = pyautogui.locateCenterOnScreen(icon_path, confidence=conf, region=search_region)
-                if pos:
-                    pyautogui.moveTo(pos, duration=0.15)
-                    pyautogui.click()
-                    last_click[icon_name] = time.time()
-                    push_msg(f"🤖 [Auto] {label} 자동 클릭")
-                    time.sleep(0.3)
+                window_tracker.focus()
+                pyautogui.moveTo(*hits[icon_name].center, duration=0.15)
+                pyautogui.click()
+                buttons.acted(track)
+                push_msg(f"🤖 [Auto] {label} 자동 클릭")
+                time.sleep(0.3)
+                acted = True
             except: pass
 
-        # B. 스마트 변화 감지 (새 메시지 알림) - 상태 업데이트 및 감지만 수행
-        curr_thumb = None
+        # 클릭으로 화면이 바뀌었으면 이후 단계를 위해 한 번만 다시 캡처
+        if acted:
+            try:
+                frame = grab()
+                dirty += dirty_rects(frame)
+            except Exception: pass
+
+        # B. 스마트 변화 감지 (새 메시지 알림) - 채팅 영역에 바뀐 타일이 있는지만 확인
         try:
-            # 윈도우의 우측 50% 영역 감시 (더 넓게 확보)
-            chat_x, chat_w = int(l + w * 0.50), int(w * 0.50)
-            current_chat = pyautogui.screenshot(region=(chat_x, t, chat_w, h))
-            curr_thumb = np.array(current_chat.resize((50, 100)).convert('L'))
-            
-            if prev_chat_thumb is not None:
-                diff = np.mean(np.abs(curr_thumb.astype(float) - prev_chat_thumb.astype(float)))
-                # 민감도 향상 (1.5 -> 0.7)
-                if diff > 0.7: 
-                    last_change_time = time.time()
-                    change_notified = False
-                
-                # 변화가 멈춘 지 3초가 지났고 아직 알림 전이라면 전송
-                if not change_notified and (time.time() - last_change_time > 3.0):
-                    send_chat_snapshot("🔔 [Auto] AI가 새로운 내용을 작성했습니다.")
-                    change_notified = True
+            # 창을 처음 잡은 tick 은 비교 대상이 없으므로 변화로 치지 않음 (화면 전체가 바뀐 경우는 변화)
+            if not baseline and overlaps(dirty, chat_region):
+                last_change_time = time.time()
+                change_notified = False
+
+            # 변화가 멈춘 지 3초가 지났고 아직 알림 전이라면 전송
+            if not change_notified and (time.time() - last_change_time > 3.0):
+                send_chat_snapshot("🔔 [Auto] AI가 새로운 내용을 작성했습니다.", frame=frame, ocr_profile="auto")
+                change_notified = True
         except: pass
 
         # C. 색상 기반 승인 버튼 감지 (에디터를 건드리지 않도록 우측 65% 지점부터 탐색)
         try:
-            zone_l, zone_t = max(0, l + int(w*0.65)), max(0, t + 40)
-            zone_w, zone_h = min(int(w*0.35), pyautogui.size()[0]-zone_l), min(h-100, pyautogui.size()[1]-zone_t)
-            if zone_w > 0 and zone_h > 0:
-                shot = pyautogui.screenshot(region=(zone_l, zone_t, zone_w, zone_h))
-                c_btns = find_color_buttons(shot)
+            full_zone = frame.clip((l + int(w*0.65), t + 40, int(w*0.35), h - 100))
+            zone = scan_region(full_zone, pad=32)
+            if zone:
+                zone_l, zone_t, zone_w, zone_h = zone
+                c_btns = find_color_buttons(frame.view(zone))
+                tracks = buttons.update("color", [(zone_l + btn["x"] - btn["w"] // 2, zone_t + btn["y"] - btn["h"] // 2,
+                                                   btn["w"], btn["h"]) for btn in c_btns])
+                # A 단계에서 방금 누른 버튼 등 cooldown 중인 버튼은 후보에서 제외
+                c_btns = [(btn, tr) for btn, tr in zip(c_btns, tracks) if buttons.ready(tr)]
                 if c_btns:
-                    top_b = [btn for btn in c_btns if btn["y"] < zone_h * 0.35]
-                    target = top_b[0] if top_b else sorted(c_btns, key=lambda b: b["y"], reverse=True)[0]
+                    # 상단 35% 판정은 탐색 범위가 아닌 전체 구역 기준 (화면 좌표로 비교)
+                    top_limit = full_zone[1] + full_zone[3] * 0.35
+                    top_b = [c for c in c_btns if zone_t + c[0]["y"] < top_limit]
+                    target, track = top_b[0] if top_b else max(c_btns, key=lambda c: c[0]["y"])
                     rx, ry = zone_l + target["x"], zone_t + target["y"]
+                    window_tracker.focus()
                     pyautogui.moveTo(rx, ry, duration=0.15)
                     pyautogui.click()
+                    buttons.acted(track)
                     push_msg("🤖 [Auto] 색상 감지 승인 버튼 클릭")
                     time.sleep(0.3)
+                    acted = True
         except: pass
 
         # D. 마우스 휠 스크롤 다운 (채팅 따라가기)
@@ -580,19 +603,61 @@ def auto_watcher_loop():
             if (l + w * 0.7 < mx < r) and (t < my < b):
                 pyautogui.scroll(-600) # 한 번에 많이 내려가도록 수치 대폭 상향 (-20 -> -600)
                 if not change_notified: time.sleep(0.1)
+                acted = True
         except: pass
 
         # E. 다음 루프를 위한 베이스라인 갱신 (모든 액션 완료 후!!)
         try:
-            # 액션(클릭, 스크롤) 후의 상태를 캡처해야 다음 루프에서 '순수한 변화'만 감지 가능
-            chat_x, chat_w = int(l + w * 0.50), int(w * 0.50)
-            after_action_chat = pyautogui.screenshot(region=(chat_x, t, chat_w, h))
-            prev_chat_thumb = np.array(after_action_chat.resize((50, 100)).convert('L'))
+            # 액션(클릭, 스크롤)이 있었을 때만 다시 캡처해 감지기에 흡수 → 다음 tick 은 '순수한 변화'만 감지
+            # 흡수한 프레임에 새로 뜬 버튼은 dirty 로 잡히지 않으므로 다음 tick 은 전체 탐색
+            if acted: detector.update(grab().pixels)
         except: pass
+        rescan = acted
 
         time.sleep(1) # 루프 과부하 방지
 
+# ── Brain RPC (antigravity_bot → agent_brain) ───────────────────────────────
+
+def rpc_ping(params):
+    return {"pid": os.getpid(), "auto_watch": _auto_watch_active, "ocr": dict(ocr_worker.status(), profile=_adaptive_ocr.status())}
+
+_snapshot_flight = SingleFlight()
+
+def _capture_png():
+    shot, region = capture_chat_panel()
+    if shot is None: raise RuntimeError("VS Code 창을 찾을 수 없습니다.")
+    buf = BytesIO()
+    shot.save(buf, format="PNG")
+    return shot, region, buf.getvalue()
+
+def rpc_snapshot(params):
+    """채팅 본문 PNG를 먼저 스트리밍하고, 요청 시 OCR 결과를 이어서 전송
+    동시에 들어온 스냅샷 요청은 캡처/OCR 한 번을 공유합니다."""
+    shot, region, png = _snapshot_flight.do("capture", _capture_png)
+    yield {"type": "image", "region": list(region)}, png
+    if params.get("include_ocr"):
+        yield {"type": "ocr", "text": _snapshot_flight.do(("ocr", id(shot)), lambda: get_gemini_ocr(shot))}, None
+    return {"ok": True}
+
+def rpc_ocr(params):
+    """봇이 링 버퍼에서 보낸 프레임(seq)의 채팅 영역만 OCR — 이미 덮어써졌으면 새로 캡처"""
+    frame = _frame_ring.get(params.get("seq", 0)) if _frame_ring else None
+    if frame is not None and frame.window_rect:
+        shot = Image.fromarray(np.ascontiguousarray(frame.view(chat_panel_region(frame.window_rect))))
+        if _frame_ring.valid(frame): return {"text": get_gemini_ocr(shot), "seq": frame.seq}
+    shot, _ = capture_chat_panel()
+    if shot is None: raise RuntimeError("VS Code 창을 찾을 수 없습니다.")
+    return {"text": get_gemini_ocr(shot), "seq": 0}
+
+RPC_HANDLERS = {
+    "ping": rpc_ping,
+    "snapshot": rpc_snapshot,
+    "ocr": rpc_ocr,
+}   # 클릭/입력 같은 액션은 RPC 로 열지 않음 (인증 없는 로컬 포트) — Telegram authorized() 를 거친 mailbox 명령으로만
+
 if __name__ == "__main__":
+    ocr_worker.start()   # 모델을 미리 로드 (첫 /ocr 이 수 초간 멈추지 않도록)
+    brain_rpc.start_server(RPC_HANDLERS)
     threading.Thread(target=inbound_loop, daemon=True).start()
     threading.Thread(target=auto_watcher_loop, daemon=True).start()
     print("🤖 Auto Watcher (아이콘+색상) 스레드 대기 중 (/auto 명령으로 활성화)")
@@ -3,21 +3,20 @@ antigravity_bot.py — Telegram 봇 메인 서버
 Flask antigravity_host.py를 대체하며, 화면 캡처, 채팅창 캡처, 대화 로그 추출 기능을 포함합니다.
 """
 import os
-import json
 import shutil
+import asyncio
 import time
 import threading
-import tempfile
 import ctypes
-import pyautogui
 import re
-import win32gui
-import win32con
 
 from io import BytesIO
+import numpy as np
+from PIL import Image
 from dotenv import load_dotenv
 
 from telegram import Update, BotCommand, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
 from telegram.ext import (
     ApplicationBuilder,
     CommandHandler,
@@ -27,6 +26,14 @@ from telegram.ext import (
     filters,
 )
 
+import brain_rpc
+import capture
+import frame_ring
+from mailbox_store import read_mailbox, push_inbound, claim, ack, set_approval_request, doorbell
+from outbound_dispatcher import OutboundDispatcher, LINGER
+from command_protocol import encode
+from window_tracker import chat_panel_region
+
 # 🛠️ DPI Awareness (125% 배율 등에서 화면 캡처 시 오차 방지)
 try:
     ctypes.windll.shcore.SetProcessDpiAwareness(1)
@@ -39,61 +46,6 @@ load_dotenv()
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN", "")
 CHAT_ID = int(os.getenv("TELEGRAM_CHAT_ID", "0"))
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-MAILBOX_PATH = os.path.join(BASE_DIR, "mailbox.json")
-
-
-# ── 공유 mailbox 유틸 ────────────────────────────────────────────────────────
-
-def read_mailbox() -> dict:
-    try:
-        with open(MAILBOX_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return {"inbound": [], "outbound": [], "approval_request": None}
-
-
-def write_mailbox(box: dict) -> None:
-    fd, tmp = tempfile.mkstemp(dir=BASE_DIR, suffix=".tmp")
-    with os.fdopen(fd, "w", encoding="utf-8") as f:
-        json.dump(box, f, ensure_ascii=False, indent=2)
-    os.replace(tmp, MAILBOX_PATH)
-
-
-def push_inbound(message: str) -> None:
-    box = read_mailbox()
-    box["inbound"].append(message)
-    write_mailbox(box)
-
-
-# ── VS Code 유틸 ────────────────────────────────────────────────────────────
-
-def get_vscode_window_rect():
-    found = []
-    def callback(hwnd, res):
-        if win32gui.IsWindowVisible(hwnd):
-            title = win32gui.GetWindowText(hwnd)
-            class_name = win32gui.GetClassName(hwnd)
-            if class_name == "Chrome_WidgetWin_1" and any(x in title for x in ["Visual Studio Code", "Antigravity", "OpenClaw"]):
-                if not any(title.endswith(x) for x in [" - Chrome", " - Microsoft Edge"]):
-                    res.append((hwnd, title))
-        return True
-    
-    win32gui.EnumWindows(callback, found)
-    if not found: return None, None, None
-    hwnd, title = found[0]
-    
-    placement = win32gui.GetWindowPlacement(hwnd)
-    if placement[1] == win32con.SW_SHOWMINIMIZED: 
-        win32gui.ShowWindow(hwnd, win32con.SW_RESTORE)
-    else: 
-        win32gui.ShowWindow(hwnd, win32con.SW_SHOW)
-        
-    try: win32gui.SetForegroundWindow(hwnd)
-    except: pass
-    time.sleep(0.5)
-    
-    rect = win32gui.GetWindowRect(hwnd)
-    return hwnd, rect, title
 
 
 # ── Antigravity 내용 추출 유틸 ──────────────────────────────────────────────
@@ -179,22 +131,22 @@ async def cmd_start(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
 
 async def cmd_accept(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
     if not await authorized(update): return
-    push_inbound("__COMMAND:ICON:accept_all__")
+    push_inbound(encode("ICON", name="accept_all"))
     await update.message.reply_text("✅ Accept all 클릭 지시")
 
 async def cmd_proceed(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
     if not await authorized(update): return
-    push_inbound("__COMMAND:ICON:proceed__")
+    push_inbound(encode("ICON", name="proceed"))
     await update.message.reply_text("➡️ → (Agent 실행) 클릭 지시")
 
 async def cmd_run_terminal(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
     if not await authorized(update): return
-    push_inbound("__COMMAND:ICON:run__")
+    push_inbound(encode("ICON", name="run"))
     await update.message.reply_text("▶️ Run Alt+↵ (터미널 실행) 클릭 지시")
 
 async def cmd_stop_agent(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
     if not await authorized(update): return
-    push_inbound("__COMMAND:ICON:stop__")
+    push_inbound(encode("ICON", name="stop"))
     await update.message.reply_text("⏹️ Agent 정지 클릭 지시")
 
 async def cmd_type(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
@@ -203,18 +155,18 @@ async def cmd_type(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
         await update.message.reply_text("사용법: /type <입력할 텍스트>")
         return
     text = " ".join(ctx.args)
-    push_inbound(f"__COMMAND:ICON_TYPE:{text}__")
+    push_inbound(encode("ICON_TYPE", text=text))
     preview = text[:50] + "..." if len(text) > 50 else text
     await update.message.reply_text(f"✍️ Review Changes 에 입력 지시: {preview}")
 
 async def cmd_scrolldown(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
     if not await authorized(update): return
-    push_inbound("__COMMAND:ICON:scrolldown__")
+    push_inbound(encode("ICON", name="scrolldown"))
     await update.message.reply_text("🔽 스크롤다운 아이콘 클릭 지시")
 
 async def cmd_auto(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
     if not await authorized(update): return
-    push_inbound("__COMMAND:AUTO_WATCH_ON__")
+    push_inbound(encode("AUTO_WATCH_ON"))
     await update.message.reply_text(
         "🤖 **Auto Watch 시작!**\n"
         "7초마다 다음 아이콘을 감시합니다:\n"
@@ -224,27 +176,27 @@ async def cmd_auto(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
 
 async def cmd_autooff(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
     if not await authorized(update): return
-    push_inbound("__COMMAND:AUTO_WATCH_OFF__")
+    push_inbound(encode("AUTO_WATCH_OFF"))
     await update.message.reply_text("⏹️ Auto Watch 중단 지시")
 
 async def cmd_su(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
     if not await authorized(update): return
-    push_inbound("__COMMAND:SCROLL:UP__")
+    push_inbound(encode("SCROLL", direction="UP"))
     await update.message.reply_text("🔼 위로 스크롤 지시")
 
 async def cmd_sd(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
     if not await authorized(update): return
-    push_inbound("__COMMAND:SCROLL:DOWN__")
+    push_inbound(encode("SCROLL", direction="DOWN"))
     await update.message.reply_text("🔽 아래로 스크롤 지시")
 
 async def cmd_runonce(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
     if not await authorized(update): return
-    push_inbound("__COMMAND:CLICK_RUN_ONCE__")
+    push_inbound(encode("CLICK_RUN_ONCE"))
     await update.message.reply_text("▶️ 'Run Once' 클릭 시도")
 
 async def cmd_runall(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
     if not await authorized(update): return
-    push_inbound("__COMMAND:CLICK_RUN_ALL__")
+    push_inbound(encode("CLICK_RUN_ALL"))
     await update.message.reply_text("⏩ 'Run All' 클릭 시도")
 
 async def cmd_click_manual(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
@@ -252,16 +204,44 @@ async def cmd_click_manual(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> No
     if not ctx.args or len(ctx.args) < 2:
         await update.message.reply_text("사용법: /click x y (예: /click 2000 1000)")
         return
-    x, y = ctx.args[0], ctx.args[1]
-    push_inbound(f"__COMMAND:CLICK:{x}:{y}__")
+    try:
+        x, y = int(ctx.args[0]), int(ctx.args[1])
+    except ValueError:
+        await update.message.reply_text("사용법: /click x y (예: /click 2000 1000)")
+        return
+    push_inbound(encode("CLICK", x=x, y=y))
     await update.message.reply_text(f"🎯 좌표 ({x}, {y}) 클릭 지시")
 
+# ── Brain 이 게시한 최신 프레임 (frames.ring) ──────────────────────────────
+_ring = None
+
+def latest_frame():
+    """링 버퍼의 최신 프레임 — Brain 미실행/감시 중지로 오래됐으면 None (→ 새로 캡처)"""
+    global _ring
+    if _ring is None: _ring = frame_ring.open_reader()
+    return _ring.latest() if _ring else None
+
+def _encode_png(pixels) -> bytes:
+    buf = BytesIO()
+    Image.fromarray(np.ascontiguousarray(pixels)).save(buf, format="PNG")
+    return buf.getvalue()
+
+async def ring_png(frame, region=None):
+    """링 프레임(또는 그 일부)을 PNG 로 — 인코딩 중 Brain 이 슬롯을 덮어썼으면 None"""
+    png = await asyncio.to_thread(_encode_png, frame.view(region) if region else frame.pixels)
+    return png if _ring.valid(frame) else None
+
 async def cmd_screenshot(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
 # ... (rest of the file handles follow)
     if not await authorized(update): return
+    frame = latest_frame()
+    png = await ring_png(frame) if frame else None
+    if png:
+        await update.message.reply_photo(BytesIO(png), caption=f"VS Code 창 ({frame.age:.1f}초 전 프레임)")
+        return
     await update.message.reply_text("📸 전체 화면 캡처 중...")
     try:
-        img = pyautogui.screenshot()
+        img = capture.screenshot()
         buf = BytesIO()
         img.save(buf, format="PNG")
         buf.seek(0)
@@ -269,36 +249,58 @@ async def cmd_screenshot(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None
     except Exception as e:
         await update.message.reply_text(f"❌ 스크린샷 실패: {e}")
 
+async def reply_chat_snapshot(update: Update, caption: str, include_ocr: bool) -> None:
+    """Brain 이 링 버퍼에 게시한 최신 프레임이 있으면 그대로 잘라 보내고(OCR 만 RPC),
+    없으면 실행 중인 Brain에 RPC로 채팅창 캡처(+OCR)를 요청하고 도착하는 대로 전달"""
+    frame = latest_frame()
+    if frame and frame.window_rect:
+        x, y, w, h = region = chat_panel_region(frame.window_rect)
+        png = await ring_png(frame, region)
+        if png:
+            photo_caption = f"{caption}\n📐 `X:{x}, Y:{y}, W:{w}, H:{h}` ({frame.age:.1f}초 전)"
+            await update.message.reply_photo(BytesIO(png), caption=photo_caption, parse_mode="Markdown")
+            if not include_ocr: return
+            try:
+                text = ((await brain_rpc.call("ocr", {"seq": frame.seq})).get("text") or "").strip()
+            except brain_rpc.RpcError as e:
+                await update.message.reply_text(f"❌ OCR 실패: {e}")
+                return
+            if text:
+                try: await update.message.reply_text(text, parse_mode="Markdown")
+                except BadRequest: await update.message.reply_text(text)
+            return
+    try:
+        async for event, blob in brain_rpc.stream("snapshot", {"include_ocr": include_ocr}):
+            if event.get("type") == "image":
+                x, y, w, h = event["region"]
+                photo_caption = f"{caption}\n📐 `X:{x}, Y:{y}, W:{w}, H:{h}`"
+                await update.message.reply_photo(BytesIO(blob), caption=photo_caption, parse_mode="Markdown")
+            elif event.get("type") == "ocr":
+                text = (event.get("text") or "").strip()
+                if not text: continue
+                # Markdown 특수문자 충돌 시 일반 텍스트로 재시도
+                try: await update.message.reply_text(text, parse_mode="Markdown")
+                except BadRequest: await update.message.reply_text(text)
+    except brain_rpc.RpcError as e:
+        await update.message.reply_text(f"❌ 캡처 실패: {e}")
+
 async def cmd_ss(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
     """채팅창 본문 정밀 캡처 (OCR 제외)"""
     if not await authorized(update): return
     await update.message.reply_text("📸 채팅창 본문 정밀 캡처 중...")
-    try:
-        from agent_brain import send_chat_snapshot
-        send_chat_snapshot("📸 [Manual] 채팅창 스냅샷", include_ocr=False)
-    except Exception as e:
-        await update.message.reply_text(f"❌ 캡처 실패: {e}")
+    await reply_chat_snapshot(update, "📸 [Manual] 채팅창 스냅샷", include_ocr=False)
 
 async def cmd_ocr(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
     """채팅창 본문 정밀 캡처 + OCR 리포트"""
     if not await authorized(update): return
     await update.message.reply_text("📖 채팅창 OCR 분석 중...")
-    try:
-        from agent_brain import send_chat_snapshot
-        send_chat_snapshot("📸 [Manual] 채팅창 OCR 리포트", include_ocr=True)
-    except Exception as e:
-        await update.message.reply_text(f"❌ 분석 실패: {e}")
+    await reply_chat_snapshot(update, "📸 [Manual] 채팅창 OCR 리포트", include_ocr=True)
 
 async def cmd_debug(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
     """OCR 및 캡처 영역 정밀 진단"""
     if not await authorized(update): return
     await update.message.reply_text("🔎 시스템 정밀 진단 중 (캡처영역 + OCR)...")
-    try:
-        from agent_brain import send_chat_snapshot
-        # 'DEBUG' 문자열을 포함하여 호출 (좌표 정보 출력됨)
-        send_chat_snapshot("🧪 [DEBUG] 시스템 진단 리포트")
-    except Exception as e:
-        await update.message.reply_text(f"❌ 진단 실패: {e}")
+    await reply_chat_snapshot(update, "🧪 [DEBUG] 시스템 진단 리포트", include_ocr=True)
 
 async def cmd_history(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
     if not await authorized(update): return
@@ -316,16 +318,35 @@ async def cmd_history(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
 
 async def cmd_stop(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
     if not await authorized(update): return
-    box = read_mailbox()
-    box["approval_request"] = "__EMERGENCY_STOP__"
-    write_mailbox(box)
+    set_approval_request("__EMERGENCY_STOP__")
     await update.message.reply_text("🛑 긴급 중지 신호를 전송했습니다.")
 
+def ocr_status(info) -> str:
+    """Brain ping 의 OCR 워커 상태 → 한 줄 표시"""
+    if not info: return "알 수 없음"
+    if info.get("error"): return f"사용 불가 ❌ ({info['error']})"
+    if info.get("ready"):
+        last = f", 최근 {info['last_ms'] / 1000:.1f}초" if info.get("last_ms") else ""
+        profile = (info.get("profile") or {}).get("last")
+        if profile: last += f" · {profile}"
+        return f"준비됨 ✅ (워커 {info.get('workers', '1/1')}, 대기 {info.get('pending', 0)}건{last})"
+    if info.get("alive"): return f"모델 로딩 중 ⏳ ({info.get('loading') or 0:.0f}초 경과)"
+    return "중지됨 ⚠️"
+
 async def cmd_status(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
     if not await authorized(update): return
     box = read_mailbox()
+    try:
+        info = await brain_rpc.call("ping", timeout=3)
+        brain = f"연결됨 ✅ (pid {info['pid']})"
+        ocr = ocr_status(info.get("ocr"))
+    except (brain_rpc.RpcError, asyncio.TimeoutError):
+        brain = "응답 없음 ⚠️"
+        ocr = "알 수 없음"
     status = (
         f"📊 **시스템 상태**\n"
+        f"  Brain: {brain}\n"
+        f"  OCR: {ocr}\n"
         f"  Inbound 대기: {len(box.get('inbound', []))}개\n"
         f"  Outbound 대기: {len(box.get('outbound', []))}개\n"
         f"  승인 요청: {'있음 ⚠️' if box.get('approval_request') else '없음 ✅'}"
@@ -339,16 +360,16 @@ async def cmd_status(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
 #     
 #     data = query.data
 #     if data == "btn_accept":
-#         push_inbound("__COMMAND:ICON:accept_all__")
+#         push_inbound(encode("ICON", name="accept_all"))
 #         await query.edit_message_caption(caption=f"{query.message.caption}\n\n✅ Accept All 지시 완료")
 #     elif data == "btn_proceed":
-#         push_inbound("__COMMAND:ICON:proceed__")
+#         push_inbound(encode("ICON", name="proceed"))
 #         await query.edit_message_caption(caption=f"{query.message.caption}\n\n➡️ Proceed 지시 완료")
 #     elif data == "btn_run":
-#         push_inbound("__COMMAND:ICON:run__")
+#         push_inbound(encode("ICON", name="run"))
 #         await query.edit_message_caption(caption=f"{query.message.caption}\n\n▶️ Run 지시 완료")
 #     elif data == "btn_stop_agent":
-#         push_inbound("__COMMAND:ICON:stop__")
+#         push_inbound(encode("ICON", name="stop"))
 #         await query.edit_message_caption(caption=f"{query.message.caption}\n\n🛑 Stop 지시 완료")
 #     elif data == "btn_chat_refresh":
 #         push_inbound("__COMMAND:ICON:chat_refresh_trigger__") # 임시 트리거
@@ -359,29 +380,23 @@ async def cmd_status(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
 async def on_message(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
     if not await authorized(update): return
     text = update.message.text or ""
-    tagged = f"[📱MOBILE] {text}"
-    push_inbound(tagged)
+    push_inbound(encode("TEXT", text=text, source="mobile"))
     await update.message.reply_text("📨 Antigravity에 전달됨")
 
 
 # ── outbound 감시 스레드 ─────────────────────────────────────────────────────
 
 def outbound_watcher(bot_token: str, chat_id: int) -> None:
-    import requests
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+    dispatcher = OutboundDispatcher(bot_token, chat_id)
     print("🚀 [Outbound Watcher] 시작 - AI 답장을 감시합니다.")
+    bell = doorbell("outbound")
     while True:
         try:
-            box = read_mailbox()
-            messages = box.get("outbound", [])
-            if messages:
-                box["outbound"] = []
-                write_mailbox(box)
-                for msg in messages:
-                    try: requests.post(url, json={"chat_id": chat_id, "text": msg}, timeout=10)
-                    except: pass
-        except: pass
-        time.sleep(0.5)
+            items = claim("outbound")
+            if items: dispatcher.dispatch(items, lambda token: ack("outbound", token))
+        except Exception as e: print(f"Outbound Error: {e}")
+        # 적재 즉시 깨어남 (초인종 실패 시 0.5초 폴링) → 잠깐 더 모아서 병합 전송
+        if bell.wait(0.5): time.sleep(LINGER)
 
 
 # ── 메인 진입점 ─────────────────────────────────────────────────────────────
@@ -394,9 +409,6 @@ def main() -> None:
         print("❌ .env 파일에 TELEGRAM_CHAT_ID를 입력하세요.")
         return
 
-    if not os.path.exists(MAILBOX_PATH):
-        write_mailbox({"inbound": [], "outbound": [], "approval_request": None})
-
     watcher = threading.Thread(target=outbound_watcher, args=(BOT_TOKEN, CHAT_ID), daemon=True)
     watcher.start()
 
@@ -8,21 +8,17 @@ import win32gui
 import sys
 import traceback
 
-try:
-    from scipy import ndimage
-except ImportError:
-    ndimage = None
-
-from PIL import Image
-import numpy as np
+from window_tracker import tracker as window_tracker
+from capture import screenshot
+import color_buttons
 
 CHECK_INTERVAL = 0.5   # 탐색 주기 (초)
 COOLDOWN = 1.0          # 클릭 후 대기 (초)
 pyautogui.FAILSAFE = False
 
 print("🚀 [Antigravity 오토 어프로버] 시작됨")
-if ndimage is None:
-    print("   ⚠️  scipy 미설치 — 버튼 감지가 제한될 수 있습니다.")
+if color_buttons.ndimage is None:
+    print("   ⚠️  scipy 미설치 — NumPy 라벨링으로 대체합니다 (결과 동일, 다소 느릴 수 있음).")
     print("       pip install scipy 권장\n")
 else:
     print("   ✅  scipy 연결됨 (정밀 탐색 모드)\n")
@@ -31,29 +27,8 @@ print("   종료: Ctrl+C\n")
 
 
 def get_vscode_window():
-    windows = []
-
-    def callback(hwnd, res):
-        if not win32gui.IsWindowVisible(hwnd):
-            return True
-        title = win32gui.GetWindowText(hwnd)
-        class_name = win32gui.GetClassName(hwnd)
-        if class_name == "Chrome_WidgetWin_1" and any(
-            x in title.lower() for x in ["visual studio code", "antigravity", "openclaw"]
-        ):
-            res.append((hwnd, title))
-        return True
-
-    win32gui.EnumWindows(callback, windows)
-    if not windows:
-        return None, None, None
-
-    hwnd, title = windows[0]
-    try:
-        rect = win32gui.GetWindowRect(hwnd)
-        return hwnd, rect, title
-    except Exception:
-        return None, None, None
+    # 포커스 없이 캐시된 창 정보만 재검증 (window_tracker)
+    return window_tracker.get(focus=False)
 
 
 def is_point_in_vscode(x, y, target_hwnd):
@@ -70,39 +45,9 @@ def is_point_in_vscode(x, y, target_hwnd):
 
 
 def find_buttons(img_pil):
-    if ndimage is None:
-        return []
+    # agent_brain 과 같은 감지기, approver 프로필 (채움률 0.50)
     try:
-        img = np.array(img_pil)
-        R, G, B = img[:, :, 0], img[:, :, 1], img[:, :, 2]
-
-        mask_blue = (B > 130) & (B > R * 1.5) & (B > G * 1.1)
-        mask_green = (G > 130) & (G > R * 1.2)
-        mask_combined = mask_blue | mask_green
-
-        labeled, _ = ndimage.label(mask_combined)
-        objects = ndimage.find_objects(labeled)
-
-        buttons = []
-        for i, slices in enumerate(objects):
-            if slices is None:
-                continue
-            sy, sx = slices
-            h, w = sy.stop - sy.start, sx.stop - sx.start
-            area = np.sum(labeled[slices] == (i + 1))
-            if w < 40 or h < 20:
-                continue
-            if w > 350 or h > 80:
-                continue
-            if area < 350:
-                continue
-            ratio = w / h
-            if ratio < 1.1 or ratio > 7.0:
-                continue
-            if area / (w * h) < 0.50:
-                continue
-            buttons.append({"x": sx.start + w // 2, "y": sy.start + h // 2, "w": w, "h": h})
-        return buttons
+        return color_buttons.find_buttons(img_pil, "approver")
     except Exception:
         return []
 
@@ -133,7 +78,7 @@ def run_loop():
     if zone_w <= 0 or zone_h <= 0:
         return False
 
-    img = pyautogui.screenshot(region=(zone_l, zone_t, zone_w, zone_h))
+    img = screenshot(region=(zone_l, zone_t, zone_w, zone_h))
     buttons = find_buttons(img)
 
     if not buttons:
@@ -152,12 +97,7 @@ def run_loop():
 
     if is_point_in_vscode(rx, ry, hwnd):
         print(f"[{time.strftime('%H:%M:%S')}] 📋 버튼 탐지 및 클릭: ({rx}, {ry})")
-        if win32gui.GetForegroundWindow() != hwnd:
-            try:
-                win32gui.SetForegroundWindow(hwnd)
-                time.sleep(0.05)
-            except Exception:
-                pass
+        window_tracker.focus()   # 이미 전면이면 그대로
         pyautogui.click(rx, ry)
         time.sleep(0.1)
         return True
@@ -0,0 +1,942 @@
+"""
+bench.py — 성능 측정 도구 모음 (화면/Telegram 없이 로컬에서 실행)
+사용법: python bench.py <이름>   (이름 생략 시 목록 출력)
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import statistics
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _report(label: str, samples_ms: list) -> None:
+    samples_ms = sorted(samples_ms)
+    p = lambda q: samples_ms[min(len(samples_ms) - 1, int(len(samples_ms) * q))]
+    print(f"  {label:<28} n={len(samples_ms):<5} p50={p(0.50):8.3f}ms  p95={p(0.95):8.3f}ms  "
+          f"max={samples_ms[-1]:8.3f}ms  mean={statistics.mean(samples_ms):8.3f}ms")
+
+
+# ── mailbox: 적재 → 소비 지연 (초인종 vs 폴링) ──────────────────────────────
+
+def bench_mailbox(rounds: int = 200) -> None:
+    from mailbox_store import JournalMailbox
+
+    def measure(use_doorbell: bool, poll: float) -> list:
+        work = tempfile.mkdtemp(prefix="mbx_bench_")
+        box = JournalMailbox(work, doorbell_port=47990)
+        bell = box.doorbell("inbound") if use_doorbell else None
+        latencies, done = [], threading.Event()
+
+        def consumer():
+            while len(latencies) < rounds:
+                for sent in box.pop("inbound"):
+                    latencies.append((time.perf_counter() - sent) * 1000)
+                if bell: bell.wait(poll)
+                else: time.sleep(poll)
+            done.set()
+
+        threading.Thread(target=consumer, daemon=True).start()
+        for _ in range(rounds):
+            box.push("inbound", time.perf_counter())
+            time.sleep(0.005)
+        done.wait()
+        if bell: bell.close()
+        shutil.rmtree(work, ignore_errors=True)
+        return latencies
+
+    print(f"[mailbox] enqueue → dequeue 지연 ({rounds}회)")
+    _report("doorbell (fallback 1.0s)", measure(True, 1.0))
+    _report("polling 0.5s", measure(False, 0.5))
+
+    work = tempfile.mkdtemp(prefix="mbx_bench_")
+    box = JournalMailbox(work, doorbell_port=47990)
+    t0 = time.perf_counter()
+    for i in range(2000): box.push("inbound", "x" * 64)
+    print(f"  push 처리량: {2000 / (time.perf_counter() - t0):,.0f} ops/s")
+    shutil.rmtree(work, ignore_errors=True)
+
+
+# ── queue: 백엔드별 처리량 (동시 쓰기 프로세스 포함) ────────────────────────
+
+def _queue_writer(backend: str, work: str, count: int) -> None:
+    from mailbox_store import JournalMailbox, SqliteMailbox
+    box = (SqliteMailbox if backend == "sqlite" else JournalMailbox)(work, doorbell_port=47990)
+    for i in range(count): box.push("inbound", f"msg-{os.getpid()}-{i}")
+
+
+def _check_journal_compaction() -> None:
+    """claim 한 토큰을 다른 ack 가 압축을 일으킨 뒤에 ack 해도 유실/중복이 없어야 함 (회귀 검사)"""
+    import mailbox_store
+    from mailbox_store import JournalMailbox
+
+    work = tempfile.mkdtemp(prefix="queue_compact_")
+    saved, mailbox_store.COMPACT_BYTES = mailbox_store.COMPACT_BYTES, 1000
+    try:
+        box = JournalMailbox(work, doorbell_port=47990)
+        for i in range(40): box.push("outbound", f"filler-{i:03d}-" + "x" * 40)   # 소비자 없는 큐는 압축을 막음
+        box.pop("outbound")
+        for i in range(3): box.push("inbound", f"msg-{i}-" + "y" * 400)
+        tokens = box.claim("inbound")
+        box.ack("inbound", tokens[0][0])      # 여기서 압축 발생
+        assert box._read_meta()["base"] > 0, "압축이 일어나지 않음"
+        box.ack("inbound", tokens[1][0])      # 압축 전에 받은 토큰
+        assert [m for _, m in box.claim("inbound")] == [tokens[2][1]], "압축 후 ack 가 위치를 잘못 옮김"
+        box.ack("inbound", tokens[0][0])      # 이미 처리된 토큰 재-ack 는 무시
+        box.push("inbound", "after")
+        assert [m for _, m in box.claim("inbound")] == [tokens[2][1], "after"], "압축 후 새 메시지 유실"
+        print("  journal: 압축 후 이전 토큰 ack 검사 OK")
+    finally:
+        mailbox_store.COMPACT_BYTES = saved
+        shutil.rmtree(work, ignore_errors=True)
+
+
+def bench_queue(count: int = 2000, writers: int = 4) -> None:
+    import multiprocessing as mp
+    from mailbox_store import JournalMailbox, SqliteMailbox
+
+    print(f"[queue] 백엔드별 처리량 (메시지 {count}개, 동시 writer {writers}개)")
+    _check_journal_compaction()
+    for backend, cls in (("journal", JournalMailbox), ("sqlite", SqliteMailbox)):
+        work = tempfile.mkdtemp(prefix="queue_bench_")
+        box = cls(work, doorbell_port=47990)
+
+        t0 = time.perf_counter()
+        for i in range(count): box.push("inbound", f"msg-{i}")
+        push_rate = count / (time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        acked = 0
+        while True:
+            items = box.claim("inbound")
+            if not items: break
+            for token, _ in items:
+                box.ack("inbound", token)
+                acked += 1
+        ack_rate = acked / (time.perf_counter() - t0)
+
+        per = count // writers
+        procs = [mp.Process(target=_queue_writer, args=(backend, work, per)) for _ in range(writers)]
+        t0 = time.perf_counter()
+        for p in procs: p.start()
+        for p in procs: p.join()
+        conc_rate = per * writers / (time.perf_counter() - t0)
+        lost = per * writers - len(box.pop("inbound"))
+
+        print(f"  {backend:<8} push {push_rate:9,.0f} ops/s | claim+ack {ack_rate:9,.0f} ops/s | "
+              f"동시 push {conc_rate:9,.0f} ops/s (유실 {lost})")
+        shutil.rmtree(work, ignore_errors=True)
+
+
+# ── outbound: 로컬 가짜 Telegram 엔드포인트 대상 발신 비교 ────────────────
+
+def _fake_telegram(limit_per_sec: int):
+    """초당 limit_per_sec 을 넘으면 429(retry_after=1)를 돌려주는 가짜 sendMessage 서버"""
+    import json
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    stats = {"connections": 0, "requests": 0, "delivered": 0, "chars": 0, "429": 0}
+    window = []
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # keep-alive 허용 → 핸들러 1개 = TCP 연결 1개
+
+        def setup(self):
+            super().setup()
+            with lock: stats["connections"] += 1
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            now = time.monotonic()
+            with lock:
+                stats["requests"] += 1
+                window[:] = [t for t in window if now - t < 1.0]
+                limited = len(window) >= limit_per_sec
+                if limited: stats["429"] += 1
+                else:
+                    window.append(now)
+                    stats["delivered"] += 1
+                    stats["chars"] += len(body["text"])
+            if limited:
+                code, payload = 429, {"ok": False, "error_code": 429, "parameters": {"retry_after": 1}}
+            else:
+                code, payload = 200, {"ok": True, "result": {}}
+            data = json.dumps(payload).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args): pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stats
+
+
+def _check_split_roundtrip(cases: int = 500) -> None:
+    """split_message 회귀 검사 — 조각을 이으면 원문과 같고 모든 조각이 한도 이하"""
+    import random
+    from outbound_dispatcher import split_message
+    rng = random.Random(0)
+    for _ in range(cases):
+        limit = rng.randint(8, 64)
+        text = "".join(rng.choice("ab가\n ") if rng.random() < 0.5 else "x" * rng.randint(1, 40)
+                       for _ in range(rng.randint(0, 60)))
+        parts = split_message(text, limit)
+        assert "".join(parts) == text and all(0 < len(p) <= limit for p in parts), (limit, text, parts)
+    print(f"  split_message 무작위 {cases}건: 조각 합 == 원문, 조각 ≤ 한도 OK")
+
+
+def bench_outbound(short: int = 40, limit_per_sec: int = 5) -> None:
+    import requests
+    from outbound_dispatcher import OutboundDispatcher
+
+    messages = [f"진행 상황 {i}: 파일 저장 완료" for i in range(short)] + ["긴 로그 한 줄\n" * 900]
+    total_chars = sum(len(m) for m in messages)
+    print(f"[outbound] 메시지 {len(messages)}개 ({total_chars:,}자) → 가짜 Telegram (초당 {limit_per_sec}건 제한)")
+
+    server, stats = _fake_telegram(limit_per_sec)
+    url = f"http://127.0.0.1:{server.server_port}/botTEST/sendMessage"
+    t0 = time.perf_counter()
+    for msg in messages:   # 기존 outbound_watcher 방식: 메시지마다 새 연결
+        try: requests.post(url, json={"chat_id": 1, "text": msg}, timeout=10)
+        except requests.RequestException: pass
+    elapsed = time.perf_counter() - t0
+    print(f"  기존 (post 1회/메시지)  {elapsed:6.2f}s | 요청 {stats['requests']:3} | 연결 {stats['connections']:3} | "
+          f"429 {stats['429']:3} | 전달 {stats['chars']:,}/{total_chars:,}자")
+    server.shutdown()
+
+    server, stats = _fake_telegram(limit_per_sec)
+    dispatcher = OutboundDispatcher("TEST", 1, api_base=f"http://127.0.0.1:{server.server_port}",
+                                    rate=limit_per_sec, burst=limit_per_sec)
+    acked = []
+    t0 = time.perf_counter()
+    dispatcher.dispatch(list(enumerate(messages)), acked.append)
+    elapsed = time.perf_counter() - t0
+    delivered = stats["chars"] - len("\n\n") * (short - 1)   # 병합 구분자 제외
+    print(f"  디스패처 (병합/분할)    {elapsed:6.2f}s | 요청 {stats['requests']:3} | 연결 {stats['connections']:3} | "
+          f"429 {stats['429']:3} | 전달 {delivered:,}/{total_chars:,}자 | ack {len(acked)}/{len(messages)}")
+    server.shutdown()
+    assert delivered == total_chars, f"분할 경계에서 {total_chars - delivered}자 손실"
+    _check_split_roundtrip()
+
+
+# ── scheduler: 폰에서 몰아친 명령 큐를 비우는 시간 (액션 비용은 모의값) ─────
+
+def bench_scheduler() -> None:
+    from command_scheduler import CommandScheduler
+    from command_protocol import decode
+
+    cost = {"SCROLL": 0.05, "ICON": 0.5, "TEXT": 1.2, "AUTO_WATCH_OFF": 0.0}
+    burst = (["__COMMAND:SCROLL:DOWN__"] * 10 + ["__COMMAND:ICON:accept_all__"] * 4 + ["계속 진행해줘"]
+             + ["__COMMAND:SCROLL:UP__"] * 3 + ["__COMMAND:ICON:stop__"])
+
+    def execute(command):
+        time.sleep(cost.get(decode(command).type, 0.1))
+
+    print(f"[scheduler] 명령 {len(burst)}개 버스트 (SCROLL 50ms / ICON 500ms / 텍스트 1.2s 모의)")
+    # 회귀 검사: 해석할 수 없는 구버전 문자열/봉투가 섞여 있어도 poll 이 멈추지 않고 모두 ack 되어야 함
+    bad = ["__COMMAND:CLICK:abc__", "__COMMAND:SCROLL:UP:x__", {"v": 1, "type": "CLICK", "args": {"x": "a"}},
+           '{"v":1,"type":"SCROLL","args":{"steps":"many"}}', 42, "__COMMAND:ICON:accept_all__"]
+    assert all(decode(b).type == "INVALID" for b in bad[:-1]), [decode(b) for b in bad]
+    pending, done, ran = list(enumerate(bad)), set(), []
+    CommandScheduler(lambda: [i for i in pending if i[0] not in done], done.add, ran.append).run_once()
+    assert done == set(range(len(bad))) and ran[-1].type == "ICON", (done, ran)
+    print(f"  잘못된 명령 {len(bad) - 1}개 → INVALID 로 처리 후 ack, 큐 막힘 없음 OK")
+    t0 = time.perf_counter()
+    stop_at = None
+    for command in burst:
+        execute(command)
+        if command.endswith("stop__"): stop_at = time.perf_counter() - t0
+    print(f"  FIFO        drain {time.perf_counter() - t0:5.2f}s | stop 실행까지 {stop_at:5.2f}s | 실행 {len(burst)}회")
+
+    items = list(enumerate(burst))
+    acked = set()
+    stop_at = None
+
+    def run(command):
+        nonlocal stop_at
+        execute(command)
+        if command.args.get("name") == "stop": stop_at = time.perf_counter() - t0
+
+    sched = CommandScheduler(lambda: [i for i in items if i[0] not in acked], acked.add, run)
+    t0 = time.perf_counter()
+    sched.run_once()
+    print(f"  Scheduler   drain {time.perf_counter() - t0:5.2f}s | stop 실행까지 {stop_at:5.2f}s | "
+          f"실행 {sched.stats['executed']}회 (병합 {sched.stats['merged']})")
+
+
+# ── protocol: 명령 파싱 + 디스패치 마이크로벤치 ─────────────────────────────
+
+def _legacy_dispatch(command: str):
+    """기존 execute_brain_task 의 문자열 분해 + if/elif 체인 재현"""
+    if command.startswith("__COMMAND:"):
+        clean_command = command[:-2] if command.endswith("__") else command
+        parts = clean_command.split(":")
+        cmd_type = parts[1]
+        if cmd_type == "AUTO_WATCH_ON": return cmd_type, None
+        elif cmd_type == "AUTO_WATCH_OFF": return cmd_type, None
+    if command.startswith("__COMMAND:"):
+        clean_command = command[:-2] if command.endswith("__") else command
+        parts = clean_command.split(":")
+        cmd_type = parts[1]
+        if cmd_type == "SCROLL": return cmd_type, parts[2]
+        elif cmd_type == "CLICK": return cmd_type, (int(parts[2]), int(parts[3]))
+        elif cmd_type == "CLICK_RUN_ONCE": return cmd_type, None
+        elif cmd_type == "CLICK_RUN_ALL": return cmd_type, None
+        elif cmd_type == "ICON": return cmd_type, parts[2]
+        elif cmd_type == "ICON_TYPE":
+            raw = ":".join(parts[2:])
+            return cmd_type, raw[:-2] if raw.endswith("__") else raw
+    text = command
+    if text.startswith("[📱MOBILE]"): text = text.replace("[📱MOBILE]", "").strip()
+    return "TEXT", text
+
+
+def bench_protocol(rounds: int = 200_000) -> None:
+    import json
+    from command_protocol import decode, encode
+
+    table = {t: (lambda args: args) for t in ("AUTO_WATCH_ON", "AUTO_WATCH_OFF", "SCROLL", "CLICK",
+                                               "CLICK_RUN_ONCE", "CLICK_RUN_ALL", "ICON", "ICON_TYPE", "TEXT")}
+    legacy = ["__COMMAND:ICON:accept_all__", "__COMMAND:SCROLL:DOWN__", "__COMMAND:CLICK:2000:1000__",
+              "__COMMAND:ICON_TYPE:a:b 를 __init____", "[📱MOBILE] 계속 진행해줘"]
+    typed = [encode("ICON", name="accept_all"), encode("SCROLL", direction="DOWN"), encode("CLICK", x=2000, y=1000),
+             encode("ICON_TYPE", text="a:b 를 __init__"), encode("TEXT", text="계속 진행해줘", source="mobile")]
+    # mailbox 는 기존 문자열도 봉투도 JSON 으로 저장하므로 (저장 형식 그대로) json.loads 비용까지 포함한 행도 비교
+    typed_json = [json.dumps(e, ensure_ascii=False, separators=(",", ":")) for e in typed]
+    legacy_json = [json.dumps(c, ensure_ascii=False) for c in legacy]
+
+    print(f"[protocol] 명령 파싱 + 디스패치 ({rounds:,}회)")
+    print(f"  ICON_TYPE 'a:b 를 __init__' → 기존 {_legacy_dispatch(legacy[3])[1]!r} / 봉투 {decode(typed[3]).args['text']!r}")
+    cases = (
+        ("기존 문자열 + if/elif", lambda i: _legacy_dispatch(legacy[i % 5])),
+        ("구버전 shim + dict", lambda i: table[(c := decode(legacy[i % 5])).type](c.args)),
+        ("봉투(dict) + dict", lambda i: table[(c := decode(typed[i % 5])).type](c.args)),
+        ("저장 JSON → 기존 if/elif", lambda i: _legacy_dispatch(json.loads(legacy_json[i % 5]))),
+        ("저장 JSON → 봉투 + dict", lambda i: table[(c := decode(json.loads(typed_json[i % 5]))).type](c.args)),
+    )
+    for label, fn in cases:
+        t0 = time.perf_counter()
+        for i in range(rounds): fn(i)
+        print(f"  {label:<24} {(time.perf_counter() - t0) / rounds * 1e9:8.0f} ns/명령")
+
+
+# ── capture: 백엔드별 캡처 처리량 ────────────────────────────────────────────
+
+class _SyntheticSource:
+    """녹화본이 없을 때 리플레이 디렉터리를 만들기 위한 합성 화면"""
+
+    def __init__(self, w: int = 1920, h: int = 1080):
+        import numpy as np
+        self.rng = np.random.default_rng(0)
+        self.base = self.rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+
+    def bounds(self) -> tuple:
+        return 0, 0, self.base.shape[1], self.base.shape[0]
+
+    def grab(self, region, out=None):
+        x, y, w, h = region
+        frame = self.base[y:y + h, x:x + w].copy()
+        frame[:40] = self.rng.integers(0, 256, 3, dtype="uint8")   # 프레임마다 일부만 바뀜
+        return frame
+
+
+def bench_capture(rounds: int = 60, region=(0, 0, 1280, 720)) -> None:
+    import capture
+
+    replay_dir = os.getenv("CAPTURE_REPLAY")
+    if not replay_dir:
+        replay_dir = tempfile.mkdtemp(prefix="capture_bench_")
+        capture.record_frames(_SyntheticSource().bounds(), replay_dir, 10, interval=0, source=_SyntheticSource())
+
+    print(f"[capture] {region[2]}x{region[3]} 영역 {rounds}회 캡처 (FrameGrabber, 버퍼 재사용)")
+    specs = list(capture.SOURCES) + [f"replay:{replay_dir}"]
+    for spec in specs:
+        try:
+            if spec.startswith("replay:"): source = capture.ReplaySource(replay_dir, loop=True, preload=True)
+            else: source = capture.open_source(spec)
+            grabber = capture.FrameGrabber(source)
+            grabber.grab(region)   # 초기화/첫 프레임 제외
+        except Exception as e:
+            print(f"  {spec.split(':')[0]:<28} 사용 불가 ({type(e).__name__}: {str(e)[:60]})")
+            continue
+        samples = []
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            grabber.grab(region)
+            samples.append((time.perf_counter() - t0) * 1000)
+        _report(spec.split(":")[0], samples)
+
+
+# ── ring: Brain 프레임 게시 / 봇 읽기 ───────────────────────────────────────
+
+def bench_ring(rounds: int = 100, shape=(1440, 2560, 3)) -> None:
+    import numpy as np
+    from io import BytesIO
+    from PIL import Image
+    from frame_ring import FrameRing, open_reader
+    from window_tracker import chat_panel_region
+
+    path = os.path.join(tempfile.mkdtemp(prefix="ring_bench_"), "frames.ring")
+    writer = FrameRing(path, create=True)
+    reader = open_reader(path)
+    pixels = np.random.default_rng(0).integers(0, 256, shape, dtype=np.uint8)
+    rect = (0, 0, shape[1], shape[0])
+    print(f"[ring] {shape[1]}x{shape[0]} 프레임 게시/읽기 ({rounds}회)")
+    publish, read = [], []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        writer.publish(pixels, 0, 0, rect)
+        publish.append((time.perf_counter() - t0) * 1000)
+        t0 = time.perf_counter()
+        frame = reader.latest()
+        frame.view(chat_panel_region(frame.window_rect))
+        reader.valid(frame)
+        read.append((time.perf_counter() - t0) * 1000)
+    _report("게시 (memcpy)", publish)
+    _report("봇 읽기 + 채팅 영역 view", read)
+    # /ss 의 나머지 비용은 PNG 인코딩 — 링 사용 여부와 무관하게 동일
+    region = chat_panel_region(rect)
+    samples = []
+    for _ in range(5):
+        t0 = time.perf_counter()
+        Image.fromarray(np.ascontiguousarray(reader.latest().view(region))).save(BytesIO(), format="PNG")
+        samples.append((time.perf_counter() - t0) * 1000)
+    _report("채팅 영역 PNG 인코딩", samples)
+
+
+# ── icons: 감시 tick 당 AUTO_ICONS 매칭 시간 ─────────────────────────────────
+
+def _icon_scene(shape=(1440, 1536, 3)):
+    """2560x1440 창의 우측 60% 탐색 영역을 흉내 낸 프레임 (accept_all, proceed 배치)"""
+    import numpy as np
+    from PIL import Image
+    from capture import Frame
+    from icon_templates import ICON_DIR
+
+    rng = np.random.default_rng(0)
+    pixels = np.full(shape, 31, np.uint8)
+    for y in range(20, shape[0] - 20, 22):   # 텍스트 줄 흉내
+        pixels[y:y + 12, 40:40 + int(rng.integers(200, shape[1] - 80))] = rng.integers(140, 220)
+    for name, (x, y) in (("accept_all", (1300, 1250)), ("proceed", (1420, 1330))):
+        icon = np.asarray(Image.open(os.path.join(ICON_DIR, f"icon_{name}.png")).convert("RGB"))
+        pixels[y:y + icon.shape[0], x:x + icon.shape[1]] = icon
+    return Frame(pixels, 0, 0)
+
+
+def bench_icons(rounds: int = 10) -> None:
+    import numpy as np
+    import icon_templates
+    from icon_templates import TemplateRegistry, ICON_DIR
+
+    names = ["accept_all", "proceed", "run", "scrolldown"]
+    conf = {"accept_all": 0.8, "proceed": 0.95, "run": 0.8, "scrolldown": 0.8}
+    frame = _icon_scene()
+    print(f"[icons] {frame.width}x{frame.height} 탐색 영역, 아이콘 {len(names)}개 ({rounds}회)")
+
+    def timed(label, fn, n=rounds):
+        samples = []
+        for _ in range(n):
+            t0 = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - t0) * 1000)
+        _report(label, samples)
+
+    if icon_templates.cv2 is not None:
+        cv2 = icon_templates.cv2
+        haystack = frame.image()
+
+        def legacy():
+            # pyautogui.locate(path, haystack) 와 같은 순서: 매번 PNG 디코딩 + PIL→배열 변환 + 컬러 매칭
+            for name in names:
+                needle = cv2.imread(os.path.join(ICON_DIR, f"icon_{name}.png"), cv2.IMREAD_COLOR)
+                hay = cv2.cvtColor(np.array(haystack), cv2.COLOR_RGB2BGR)
+                cv2.minMaxLoc(cv2.matchTemplate(hay, needle, cv2.TM_CCOEFF_NORMED))
+        timed("기존 루프 (locate × 4)", legacy)
+
+    registry = TemplateRegistry()
+    found = registry.match(frame, names, confidence=conf)
+    print(f"  찾은 아이콘: {sorted(found)}")
+    expected = icon_templates.screen_dpi_scale() / icon_templates.TEMPLATE_DPI
+    levels = [registry.get(n).candidates(expected)[0] for n in names]
+    timed("원본 해상도 전체 (순차)",
+          lambda: icon_templates.search(icon_templates.to_gray(frame.pixels), levels, workers=1))
+    timed(f"원본 해상도 전체 (배치 {icon_templates.MATCH_WORKERS}스레드)",
+          lambda: icon_templates.search(icon_templates.to_gray(frame.pixels), levels))
+
+    def cold():
+        registry._priors.clear()
+        registry.best(frame, names, confidence=conf)
+    timed("coarse-to-fine (위치 기억 없음)", cold)
+    timed("ROI 우선 (2개 있음, 2개 없음)", lambda: registry.best(frame, names, confidence=conf))
+    timed("ROI 우선 (있는 2개만 감시)", lambda: registry.best(frame, ["accept_all", "proceed"], confidence=conf))
+    rates = registry.hit_rates()
+    print(f"  ROI 적중률 {rates['roi']:.0%}  coarse 적중률 {rates['coarse']:.0%}  ({registry.stats})")
+
+    if icon_templates.cv2 is not None: _check_icons_baseline(names, conf)
+
+    # OpenCV 가 없을 때의 NumPy 경로: 템플릿마다 FFT vs 프레임 FFT 공유
+    saved, icon_templates.cv2 = icon_templates.cv2, None
+    try:
+        gray = icon_templates.to_gray(frame.pixels)
+        timed("NumPy 템플릿별 FFT", lambda: [icon_templates.match_level(gray, lv) for lv in levels], 3)
+        timed("NumPy 프레임 FFT 공유", lambda: icon_templates.search(gray, levels), 3)
+    finally:
+        icon_templates.cv2 = saved
+
+
+_ICON_VARIANTS = {
+    "원본": lambda icon, rng: icon,
+    "회색(비활성)": lambda icon, rng: np_gray3(icon),
+    "색 반전(R↔B)": lambda icon, rng: icon[..., ::-1],
+    "노이즈 σ6": lambda icon, rng: np_clip(icon.astype(float) + rng.normal(0, 6, icon.shape)),
+    "대비 80%": lambda icon, rng: np_clip(icon.astype(float) * 0.8 + 25),
+    "회색 미끼+원본": lambda icon, rng: [np_gray3(icon), icon],   # 축소 점수는 미끼가 더 높음 — 두 번째 후보까지 확인해야 찾음
+    "없음": None,
+}
+
+
+def np_gray3(icon):
+    import numpy as np
+    return np.repeat((icon @ np.array([0.299, 0.587, 0.114]))[..., None], 3, axis=2).astype(np.uint8)
+
+
+def np_clip(a):
+    import numpy as np
+    return np.clip(a, 0, 255).astype(np.uint8)
+
+
+def _check_icons_baseline(names, conf, scenes: int = 12, coarse: bool = True) -> None:
+    """레지스트리 판정이 기존 pyautogui(컬러 TM_CCOEFF_NORMED, 전체 영역) 판정과 같은지 확인
+    — 원본(양성)과 회색/색 반전 등 변형(음성 포함)을 무작위 위치에 넣고 임계값 통과 여부·점수·위치 비교
+    coarse=False 면 1/2 축소 탐색 없이 원본 해상도 점수만 비교"""
+    import numpy as np
+    from PIL import Image
+    from capture import Frame
+    import icon_templates
+    from icon_templates import TemplateRegistry, ICON_DIR, cv2
+
+    icons = {n: np.asarray(Image.open(os.path.join(ICON_DIR, f"icon_{n}.png")).convert("RGB")) for n in names}
+    saved = icon_templates.COARSE_MIN
+    if not coarse: icon_templates.COARSE_MIN = 1 << 16   # 템플릿 로드 시 coarse 단계를 만들지 않음
+    try: registry = TemplateRegistry(); registry.refresh(force=True)
+    finally: icon_templates.COARSE_MIN = saved
+    tally = {v: [0, 0] for v in _ICON_VARIANTS}   # 변형별 [통과, 전체]
+    worst = 0.0
+    for seed in range(scenes):
+        for variant, fn in _ICON_VARIANTS.items():
+            rng = np.random.default_rng(seed)
+            base = _icon_scene().pixels[:720, :768].copy()   # 기본 배치(우하단) 제외, 시간 절약용 1/4 크기
+            placed, taken = {}, []
+            for name in names:
+                if fn is None: break
+                out = fn(icons[name], rng)
+                for icon in out if isinstance(out, list) else [out]:
+                    x, y = int(rng.integers(0, base.shape[1] - icon.shape[1])), int(rng.integers(0, base.shape[0] - icon.shape[0]))
+                    if any(abs(x - px) < 160 and abs(y - py) < 60 for px, py in taken): continue
+                    base[y:y + icon.shape[0], x:x + icon.shape[1]] = icon
+                    taken.append((x, y))
+                    placed[name] = (x, y)
+            frame = Frame(base, 0, 0)
+            registry._priors.clear()
+            got = registry.best(frame, names, confidence=conf)
+            hay = cv2.cvtColor(base, cv2.COLOR_RGB2BGR)
+            for name in names:
+                needle = cv2.cvtColor(icons[name], cv2.COLOR_RGB2BGR)
+                _, score, _, (x, y) = cv2.minMaxLoc(cv2.matchTemplate(hay, needle, cv2.TM_CCOEFF_NORMED))
+                want = score >= conf[name]
+                m = got.get(name)
+                have = m is not None and m.score >= conf[name]
+                assert want == have, f"{variant} seed={seed} {name}: 기존 {score:.3f} / 레지스트리 {m}"
+                if want:
+                    assert (m.x, m.y) == (x, y), f"{variant} seed={seed} {name}: 위치 {(m.x, m.y)} != {(x, y)}"
+                    worst = max(worst, abs(m.score - score))
+                if name in placed:
+                    tally[variant][0] += want
+                    tally[variant][1] += 1
+    assert worst < 1e-3, f"점수 차이 {worst:.4f}"
+    summary = "  ".join(f"{v} {ok}/{n}" for v, (ok, n) in tally.items() if n)
+    print(f"  기존 판정 일치 ({scenes}장면 × {len(_ICON_VARIANTS)}변형, 점수 차 최대 {worst:.1e}) — 통과: {summary}")
+
+
+# ── buttons: 색상 버튼 감지 (1080p / 4K) ─────────────────────────────────────
+
+def _button_scene(w: int, h: int, seed: int = 0):
+    """어두운 편집기 화면 + 구문 강조 같은 작은 색 조각 + 파란/초록 버튼 몇 개"""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    img = np.full((h, w, 3), 30, np.uint8)
+    for _ in range(w * h // 2000):   # 작은 색 글자 조각 (연결 요소 수를 현실적으로)
+        x, y = int(rng.integers(0, w - 12)), int(rng.integers(0, h - 10))
+        img[y:y + int(rng.integers(6, 10)), x:x + int(rng.integers(3, 12))] = rng.choice(
+            [(86, 156, 214), (78, 201, 176), (206, 145, 120), (220, 220, 170)])
+    for i in range(6):
+        x, y = int(rng.integers(0, w - 200)), int(rng.integers(0, h - 40))
+        img[y:y + 28, x:x + 120] = (0, 122, 204) if i % 2 else (40, 160, 60)
+        img[y + 10:y + 18, x + 20:x + 100] = 255   # 버튼 글자
+    return img
+
+
+def _legacy_find_buttons(img, solidity: float = 0.60) -> list:
+    """기존 agent_brain.find_color_buttons (float 마스크 + 요소별 np.sum 루프)"""
+    import numpy as np
+    from scipy import ndimage
+    R, G, B = img[:, :, 0], img[:, :, 1], img[:, :, 2]
+    mask = ((B > 130) & (B > R * 1.5) & (B > G * 1.1)) | ((G > 130) & (G > R * 1.2))
+    labeled, _ = ndimage.label(mask)
+    buttons = []
+    for i, slices in enumerate(ndimage.find_objects(labeled)):
+        if slices is None: continue
+        sy, sx = slices
+        h, w = sy.stop - sy.start, sx.stop - sx.start
+        area = np.sum(labeled[slices] == (i + 1))
+        if w < 40 or h < 20 or w > 350 or h > 80: continue
+        if area < 350 or (w / h) < 1.1 or (w / h) > 7.0: continue
+        if area / (w * h) < solidity: continue
+        buttons.append({"x": sx.start + w // 2, "y": sy.start + h // 2})
+    return buttons
+
+
+def _random_button_scene(seed: int, w: int = 640, h: int = 400):
+    """무작위 회귀 장면 — 경계 근처 크기의 버튼, 겹치거나 붙은 색 영역, 글자 조각"""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    img = np.full((h, w, 3), 30, np.uint8)
+    for _ in range(int(rng.integers(20, 80))):
+        x, y = int(rng.integers(0, w - 12)), int(rng.integers(0, h - 10))
+        img[y:y + int(rng.integers(2, 10)), x:x + int(rng.integers(2, 12))] = rng.choice(
+            [(86, 156, 214), (78, 201, 176), (206, 145, 120)])
+    for _ in range(int(rng.integers(1, 8))):
+        bw, bh = int(rng.integers(30, 360)), int(rng.integers(14, 90))
+        x, y = int(rng.integers(0, max(1, w - bw))), int(rng.integers(0, max(1, h - bh)))
+        if rng.random() < 0.3: color = tuple(int(v) for v in rng.integers(0, 256, 3))
+        else: color = (0, 122, 204) if rng.random() < 0.5 else (40, 160, 60)
+        img[y:y + bh, x:x + bw] = color
+        if rng.random() < 0.7: img[y + bh // 3:y + bh // 3 + max(1, bh // 4), x + bw // 6:x + bw * 5 // 6] = 255
+    return img
+
+
+def _check_buttons_random(scenes: int = 300) -> None:
+    """회귀 검사: 무작위 장면에서 원본/1/2 축소 결과가 기존 find_color_buttons 와 같아야 함"""
+    import color_buttons
+    for seed in range(scenes):
+        img = _random_button_scene(seed)
+        ref = sorted((b["x"], b["y"]) for b in _legacy_find_buttons(img))
+        for downsample in (1, 2):
+            got = sorted((b["x"], b["y"]) for b in color_buttons.find_buttons(img, "brain", downsample=downsample))
+            assert got == ref, f"장면 {seed} downsample={downsample}: 기존 {ref} / 통합 {got}"
+    print(f"  무작위 장면 {scenes}개 — 원본/1/2 축소 모두 기존과 동일 OK")
+
+
+def bench_buttons(rounds: int = 10) -> None:
+    import numpy as np
+    import color_buttons
+
+    for label, (w, h) in (("1080p", (1920, 1080)), ("4K", (3840, 2160))):
+        img = _button_scene(w, h)
+        legacy = _legacy_find_buttons(img)
+        full = color_buttons.find_buttons(img, "brain", downsample=1)
+        fast = color_buttons.find_buttons(img, "brain", downsample=2)
+        same = [(b["x"], b["y"]) for b in legacy] == [(b["x"], b["y"]) for b in full]
+        print(f"[buttons] {label} {w}x{h} — 버튼 기존 {len(legacy)} / 통합 {len(full)} / 축소 {len(fast)} "
+              f"(기존과 동일: {same}, 축소 좌표 동일: {sorted((b['x'], b['y']) for b in fast) == sorted((b['x'], b['y']) for b in full)})")
+        for name, fn in (("기존 (float + 요소별 루프)", lambda: _legacy_find_buttons(img)),
+                         ("통합 (정수 + bincount)", lambda: color_buttons.find_buttons(img, "brain", downsample=1)),
+                         ("통합 + 1/2 축소 1차 탐색", lambda: color_buttons.find_buttons(img, "brain", downsample=2))):
+            samples = []
+            for _ in range(rounds):
+                t0 = time.perf_counter()
+                fn()
+                samples.append((time.perf_counter() - t0) * 1000)
+            _report(name, samples)
+
+        # 라벨링만 비교 — SciPy ndimage vs NumPy 런 길이 + union-find (SciPy 미설치 환경 대체 경로)
+        masks = (("원본", color_buttons.button_mask(img)), ("1/2", color_buttons.button_mask(img[::2, ::2])))
+        for scale, mask in masks:
+            ref = color_buttons.component_stats(mask)
+            runs = color_buttons.label_runs(mask)
+            same = np.array_equal(ref[0], runs[0]) and np.array_equal(ref[1], runs[1])
+            print(f"  라벨링 {scale} 마스크 — 요소 {len(ref[1])}개, 결과 동일: {same}")
+            for name, fn in (("SciPy ndimage.label", lambda: color_buttons.component_stats(mask)),
+                             ("NumPy 런 + union-find", lambda: color_buttons.label_runs(mask))):
+                samples = []
+                for _ in range(rounds):
+                    t0 = time.perf_counter()
+                    fn()
+                    samples.append((time.perf_counter() - t0) * 1000)
+                _report(name, samples)
+    _check_buttons_random()
+
+
+# ── tracker: 감지기(A 아이콘 / C 색상) 간 중복 클릭 ─────────────────────────
+
+def bench_tracker(buttons: int = 200, linger: int = 3) -> None:
+    """버튼이 나타나고 클릭 후에도 linger tick 동안 화면에 남는(UI 지연) 시나리오 — 1 tick = 1초
+    기존: 아이콘 이름별 cooldown 만 있고 색상 감지는 cooldown 없음 / 추적기: 버튼별 cooldown 을 두 감지기가 공유"""
+    import numpy as np
+    from button_tracker import ButtonTracker
+
+    rng = np.random.default_rng(0)
+    CLICK_COST = 0.15 + 0.3   # moveTo duration + 클릭 후 sleep (초) — 이후 재캡처 1회 별도
+    legacy_clicks = tracked_clicks = 0
+    last_click, tracker = {}, ButtonTracker(cooldown=5.0)
+    now, samples = 0.0, []
+    for _ in range(buttons):
+        x, y = int(rng.integers(1200, 1800)), int(rng.integers(100, 900))
+        for tick in range(linger + 1):
+            now += 1.0
+            jitter = int(rng.integers(-2, 3))
+            icon_box, color_box = (x + 8 + jitter, y + 4, 20, 20), (x + jitter, y, 90, 28)
+            # 기존 로직
+            if now - last_click.get("accept_all", 0) >= 5.0:
+                last_click["accept_all"] = now
+                legacy_clicks += 1
+            legacy_clicks += 1   # 색상 감지는 남아 있는 버튼을 매 tick 클릭
+            # 추적기
+            t0 = time.perf_counter()
+            for source, box, label in (("icon", icon_box, "accept_all"), ("color", color_box, None)):
+                track = tracker.update(source, [box], [label] if label else None, now=now)[0]
+                if tracker.ready(track, now=now):
+                    tracker.acted(track, now=now)
+                    tracked_clicks += 1
+            samples.append((time.perf_counter() - t0) * 1000)
+        now += 10.0   # 다음 버튼은 충분히 뒤에 나타남
+
+    print(f"[tracker] 버튼 {buttons}개 (클릭 후 {linger} tick 잔류)")
+    print(f"  기존 (이름별 cooldown)   클릭 {legacy_clicks:5d}회 | 낭비 {(legacy_clicks - buttons) * CLICK_COST:7.1f}s")
+    print(f"  추적기 (버튼별, 공유)    클릭 {tracked_clicks:5d}회 | 낭비 {(tracked_clicks - buttons) * CLICK_COST:7.1f}s "
+          f"| 억제 {tracker.stats['suppressed']} | 트랙 {tracker.stats['tracks']}")
+    _report("tick 당 추적 비용", samples)
+
+
+# ── ocrcache: 줄 해시 캐시 적중률 (에이전트가 답변을 이어 쓰는 채팅 패널) ────
+
+def _chat_panel_frames(count: int = 60, size=(900, 1200), seed: int = 0):
+    """스크롤되는 채팅 패널: 스냅샷마다 마지막 줄에 글자가 붙거나 새 줄 0~3개가 추가됨 (글자 = 무작위 7x14 패턴)"""
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    w, h = size
+    lines, frames = [], []
+    glyph = lambda: (rng.random((14, 7)) < 0.45).astype(np.uint8) * 190
+    for _ in range(count):
+        if lines and rng.random() < 0.6:
+            lines[-1] = np.hstack([lines[-1]] + [glyph() for _ in range(int(rng.integers(3, 12)))])[:, :w - 40]
+        for _ in range(int(rng.integers(0, 4))):
+            lines.append(np.hstack([glyph() for _ in range(int(rng.integers(10, 110)))])[:, :w - 40])
+        panel = np.full((h, w, 3), 30, np.uint8)
+        shown = lines[-(h // 22 - 1):]
+        for i, line in enumerate(shown):
+            y = 10 + i * 22
+            panel[y:y + 14, 20:20 + line.shape[1]] = np.maximum(line, 30)[..., None]
+        frames.append(panel)
+    return frames
+
+
+def _check_tall_strips() -> None:
+    """회귀 검사: 칠해진 영역(코드 블록)은 줄별로 나뉘고, 나눠지지 않는 높은 영역(이미지)은 readtext 조각으로 감"""
+    import numpy as np
+    from concurrent.futures import Future
+    from ocr_cache import IncrementalOcr, LineCache, line_strips
+
+    rng = np.random.default_rng(1)
+    text = lambda: (rng.random((14, 400)) < 0.45).astype(np.uint8) * 190 + 30
+    panel = np.full((400, 600, 3), 30, np.uint8)
+    for y in (10, 32):
+        panel[y:y + 14, 20:420] = text()[..., None]
+    panel[60:160, 10:590] = 90   # 코드 블록 배경 (패널 배경과 INK_DELTA 이상 차이)
+    for y in (66, 88, 110, 132):
+        panel[y:y + 14, 20:420] = np.where(text() > 30, 230, 90).astype(np.uint8)[..., None]
+    panel[180:300, 20:300] = rng.integers(0, 256, (120, 280, 1), dtype=np.uint8)   # 빈 행이 없는 이미지
+    panel[320:334, 20:420] = text()[..., None]
+    strips = line_strips(panel[..., 1])
+    inside = [s for s in strips if 60 <= s[0] and s[1] <= 160]
+    assert len(inside) == 4, f"코드 블록이 줄별로 나뉘지 않음: {strips}"
+
+    class Recorder:
+        processes = 1
+
+        def submit_many(self, parts, key=None, method="readtext", scale=1.0, then=None):
+            self.parts, self.method = parts, method
+            fut = Future()
+            fut.set_result(then([[] for _ in parts]))
+            return fut
+
+    worker = Recorder()
+    IncrementalOcr(worker, LineCache(budget=0, disk_path=""), boxes=True, bands=1).submit(panel).result()
+    assert worker.method == "recognize" and len(worker.parts) == 2 and worker.parts[-1][2] == "readtext", \
+        "높은 줄이 readtext 조각으로 분리되지 않음"
+    assert worker.parts[-1][0].shape[0] >= 120 and worker.parts[0][1]["horizontal_list"], "조각 구성이 잘못됨"
+    print(f"  높은 줄 검사: 코드 블록 → 줄 {len(inside)}개, 이미지 영역 → readtext 조각 OK")
+
+
+def bench_ocrcache(count: int = 60) -> None:
+    """OCR 자체는 측정하지 않음 — 줄 분할/해시 비용과 워커로 보내야 하는 줄(행) 비율만 측정"""
+    from ocr_cache import LineCache, line_strips, strip_key, background_level, build_mosaic
+
+    frames = _chat_panel_frames(count)
+    cache = LineCache()
+    samples, total_lines, sent_lines, total_rows, sent_rows = [], 0, 0, 0, 0
+    for panel in frames:
+        t0 = time.perf_counter()
+        gray = panel[..., 1]
+        strips = line_strips(gray, background_level(gray))
+        keys = [strip_key(gray[y0:y1]) for y0, y1 in strips]
+        missing = [(k, s) for k, s in zip(keys, strips) if cache.get(k) is None]
+        samples.append((time.perf_counter() - t0) * 1000)
+        cache.put({k: {"scale": 2.0, "lines": []} for k, _ in missing})   # 인식 결과 자리 (이 벤치에서는 빈 결과)
+        total_lines += len(strips)
+        sent_lines += len(missing)
+        total_rows += sum(y1 - y0 for y0, y1 in strips)
+        sent_rows += sum(y1 - y0 for _, (y0, y1) in missing)
+    first = len(line_strips(frames[0][..., 1]))
+    print(f"[ocrcache] 스냅샷 {count}장 {frames[0].shape[1]}x{frames[0].shape[0]} — 줄 {total_lines}개")
+    print(f"  전체 OCR (기존)       줄 {total_lines:5d}개 / 행 {total_rows:7d}px (100%)")
+    print(f"  줄 캐시               줄 {sent_lines:5d}개 / 행 {sent_rows:7d}px ({sent_rows / max(1, total_rows):.1%}) "
+          f"| 첫 스냅샷 제외 적중률 {1 - (sent_lines - first) / max(1, total_lines - first):.1%}")
+    print(f"  캐시 {len(cache)}줄 {cache.bytes:,}B | {cache.stats}")
+    _report("분할 + 해시 + 조회", samples)
+
+    # 줄 박스: 캐시가 비어 있어도 확대/인식할 픽셀은 글자 구간뿐 (검출 단계 생략)
+    panel = frames[-1]
+    gray = panel[..., 1]
+    bg = background_level(gray)
+    samples = []
+    for _ in range(10):
+        t0 = time.perf_counter()
+        mosaic, _, boxes = build_mosaic(panel, gray, line_strips(gray, bg), bg, boxes=True)
+        samples.append((time.perf_counter() - t0) * 1000)
+    box_px = sum((b[1] - b[0]) * (b[3] - b[2]) for b in boxes)
+    print(f"  2.0x 확대 픽셀: 패널 전체 {panel.shape[0] * panel.shape[1] * 4:,} → mosaic {mosaic.shape[0] * mosaic.shape[1] * 4:,} "
+          f"({mosaic.shape[0] * mosaic.shape[1] / (panel.shape[0] * panel.shape[1]):.1%}) | 줄 박스 {len(boxes)}개 {box_px * 4:,}px")
+    _report("줄 박스 검출 + mosaic", samples)
+    _check_tall_strips()
+
+
+# ── ocrtext: 교정표 / 블랙리스트 적용 (순차 replace vs 컴파일된 단일 패스) ──
+
+def bench_ocrtext(rounds: int = 50, big: int = 5000) -> None:
+    import random
+    from ocr_text import load_rules, TextRules
+
+    rules = load_rules()
+    rng = random.Random(0)
+    vocab = list(rules.corrections) + list(rules.keep) + ["파일을", "저장", "했습니다", "the", "build", "완료", "테스트", "로그"] * 6
+    blocks = [" ".join(rng.choice(vocab) for _ in range(rng.randint(3, 9))) for _ in range(120)]
+    text = "\n".join(blocks)
+    # 많이 커진 교정표 가정: 기존 규칙 + 무작위 오인식 쌍 big 개 (한글 2~5자)
+    syllables = [chr(c) for c in range(0xAC00, 0xAC00 + 400)]
+    extra = {"".join(rng.choice(syllables) for _ in range(rng.randint(2, 5))): "교정" for _ in range(big)}
+    big_rules = TextRules(dict(extra, **rules.corrections), rules.blacklist + list(extra)[:big // 10], rules.keep)
+
+    def legacy_correct(table, t):
+        for wrong, right in table.items(): t = t.replace(wrong, right)
+        return t
+
+    def legacy_blocked(blacklist, t):
+        return any(bl.lower() in t.lower() for bl in blacklist)
+
+    def run(label, fn):
+        samples = []
+        for _ in range(rounds):
+            t0 = time.perf_counter()
+            fn()
+            samples.append((time.perf_counter() - t0) * 1000)
+        _report(label, samples)
+
+    legacy, fast = legacy_correct(rules.corrections, text), rules.correct(text)
+    diff = sum(1 for a, b in zip(legacy.split("\n"), fast.split("\n")) if a != b)
+    print(f"[ocrtext] 텍스트 {len(text):,}자 / 블록 {len(blocks)}개 — 교정 {len(rules.corrections)}개, 블랙리스트 {len(rules.blacklist)}개")
+    print(f"  결과가 다른 블록 {diff}개 (순차 replace 의 순서 의존/이중 교정: 예 '습I니다' → {legacy_correct(rules.corrections, '습I니다')!r} vs {rules.correct('습I니다')!r})")
+    run("교정 — 순차 replace", lambda: legacy_correct(rules.corrections, text))
+    run("교정 — 컴파일 단일 패스", lambda: rules.correct(text))
+    run("블랙리스트 — lower() 반복", lambda: [legacy_blocked(rules.blacklist, b) for b in blocks])
+    run("블랙리스트 — 컴파일 정규식", lambda: [rules.blocked(b) for b in blocks])
+    print(f"  교정표 {len(big_rules.corrections):,}개 / 블랙리스트 {len(big_rules.blacklist):,}개로 확장")
+    run("교정 — 순차 replace", lambda: legacy_correct(big_rules.corrections, text))
+    run("교정 — 컴파일 단일 패스", lambda: big_rules.correct(text))
+    run("블랙리스트 — lower() 반복", lambda: [legacy_blocked(big_rules.blacklist, b) for b in blocks])
+    run("블랙리스트 — 컴파일 정규식", lambda: [big_rules.blocked(b) for b in blocks])
+    t0 = time.perf_counter()
+    TextRules(big_rules.corrections, big_rules.blacklist, big_rules.keep)
+    print(f"  확장 규칙 컴파일 (파일 변경 시 1회): {(time.perf_counter() - t0) * 1000:.1f}ms")
+
+
+# ── ocrprofile: 지연 시간 예산에 따른 프로필 선택 (가짜 워커: 확대 후 픽셀 수에 비례해 대기) ──
+
+def bench_ocrprofile(count: int = 40, budget_ms: float = 150.0, ms_per_mpx: float = 300.0) -> None:
+    """EasyOCR 없이 선택 로직만 측정 — 워커 지연 = mosaic 픽셀 x 배율^2 x ms_per_mpx"""
+    from concurrent.futures import Future
+    from ocr_cache import IncrementalOcr
+    from ocr_profile import AdaptiveOcr, ORDER
+
+    class SleepyWorker:
+        processes = 1
+
+        def submit_many(self, parts, key=None, method="readtext", scale=1.0, then=None):
+            time.sleep(sum(img.shape[0] * img.shape[1] for img, *_ in parts) * scale ** 2 / 1e6 * ms_per_mpx / 1000)
+            fut = Future()
+            fut.set_result(then([[] for _ in parts]) if then else [[] for _ in parts])
+            return fut
+
+    frames = _chat_panel_frames(count, size=(900, 2400))
+    fixed = IncrementalOcr(SleepyWorker(), boxes=False)
+    baseline = []
+    for panel in frames:
+        t0 = time.perf_counter()
+        fixed.submit(panel).result()   # 기존: 항상 2.0배 전체 패널
+        baseline.append((time.perf_counter() - t0) * 1000)
+    print(f"[ocrprofile] 스냅샷 {count}장 {frames[0].shape[1]}x{frames[0].shape[0]} — 가짜 워커 {ms_per_mpx:.0f}ms/Mpx")
+    _report("기존 (accurate 고정)", baseline)
+    for budget in (budget_ms, budget_ms / 3):
+        ocr = AdaptiveOcr(IncrementalOcr(SleepyWorker(), boxes=False), budget_ms=budget)
+        by_profile = {name: [] for name in ORDER}
+        picks = []
+        for n, panel in enumerate(frames):
+            if n == count // 2:   # 수동 /ocr 은 자동 선택 상태(last)를 바꾸지 않아야 함
+                before = ocr.last
+                assert ocr.submit(panel, profile="accurate").result() is not None and ocr.last == before
+            t0 = time.perf_counter()
+            fut = ocr.submit(panel)
+            fut.result()
+            by_profile[fut.profile].append((time.perf_counter() - t0) * 1000)
+            picks.append(fut.profile)
+        samples = [ms for v in by_profile.values() for ms in v]
+        switches = sum(a != b for a, b in zip(picks, picks[1:]))
+        print(f"  예산 {budget:.0f}ms — 선택: " + ", ".join(f"{name} {len(v)}회" for name, v in by_profile.items())
+              + f" | 전환 {switches}회 | 예산 초과 {sum(ms > budget for ms in samples)}회 (고정 accurate "
+              f"{sum(ms > budget for ms in baseline)}회) | 예상 시간 {ocr.status()['expect_ms']}")
+        _report(f"예산 {budget:.0f}ms 자동 선택", samples)
+
+
+BENCHES = {
+    "mailbox": bench_mailbox,
+    "queue": bench_queue,
+    "outbound": bench_outbound,
+    "scheduler": bench_scheduler,
+    "protocol": bench_protocol,
+    "capture": bench_capture,
+    "ring": bench_ring,
+    "icons": bench_icons,
+    "buttons": bench_buttons,
+    "tracker": bench_tracker,
+    "ocrcache": bench_ocrcache,
+    "ocrtext": bench_ocrtext,
+    "ocrprofile": bench_ocrprofile,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or []
+    if not names:
+        print("사용법: python bench.py <" + "|".join(BENCHES) + "|all>")
+        sys.exit(0)
+    if names == ["all"]: names = list(BENCHES)
+    for name in names:
+        BENCHES[name]()
@@ -0,0 +1,161 @@
+"""
+brain_rpc.py — antigravity_bot ↔ agent_brain 로컬 RPC 버스
+mailbox 파일 폴링이나 봇 프로세스 안에서 agent_brain을 다시 import하는 대신,
+실행 중인 Brain에 localhost TCP로 스냅샷/OCR을 요청하고 결과를 스트리밍으로 받습니다.
+포트에는 인증이 없으므로 읽기 전용 메서드만 엽니다 — 클릭/입력은 mailbox 명령(Telegram authorized() 확인)으로만.
+(numpy/scipy/pyautogui/easyocr 모델은 Brain 프로세스에 하나만 로드됨)
+
+프레임: [헤더 길이 4B][본문 길이 4B][JSON 헤더][바이너리 본문(이미지 등)]
+- 요청: {"id", "method", "params"}
+- 응답: {"id", "event": {...}} 를 0개 이상 보낸 뒤 {"id", "result": ...} 또는 {"id", "error": "..."}
+"""
+import os
+import json
+import struct
+import socket
+import asyncio
+import threading
+import traceback
+import socketserver
+
+RPC_HOST = "127.0.0.1"
+RPC_PORT = int(os.getenv("BRAIN_RPC_PORT", "47720"))
+MAX_FRAME = 64 * 1024 * 1024
+CONNECT_TIMEOUT = 3.0
+
+_HEADER = struct.Struct(">II")
+
+
+class RpcError(Exception):
+    """Brain 쪽 핸들러가 실패했거나 연결할 수 없을 때"""
+
+
+def encode_frame(header: dict, blob: bytes = b"") -> bytes:
+    head = json.dumps(header, ensure_ascii=False).encode("utf-8")
+    return _HEADER.pack(len(head), len(blob)) + head + blob
+
+
+def _decode_sizes(prefix: bytes):
+    head_len, blob_len = _HEADER.unpack(prefix)
+    if head_len + blob_len > MAX_FRAME:
+        raise RpcError(f"프레임이 너무 큽니다: {head_len + blob_len} bytes")
+    return head_len, blob_len
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk: raise ConnectionError("RPC 연결이 끊어졌습니다.")
+        buf += chunk
+    return bytes(buf)
+
+
+def read_frame(sock: socket.socket):
+    head_len, blob_len = _decode_sizes(_recv_exact(sock, _HEADER.size))
+    header = json.loads(_recv_exact(sock, head_len))
+    return header, _recv_exact(sock, blob_len) if blob_len else b""
+
+
+async def read_frame_async(reader: asyncio.StreamReader):
+    head_len, blob_len = _decode_sizes(await reader.readexactly(_HEADER.size))
+    header = json.loads(await reader.readexactly(head_len))
+    return header, await reader.readexactly(blob_len) if blob_len else b""
+
+
+# ── 서버 (agent_brain) ───────────────────────────────────────────────────────
+
+class BrainRpcServer(socketserver.ThreadingTCPServer):
+    """handlers: {method: fn(params)}
+    fn은 결과를 바로 return 하거나, (event, blob) 을 yield 하는 제너레이터일 수 있습니다.
+    제너레이터의 return 값이 최종 result 가 됩니다."""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, handlers: dict, host: str = RPC_HOST, port: int = RPC_PORT):
+        self.handlers = handlers
+        super().__init__((host, port), _RpcHandler)
+
+
+class _RpcHandler(socketserver.BaseRequestHandler):
+    def handle(self) -> None:
+        sock = self.request
+        while True:
+            try:
+                req, _ = read_frame(sock)
+            except (ConnectionError, OSError, ValueError, RpcError):
+                return
+            req_id = req.get("id")
+            try:
+                handler = self.server.handlers.get(req.get("method"))
+                if handler is None: raise RpcError(f"알 수 없는 메서드: {req.get('method')}")
+                out = handler(req.get("params") or {})
+                if hasattr(out, "__next__"):
+                    while True:
+                        try: event, blob = next(out)
+                        except StopIteration as stop:
+                            out = stop.value
+                            break
+                        sock.sendall(encode_frame({"id": req_id, "event": event}, blob or b""))
+                sock.sendall(encode_frame({"id": req_id, "result": out}))
+            except (ConnectionError, BrokenPipeError):
+                return
+            except Exception as e:
+                traceback.print_exc()
+                try: sock.sendall(encode_frame({"id": req_id, "error": str(e) or type(e).__name__}))
+                except OSError: return
+
+
+def start_server(handlers: dict, host: str = RPC_HOST, port: int = RPC_PORT):
+    """백그라운드 스레드에서 RPC 서버 시작 (포트 사용 중이면 None)"""
+    try:
+        server = BrainRpcServer(handlers, host, port)
+    except OSError as e:
+        print(f"⚠️ Brain RPC 서버 시작 실패 (port {port}): {e}")
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"🔌 [Brain RPC] {host}:{port} 대기 중")
+    return server
+
+
+# ── 클라이언트 (antigravity_bot) ────────────────────────────────────────────
+
+async def stream(method: str, params: dict = None, timeout: float = 120.0,
+                 host: str = RPC_HOST, port: int = RPC_PORT):
+    """(event, blob) 을 도착 순서대로 yield 하고, 마지막에 ({"type": "result", "value": ...}, b"") 를 yield
+    연결 실패/끊김/시간 초과는 모두 RpcError 로 올림 (호출 쪽은 RpcError 하나만 처리하면 됨)"""
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), CONNECT_TIMEOUT)
+    except (OSError, asyncio.TimeoutError) as e:
+        raise RpcError(f"Brain에 연결할 수 없습니다 (agent_brain.py 실행 중인지 확인): {e}") from e
+    try:
+        try:
+            writer.write(encode_frame({"id": 1, "method": method, "params": params or {}}))
+            await writer.drain()
+        except OSError as e:
+            raise RpcError(f"Brain에 요청을 보내지 못했습니다: {e}") from e
+        while True:
+            try:
+                header, blob = await asyncio.wait_for(read_frame_async(reader), timeout)
+            except asyncio.IncompleteReadError as e:
+                raise RpcError("Brain 연결이 응답 도중 끊어졌습니다.") from e
+            except asyncio.TimeoutError as e:
+                raise RpcError(f"Brain 응답 시간 초과 ({timeout:.0f}초)") from e
+            except (OSError, ValueError) as e:   # 연결 재설정 / 깨진 프레임
+                raise RpcError(f"Brain 연결 오류: {e}") from e
+            if "error" in header: raise RpcError(header["error"])
+            if "result" in header:
+                yield {"type": "result", "value": header["result"]}, b""
+                return
+            yield header.get("event") or {}, blob
+    finally:
+        writer.close()
+
+
+async def call(method: str, params: dict = None, timeout: float = 120.0):
+    """스트리밍 이벤트는 무시하고 최종 결과만 반환"""
+    result = None
+    async for event, _ in stream(method, params, timeout):
+        if event.get("type") == "result": result = event["value"]
+    return result
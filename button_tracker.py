@@ -0,0 +1,99 @@
+"""
+button_tracker.py — 프레임 간 버튼 추적 + 감지기 간 클릭 중복 제거
+아이콘 매칭(A)과 색상 감지(C)가 찾은 버튼 박스(화면 좌표)를 IoU 로 기존 트랙에 이어 붙여
+같은 버튼에 프레임이 바뀌어도 같은 id 를 부여하고, 이미 클릭한 버튼은 감지기와 상관없이 cooldown 동안 다시 누르지 않습니다.
+- 아이콘 박스는 버튼보다 작을 수 있으므로 IoU 가 낮아도 한 박스의 중심이 다른 박스 안에 있으면 같은 버튼으로 봄
+- forget_after 초 동안 다시 보이지 않은 트랙은 삭제 (클릭한 트랙은 cooldown 이 끝날 때까지 유지)
+- 창이 이동/크기 변경되면 reset() — 화면 좌표가 무의미해짐
+"""
+import time
+import itertools
+
+import numpy as np
+
+IOU_MATCH = 0.5       # 이 이상 겹치면 같은 버튼
+COOLDOWN = 5.0        # 클릭 후 같은 버튼을 다시 누르지 않는 시간 (초)
+FORGET_AFTER = 10.0   # 이 시간 동안 안 보인 트랙은 삭제 (초)
+
+
+def iou_matrix(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """(x, y, w, h) 박스 배열 a[n], b[m] → IoU 행렬 [n, m]"""
+    ax0, ay0 = a[:, None, 0], a[:, None, 1]
+    ax1, ay1 = ax0 + a[:, None, 2], ay0 + a[:, None, 3]
+    bx0, by0 = b[None, :, 0], b[None, :, 1]
+    bx1, by1 = bx0 + b[None, :, 2], by0 + b[None, :, 3]
+    iw = np.clip(np.minimum(ax1, bx1) - np.maximum(ax0, bx0), 0, None)
+    ih = np.clip(np.minimum(ay1, by1) - np.maximum(ay0, by0), 0, None)
+    inter = iw * ih
+    union = a[:, None, 2] * a[:, None, 3] + b[None, :, 2] * b[None, :, 3] - inter
+    return inter / np.maximum(union, 1)
+
+
+def _center_inside(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """a[i] 의 중심이 b[j] 안에 있거나 그 반대면 True — [n, m]"""
+    def inside(p, q):
+        cx, cy = p[:, None, 0] + p[:, None, 2] / 2, p[:, None, 1] + p[:, None, 3] / 2
+        return (q[None, :, 0] <= cx) & (cx < q[None, :, 0] + q[None, :, 2]) & \
+               (q[None, :, 1] <= cy) & (cy < q[None, :, 1] + q[None, :, 3])
+    return inside(a, b) | inside(b, a).T
+
+
+class ButtonTracker:
+    def __init__(self, iou: float = IOU_MATCH, cooldown: float = COOLDOWN, forget_after: float = FORGET_AFTER):
+        self.iou = iou
+        self.cooldown = cooldown
+        self.forget_after = forget_after
+        self.tracks: list = []   # {"id", "box", "source", "label", "first_seen", "last_seen", "acted_at", "hits"}
+        self._ids = itertools.count(1)
+        self.stats = {"tracks": 0, "matched": 0, "acted": 0, "suppressed": 0}
+
+    def reset(self) -> None:
+        self.tracks.clear()
+
+    def _expire(self, now: float) -> None:
+        self.tracks = [tr for tr in self.tracks
+                       if now - tr["last_seen"] < self.forget_after or now - tr["acted_at"] < self.cooldown]
+
+    def update(self, source: str, boxes: list, labels: list = None, now: float = None) -> list:
+        """감지 결과 boxes[(x, y, w, h), ...] (화면 좌표) → 같은 순서의 트랙 목록
+        기존 트랙과 겹치면 그 트랙을 갱신하고(id 유지), 아니면 새 트랙을 만듦. 한 호출 안에서 트랙 하나는 박스 하나에만 대응"""
+        now = time.time() if now is None else now
+        self._expire(now)
+        if not boxes: return []
+        labels = labels or [source] * len(boxes)
+        result = [None] * len(boxes)
+        if self.tracks:
+            a = np.array(boxes, np.float64)
+            b = np.array([tr["box"] for tr in self.tracks], np.float64)
+            score = iou_matrix(a, b)
+            score = np.where((score < self.iou) & _center_inside(a, b), self.iou, score)
+            # 점수가 높은 쌍부터 배정 (greedy)
+            taken = set()
+            for i, j in zip(*np.unravel_index(np.argsort(-score, axis=None), score.shape)):
+                if score[i, j] < self.iou: break
+                if result[i] is not None or j in taken: continue
+                result[i] = self.tracks[j]
+                taken.add(j)
+                self.stats["matched"] += 1
+        for i, box in enumerate(boxes):
+            tr = result[i]
+            if tr is None:
+                tr = {"id": next(self._ids), "first_seen": now, "acted_at": float("-inf"), "hits": 0}
+                self.tracks.append(tr)
+                self.stats["tracks"] += 1
+            tr.update(box=tuple(int(v) for v in box), source=source, label=labels[i], last_seen=now)
+            tr["hits"] += 1
+            result[i] = tr
+        return result
+
+    def ready(self, track: dict, now: float = None) -> bool:
+        """클릭해도 되는지 — 어느 감지기에서든 cooldown 안에 이미 누른 버튼이면 False"""
+        now = time.time() if now is None else now
+        if now - track["acted_at"] < self.cooldown:
+            self.stats["suppressed"] += 1
+            return False
+        return True
+
+    def acted(self, track: dict, now: float = None) -> None:
+        track["acted_at"] = time.time() if now is None else now
+        self.stats["acted"] += 1
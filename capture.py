@@ -0,0 +1,343 @@
+"""
+capture.py — 화면 프레임 획득
+감시 루프 한 번(tick)에 창 영역을 한 번만 캡처하고, 아이콘 매칭/색상 버튼 감지/변화 감지는
+모두 그 프레임의 view(복사 없는 numpy 슬라이스)에서 수행합니다.
+
+캡처 소스는 교체 가능합니다 (CAPTURE_BACKEND 환경변수):
+- auto       : Windows → gdi, 그 외 → mss, 둘 다 없으면 pyautogui
+- pyautogui  : 기존 pyautogui.screenshot 경로
+- gdi        : Win32 BitBlt 직접 호출 (pywin32)
+- mss        : mss 패키지 (Linux 는 X11 MIT-SHM, Windows 는 BitBlt)
+- dxcam      : Windows Desktop Duplication API (dxcam 패키지)
+- replay:DIR : record_frames() 로 저장한 프레임 시퀀스 재생 (화면 없이 벤치마크/회귀 테스트)
+"""
+import os
+import sys
+import json
+import time
+import threading
+
+import numpy as np
+from PIL import Image
+
+CAPTURE_BACKEND = os.getenv("CAPTURE_BACKEND", "auto")
+
+
+class Frame:
+    """화면 좌표 (left, top) 에서 시작하는 RGB 프레임 (H x W x 3, uint8)"""
+
+    def __init__(self, pixels: np.ndarray, left: int, top: int, timestamp: float = None):
+        self.pixels = pixels
+        self.left = left
+        self.top = top
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    @property
+    def width(self) -> int:
+        return self.pixels.shape[1]
+
+    @property
+    def height(self) -> int:
+        return self.pixels.shape[0]
+
+    @property
+    def region(self) -> tuple:
+        return self.left, self.top, self.width, self.height
+
+    def clip(self, region) -> tuple:
+        """화면 좌표 region(x, y, w, h) 을 프레임 안으로 잘라 화면 좌표로 반환 (겹치지 않으면 None)"""
+        return _intersect(region, self.region)
+
+    def view(self, region=None) -> np.ndarray:
+        """region(화면 좌표) 부분의 복사 없는 view. region 이 프레임 밖이면 빈 배열"""
+        if region is None: return self.pixels
+        clipped = self.clip(region)
+        if clipped is None: return self.pixels[:0, :0]
+        x, y, w, h = clipped
+        x -= self.left
+        y -= self.top
+        return self.pixels[y:y + h, x:x + w]
+
+    def image(self, region=None) -> Image.Image:
+        """PIL 이미지가 필요한 곳(PNG 저장, pyautogui.locate 등)용 복사본"""
+        return Image.fromarray(np.ascontiguousarray(self.view(region)))
+
+
+def _intersect(a, b):
+    x0, y0 = max(a[0], b[0]), max(a[1], b[1])
+    x1, y1 = min(a[0] + a[2], b[0] + b[2]), min(a[1] + a[3], b[1] + b[3])
+    if x1 <= x0 or y1 <= y0: return None
+    return x0, y0, x1 - x0, y1 - y0
+
+
+def _copy_into(arr: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    if out is None or out.shape != arr.shape: return np.array(arr)
+    np.copyto(out, arr)
+    return out
+
+
+def _bgra_to_rgb(bgra: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    h, w = bgra.shape[:2]
+    if out is None or out.shape != (h, w, 3): out = np.empty((h, w, 3), np.uint8)
+    out[..., 0] = bgra[..., 2]
+    out[..., 1] = bgra[..., 1]
+    out[..., 2] = bgra[..., 0]
+    return out
+
+
+# ── 캡처 소스 ────────────────────────────────────────────────────────────────
+
+class CaptureSource:
+    """grab(region, out) → 쓰기 가능한 RGB 배열. out 이 같은 크기면 반드시 그 버퍼에 씀"""
+    name = "base"
+
+    def bounds(self) -> tuple:
+        """캡처 가능한 영역 (x, y, w, h)"""
+        raise NotImplementedError
+
+    def grab(self, region, out: np.ndarray = None) -> np.ndarray:
+        raise NotImplementedError
+
+
+class PyAutoGuiSource(CaptureSource):
+    name = "pyautogui"
+
+    def __init__(self):
+        import pyautogui
+        self._pyautogui = pyautogui
+
+    def bounds(self) -> tuple:
+        w, h = self._pyautogui.size()
+        return 0, 0, w, h
+
+    def grab(self, region, out=None):
+        shot = self._pyautogui.screenshot(region=tuple(region)).convert("RGB")
+        arr = np.asarray(shot)
+        return _copy_into(arr, out)
+
+
+class GdiSource(CaptureSource):
+    """데스크톱 DC 에서 BitBlt → DIB 비트를 numpy 로 바로 읽음"""
+    name = "gdi"
+
+    def __init__(self):
+        import win32gui, win32ui, win32con, win32api
+        self._gui, self._ui, self._con, self._api = win32gui, win32ui, win32con, win32api
+
+    def bounds(self) -> tuple:
+        return (0, 0, self._api.GetSystemMetrics(self._con.SM_CXSCREEN),
+                self._api.GetSystemMetrics(self._con.SM_CYSCREEN))
+
+    def grab(self, region, out=None):
+        x, y, w, h = region
+        gui, ui = self._gui, self._ui
+        desktop = gui.GetDesktopWindow()
+        hdc = gui.GetWindowDC(desktop)
+        src = ui.CreateDCFromHandle(hdc)
+        mem = src.CreateCompatibleDC()
+        bmp = ui.CreateBitmap()
+        try:
+            bmp.CreateCompatibleBitmap(src, w, h)
+            mem.SelectObject(bmp)
+            mem.BitBlt((0, 0), (w, h), src, (x, y), self._con.SRCCOPY)
+            bgra = np.frombuffer(bmp.GetBitmapBits(True), np.uint8).reshape(h, w, 4)
+            return _bgra_to_rgb(bgra, out)
+        finally:
+            mem.DeleteDC()
+            src.DeleteDC()
+            gui.ReleaseDC(desktop, hdc)
+            gui.DeleteObject(bmp.GetHandle())
+
+
+class MssSource(CaptureSource):
+    """mss — Linux 에서는 X11 MIT-SHM 공유 메모리 캡처"""
+    name = "mss"
+
+    def __init__(self):
+        import mss
+        self._mss = mss
+        self._local = threading.local()   # mss 인스턴스는 스레드별로 사용해야 함
+
+    @property
+    def _sct(self):
+        sct = getattr(self._local, "sct", None)
+        if sct is None: sct = self._local.sct = self._mss.mss()
+        return sct
+
+    def bounds(self) -> tuple:
+        mon = self._sct.monitors[1]
+        return mon["left"], mon["top"], mon["width"], mon["height"]
+
+    def grab(self, region, out=None):
+        x, y, w, h = region
+        shot = self._sct.grab({"left": x, "top": y, "width": w, "height": h})
+        return _bgra_to_rgb(np.frombuffer(shot.raw, np.uint8).reshape(shot.height, shot.width, 4), out)
+
+
+class DxcamSource(CaptureSource):
+    """Windows Desktop Duplication API (변화가 없으면 직전 프레임 재사용)"""
+    name = "dxcam"
+
+    def __init__(self):
+        import dxcam
+        self._cam = dxcam.create(output_color="RGB")
+        self._last = {}
+
+    def bounds(self) -> tuple:
+        return 0, 0, self._cam.width, self._cam.height
+
+    def grab(self, region, out=None):
+        x, y, w, h = region
+        key = (x, y, w, h)
+        arr = self._cam.grab(region=(x, y, x + w, y + h))
+        if arr is None:   # 화면 변화 없음
+            arr = self._last.get(key)
+            if arr is None: raise RuntimeError("dxcam: 아직 프레임이 없습니다.")
+        self._last[key] = arr
+        return _copy_into(arr, out)
+
+
+class ReplaySource(CaptureSource):
+    """record_frames() 가 만든 디렉터리(frames.json + PNG)를 grab 한 번에 한 프레임씩 재생
+    preload=True 면 모든 프레임을 미리 디코딩해 PNG 디코딩 비용 없이 파이프라인만 측정"""
+    name = "replay"
+
+    def __init__(self, directory: str, loop: bool = False, preload: bool = False):
+        self.directory = directory
+        self.loop = loop
+        meta_path = os.path.join(directory, "frames.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, "r", encoding="utf-8") as f: meta = json.load(f)
+        else:   # 메타 없이 PNG 만 있는 경우: 이름순, 원점 (0, 0)
+            meta = {"origin": [0, 0], "frames": [{"file": n} for n in sorted(os.listdir(directory))
+                                                  if n.lower().endswith(".png")]}
+        if not meta["frames"]: raise FileNotFoundError(f"재생할 프레임이 없습니다: {directory}")
+        self.origin = tuple(meta["origin"])
+        self.frames = meta["frames"]
+        self.index = 0
+        self.exhausted = False
+        self.preload = preload
+        self._cache = {}
+        # 크기는 PNG 헤더만 읽어 한 번 계산 — bounds() 가 _load(0) 로 1프레임 캐시를 비우지 않도록
+        with Image.open(os.path.join(directory, self.frames[0]["file"])) as img: self.size = img.size
+        if preload:
+            for i in range(len(self.frames)): self._load(i)
+
+    def _load(self, i: int) -> np.ndarray:
+        arr = self._cache.get(i)
+        if arr is None:
+            with Image.open(os.path.join(self.directory, self.frames[i]["file"])) as img:
+                arr = np.asarray(img.convert("RGB"))
+            if not self.preload: self._cache.clear()   # 직전 프레임 하나만 보관
+            self._cache[i] = arr
+        return arr
+
+    @property
+    def current(self) -> dict:
+        return self.frames[min(self.index, len(self.frames) - 1)]
+
+    def bounds(self) -> tuple:
+        w, h = self.size
+        return self.origin[0], self.origin[1], w, h
+
+    def grab(self, region, out=None):
+        i = min(self.index, len(self.frames) - 1)
+        full = self._load(i)
+        self.index += 1
+        if self.index >= len(self.frames):
+            if self.loop: self.index = 0
+            else: self.exhausted = True
+        x, y, w, h = region
+        x -= self.origin[0]
+        y -= self.origin[1]
+        arr = full[y:y + h, x:x + w]
+        return _copy_into(arr, out)
+
+
+SOURCES = {
+    "pyautogui": PyAutoGuiSource,
+    "gdi": GdiSource,
+    "mss": MssSource,
+    "dxcam": DxcamSource,
+}
+
+
+def open_source(spec: str = None) -> CaptureSource:
+    """'auto' | 'pyautogui' | 'gdi' | 'mss' | 'dxcam' | 'replay:<디렉터리>'"""
+    spec = spec or CAPTURE_BACKEND
+    if spec.startswith("replay:"): return ReplaySource(spec[len("replay:"):])
+    if spec != "auto": return SOURCES[spec]()
+    for name in (("gdi", "mss") if sys.platform == "win32" else ("mss",)):
+        try: return SOURCES[name]()
+        except ImportError: continue
+    return PyAutoGuiSource()
+
+
+_default_source = None
+
+
+def default_source() -> CaptureSource:
+    global _default_source
+    if _default_source is None: _default_source = open_source()
+    return _default_source
+
+
+class FrameGrabber:
+    """창 영역 캡처 담당 — 같은 크기면 이전 버퍼를 재사용, captures 로 tick 당 캡처 횟수 확인"""
+
+    def __init__(self, source: CaptureSource = None):
+        self.source = source or default_source()
+        self.captures = 0
+        self._buffers = [None, None]   # 두 버퍼를 번갈아 사용 (직전 프레임 view 보호)
+
+    def grab(self, region) -> Frame:
+        # 캡처 가능한 영역 밖으로 나간 부분은 잘라냄
+        clipped = _intersect(tuple(region), self.source.bounds())
+        if clipped is None: raise ValueError(f"캡처 영역이 화면 밖입니다: {region}")
+        slot = self.captures % 2
+        buf = self._buffers[slot]
+        if buf is None or buf.shape != (clipped[3], clipped[2], 3):
+            buf = self._buffers[slot] = np.empty((clipped[3], clipped[2], 3), np.uint8)
+        pixels = self.source.grab(clipped, out=buf)
+        self.captures += 1
+        return Frame(pixels, clipped[0], clipped[1])
+
+
+def screenshot(region=None) -> Image.Image:
+    """pyautogui.screenshot 대체 — 기본 캡처 소스로 PIL 이미지 반환 (region 없으면 전체 화면)"""
+    source = default_source()
+    region = _intersect(tuple(region), source.bounds()) if region else source.bounds()
+    if region is None: raise ValueError("캡처 영역이 화면 밖입니다.")
+    return Image.fromarray(np.ascontiguousarray(source.grab(region)))
+
+
+# ── 녹화 (리플레이용 프레임 시퀀스 저장) ─────────────────────────────────────
+
+def record_frames(region, out_dir: str, count: int, interval: float = 1.0, source: CaptureSource = None) -> None:
+    source = source or default_source()
+    os.makedirs(out_dir, exist_ok=True)
+    region = _intersect(tuple(region), source.bounds())
+    frames = []
+    for i in range(count):
+        t0 = time.time()
+        name = f"frame_{i:05d}.png"
+        Image.fromarray(np.ascontiguousarray(source.grab(region))).save(os.path.join(out_dir, name))
+        frames.append({"file": name, "t": t0})
+        print(f"[*] {name} 저장 ({i + 1}/{count})", end="\r")
+        time.sleep(max(0.0, interval - (time.time() - t0)))
+    with open(os.path.join(out_dir, "frames.json"), "w", encoding="utf-8") as f:
+        json.dump({"origin": list(region[:2]), "frames": frames}, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ {count}개 프레임 저장 완료: {out_dir}")
+
+
+if __name__ == "__main__":
+    # 사용법: python capture.py record <저장 디렉터리> [프레임 수] [간격(초)]
+    #         VS Code 창 전체를 녹화합니다 (창을 못 찾으면 전체 화면)
+    if len(sys.argv) >= 3 and sys.argv[1] == "record":
+        from window_tracker import tracker
+        _, rect, _ = tracker.get(focus=True)
+        region = (rect[0], rect[1], rect[2] - rect[0], rect[3] - rect[1]) if rect else default_source().bounds()
+        record_frames(region, sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else 30,
+                      float(sys.argv[4]) if len(sys.argv) > 4 else 1.0)
+    else:
+        print("사용법: python capture.py record <저장 디렉터리> [프레임 수] [간격(초)]")
@@ -0,0 +1,125 @@
+"""
+change_detector.py — 타일 해시 기반 변화 감지
+프레임을 TILE x TILE 타일로 나누고, 타일마다 행 체크섬(행별 픽셀 합)에 행 가중치를 곱해 더한
+64비트 값을 해시로 씁니다. 한 줄짜리 새 메시지처럼 작은 변화도 놓치지 않고,
+어느 위치가 바뀌었는지 dirty 사각형으로 돌려주므로 후속 단계는 그 부분만 처리하면 됩니다.
+- 깜빡이는 커서처럼 두 상태를 오가는 타일은 두 번째 전환부터 변화로 치지 않습니다.
+- 첫 프레임(또는 reset 직후)은 전체 영역을 dirty 로 돌려줍니다. 이때 baseline 이 True — 화면 전체가 실제로
+  바뀐 경우와 구분할 때는 dirty 모양이 아니라 이 값을 확인
+"""
+import numpy as np
+
+TILE = 32
+BLINK_MIN = 1      # 이전 상태로 되돌아간 횟수가 이만큼 쌓이면 깜빡임으로 보고 무시
+
+
+def _row_weights(tile: int) -> np.ndarray:
+    rng = np.random.default_rng(0x5EED)
+    return rng.integers(1, 1 << 31, tile, dtype=np.int64) | 1   # 홀수 가중치
+
+
+class ChangeDetector:
+    def __init__(self, tile: int = TILE, blink_min: int = BLINK_MIN):
+        self.tile = tile
+        self.blink_min = blink_min
+        self._weights = _row_weights(tile)
+        self.reset()
+        self.stats = {"updates": 0, "dirty_tiles": 0, "blink_suppressed": 0}
+
+    def reset(self) -> None:
+        self.baseline = False   # 직전 update 가 비교 대상 없이 베이스라인만 잡았는지
+        self.shape = None
+        self._state = None      # 타일별 현재 해시
+        self._other = None      # 직전의 다른 해시 (깜빡임 판별용)
+        self._toggles = None    # 두 상태를 오간 횟수
+
+    def hash_tiles(self, pixels: np.ndarray) -> np.ndarray:
+        """(H, W, C) uint8 → 타일 해시 (ceil(H/tile), ceil(W/tile)) int64"""
+        h, w = pixels.shape[:2]
+        channels = pixels.shape[2] if pixels.ndim == 3 else 1
+        flat = np.ascontiguousarray(pixels).reshape(h, w * channels)
+        # 행 체크섬: 타일 열마다 각 행의 (채널 포함) 픽셀 합 — 한 번의 패스
+        # (reduceat 보다 reshape 후 sum 이 몇 배 빠름, 나머지 열만 따로 합산)
+        full = w // self.tile * self.tile * channels
+        rows = flat[:, :full].reshape(h, -1, self.tile * channels).sum(axis=2, dtype=np.uint32)
+        if full < flat.shape[1]:
+            rows = np.hstack([rows, flat[:, full:].sum(axis=1, dtype=np.uint32)[:, None]])
+        rows = rows.astype(np.int64) * self._weights[np.arange(h) % self.tile][:, None]
+        return np.add.reduceat(rows, np.arange(0, h, self.tile), axis=0)
+
+    def update(self, pixels: np.ndarray) -> list:
+        """새 프레임을 반영하고 바뀐 영역 [(x, y, w, h)] (배열 좌표) 반환"""
+        self.stats["updates"] += 1
+        hashes = self.hash_tiles(pixels)
+        h, w = pixels.shape[:2]
+        self.baseline = self._state is None or self.shape != (h, w)
+        if self.baseline:
+            self.shape = (h, w)
+            self._state = hashes
+            self._other = hashes.copy()
+            self._toggles = np.zeros(hashes.shape, np.int32)
+            return [(0, 0, w, h)]
+
+        changed = hashes != self._state
+        if not changed.any(): return []
+        back = changed & (hashes == self._other)       # 직전 상태로 되돌아감
+        fresh = changed & ~back
+        self._toggles[back] += 1
+        self._toggles[fresh] = 0
+        blinking = back & (self._toggles >= self.blink_min)
+        self._other[changed] = self._state[changed]
+        self._state[changed] = hashes[changed]
+
+        dirty = changed & ~blinking
+        self.stats["dirty_tiles"] += int(dirty.sum())
+        self.stats["blink_suppressed"] += int(blinking.sum())
+        return merge_tiles(dirty, self.tile, (h, w))
+
+
+def merge_tiles(mask: np.ndarray, tile: int, shape: tuple) -> list:
+    """dirty 타일 마스크 → 8방향으로 이어진 타일 묶음별 바운딩 사각형 [(x, y, w, h)]"""
+    h, w = shape
+    rows, cols = mask.shape
+    seen = np.zeros_like(mask)
+    rects = []
+    for r0, c0 in zip(*np.nonzero(mask)):
+        if seen[r0, c0]: continue
+        seen[r0, c0] = True
+        stack = [(r0, c0)]
+        top, left, bottom, right = r0, c0, r0, c0
+        while stack:
+            r, c = stack.pop()
+            top, bottom = min(top, r), max(bottom, r)
+            left, right = min(left, c), max(right, c)
+            for nr in (r - 1, r, r + 1):
+                for nc in (c - 1, c, c + 1):
+                    if 0 <= nr < rows and 0 <= nc < cols and mask[nr, nc] and not seen[nr, nc]:
+                        seen[nr, nc] = True
+                        stack.append((nr, nc))
+        x, y = left * tile, top * tile
+        rects.append((int(x), int(y), int(min(w, (right + 1) * tile) - x), int(min(h, (bottom + 1) * tile) - y)))
+    return rects
+
+
+def overlaps(rects: list, region: tuple) -> list:
+    """region 과 겹치는 부분만 잘라서 반환"""
+    out = []
+    for x, y, w, h in rects:
+        x0, y0 = max(x, region[0]), max(y, region[1])
+        x1, y1 = min(x + w, region[0] + region[2]), min(y + h, region[1] + region[3])
+        if x1 > x0 and y1 > y0: out.append((x0, y0, x1 - x0, y1 - y0))
+    return out
+
+
+def bounding(rects: list, pad: int = 0, limit: tuple = None) -> tuple:
+    """사각형들을 감싸는 하나의 사각형 (pad 만큼 확장, limit 영역으로 자름). 비어 있으면 None"""
+    if not rects: return None
+    x0 = min(r[0] for r in rects) - pad
+    y0 = min(r[1] for r in rects) - pad
+    x1 = max(r[0] + r[2] for r in rects) + pad
+    y1 = max(r[1] + r[3] for r in rects) + pad
+    if limit is not None:
+        x0, y0 = max(x0, limit[0]), max(y0, limit[1])
+        x1, y1 = min(x1, limit[0] + limit[2]), min(y1, limit[1] + limit[3])
+        if x1 <= x0 or y1 <= y0: return None
+    return x0, y0, x1 - x0, y1 - y0
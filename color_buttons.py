@@ -0,0 +1,167 @@
+"""
+color_buttons.py — 색상 기반 승인 버튼 감지 (agent_brain / auto_approver 공용)
+파란색/초록색 버튼 영역을 마스크로 만들고 연결 요소 중 버튼 크기/비율/채움률을 만족하는 것만 돌려줍니다.
+- 마스크는 정수 연산만 사용 (B > R*1.5 → 2B > 3R) — float 배열을 만들지 않음
+- 요소별 면적/바운딩 박스는 bincount + find_objects 로 한 번에 구하고 필터도 벡터 연산
+- downsample=2 면 1/2 해상도에서 후보를 먼저 찾고 후보 주변만 원본 해상도로 확인
+  축소 영상에서는 1px 틈이 사라져 요소가 합쳐지므로 후보는 최소 크기만 보고, 최종 판정은 원본에서 기존 경계 그대로.
+  원본 crop 가장자리에 걸려 잘린 (글자 조각보다 큰) 요소가 있으면 crop 을 넓혀 다시 봄 → 결과는 원본 전체 탐색과 같음
+- 호출자별 임계값은 PROFILES 에 정의 (brain: 채움률 0.60, approver: 0.50)
+- SciPy 가 없으면 행별 런(run) 길이 인코딩 + 런 단위 union-find 라벨링(NumPy 전용)으로 같은 통계를 계산
+"""
+import numpy as np
+
+try:
+    from scipy import ndimage
+except ImportError:
+    ndimage = None
+
+PROFILES = {
+    "brain":    {"min_w": 40, "max_w": 350, "min_h": 20, "max_h": 80, "min_area": 350,
+                 "min_ratio": 1.1, "max_ratio": 7.0, "solidity": 0.60, "downsample": 2},
+    "approver": {"min_w": 40, "max_w": 350, "min_h": 20, "max_h": 80, "min_area": 350,
+                 "min_ratio": 1.1, "max_ratio": 7.0, "solidity": 0.50, "downsample": 2},
+}
+REFINE_PAD = 4   # downsample 후보를 원본에서 다시 볼 때 여유 (px)
+
+
+def button_mask(img: np.ndarray) -> np.ndarray:
+    """파란 버튼: B>130, B>1.5R, B>1.1G / 초록 버튼: G>130, G>1.2R — 모두 정수 비교"""
+    r = img[..., 0].astype(np.int16)
+    g = img[..., 1].astype(np.int16)
+    b = img[..., 2].astype(np.int16)
+    blue = (b > 130) & (2 * b > 3 * r) & (10 * b > 11 * g)
+    green = (g > 130) & (5 * g > 6 * r)
+    return blue | green
+
+
+def _runs(mask: np.ndarray):
+    """행마다 True 가 이어진 구간 → (row, start, end) 배열 (행, 열 순으로 정렬됨)"""
+    h, w = mask.shape
+    padded = np.zeros((h, w + 2), np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    return rows, starts, ends
+
+
+def _find_roots(parent: np.ndarray) -> np.ndarray:
+    """pointer jumping — 모든 원소가 자기 루트를 가리킬 때까지"""
+    while True:
+        nxt = parent[parent]
+        if np.array_equal(nxt, parent): return parent
+        parent = nxt
+
+
+def label_runs(mask: np.ndarray):
+    """SciPy 없이 연결 요소(4방향) 통계 계산 — component_stats 와 같은 형식/라벨 순서
+    1) 행별 런 추출  2) 바로 윗행 런과 열 구간이 겹치는 쌍을 searchsorted 로 한 번에 찾음
+    3) 런 단위 union-find (작은 루트로 hook + pointer jumping)  4) 런 통계를 요소별로 집계"""
+    h, w = mask.shape
+    rows, starts, ends = _runs(mask)
+    n = len(rows)
+    if n == 0: return np.zeros((0, 4), np.int64), np.zeros(0, np.int64)
+
+    # 런 i(행 y) 와 런 j(행 y-1) 가 겹침: start_j < end_i 이고 end_j > start_i
+    stride = w + 1
+    lo = np.searchsorted(rows * stride + ends, (rows - 1) * stride + starts, side="right")
+    hi = np.searchsorted(rows * stride + starts, (rows - 1) * stride + ends, side="left")
+    counts = np.maximum(hi - lo, 0)
+    a = np.repeat(np.arange(n), counts)
+    b = np.repeat(lo, counts) + (np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts))
+
+    parent = np.arange(n)
+    while len(a):
+        ra, rb = parent[a], parent[b]
+        merge = ra != rb
+        if not merge.any(): break
+        np.minimum.at(parent, np.maximum(ra, rb)[merge], np.minimum(ra, rb)[merge])
+        parent = _find_roots(parent)
+
+    # 루트 = 요소의 첫 런 (래스터 순서) → ndimage.label 과 같은 라벨 순서
+    roots, comp = np.unique(parent, return_inverse=True)
+    order = np.argsort(comp, kind="stable")
+    bounds = np.searchsorted(comp[order], np.arange(len(roots)))
+    areas = np.bincount(comp, weights=ends - starts).astype(np.int64)
+    boxes = np.stack([rows[roots],
+                      np.maximum.reduceat(rows[order], bounds) + 1,
+                      np.minimum.reduceat(starts[order], bounds),
+                      np.maximum.reduceat(ends[order], bounds)], axis=1).astype(np.int64)
+    return boxes, areas
+
+
+def component_stats(mask: np.ndarray):
+    """연결 요소(4방향) 통계 → (boxes[n, 4] = (y0, y1, x0, x1), areas[n]) — 라벨 순서 유지"""
+    if ndimage is None: return label_runs(mask)
+    labeled, n = ndimage.label(mask)
+    if n == 0: return np.zeros((0, 4), np.int64), np.zeros(0, np.int64)
+    areas = np.bincount(labeled[mask], minlength=n + 1)[1:]   # 전경 픽셀만 셈 (화면 전체 순회보다 수 배 빠름)
+    boxes = np.array([(s[0].start, s[0].stop, s[1].start, s[1].stop) for s in ndimage.find_objects(labeled)])
+    return boxes, areas
+
+
+def _select(boxes: np.ndarray, areas: np.ndarray, p: dict) -> np.ndarray:
+    """프로필 조건을 만족하는 요소의 인덱스 (원본 해상도, 기존 find_color_buttons 와 같은 경계)"""
+    h = boxes[:, 1] - boxes[:, 0]
+    w = boxes[:, 3] - boxes[:, 2]
+    ok = (w >= p["min_w"]) & (h >= p["min_h"]) & (w <= p["max_w"]) & (h <= p["max_h"])
+    ok &= areas >= p["min_area"]
+    ratio = w / np.maximum(h, 1)
+    ok &= (ratio >= p["min_ratio"]) & (ratio <= p["max_ratio"])
+    ok &= areas >= p["solidity"] * w * h
+    return np.nonzero(ok)[0]
+
+
+def _candidates(boxes: np.ndarray, areas: np.ndarray, p: dict, scale: int, slack: float) -> np.ndarray:
+    """축소 영상의 후보 — 최소 크기만 확인 (합쳐진 요소는 크기/비율/채움률이 달라지므로 최대 조건은 원본에서)"""
+    h = (boxes[:, 1] - boxes[:, 0]) * scale
+    w = (boxes[:, 3] - boxes[:, 2]) * scale
+    ok = (w >= p["min_w"] / slack - scale) & (h >= p["min_h"] / slack - scale)
+    ok &= areas * scale * scale >= p["min_area"] / slack
+    return np.nonzero(ok)[0]
+
+
+def _detect(img: np.ndarray, p: dict, stats=None) -> list:
+    boxes, areas = stats if stats is not None else component_stats(button_mask(img))
+    buttons = []
+    for y0, y1, x0, x1 in boxes[_select(boxes, areas, p)]:
+        w, h = int(x1 - x0), int(y1 - y0)
+        buttons.append({"x": int(x0) + w // 2, "y": int(y0) + h // 2, "w": w, "h": h})
+    return buttons
+
+
+def find_buttons(img, profile="brain", downsample: int = None) -> list:
+    """PIL 이미지 또는 RGB 배열에서 버튼 중심 [{"x", "y", "w", "h"}] (이미지 좌표, 위→아래 순)
+    profile: PROFILES 의 이름 또는 같은 키를 가진 dict. downsample 을 주면 프로필 값 대신 사용 (1 = 원본만)"""
+    p = PROFILES[profile] if isinstance(profile, str) else profile
+    img = np.asarray(img)
+    if downsample is None: downsample = p.get("downsample", 1)
+    if downsample <= 1: return _detect(img, p)
+
+    # 1) 축소 영상(복사 없는 stride view)에서 느슨한 조건으로 후보 찾기
+    s = downsample
+    H, W = img.shape[:2]
+    boxes, areas = component_stats(button_mask(img[::s, ::s]))
+    found, seen = [], set()
+    for y0, y1, x0, x1 in boxes[_candidates(boxes, areas, p, scale=s, slack=1.3)]:
+        # 2) 후보 주변만 원본 해상도로 다시 판정 (가장자리에 잘린 큰 요소가 있으면 그쪽으로 넓힘)
+        oy, ox = max(0, int(y0) * s - REFINE_PAD), max(0, int(x0) * s - REFINE_PAD)
+        ey, ex = min(H, int(y1) * s + REFINE_PAD), min(W, int(x1) * s + REFINE_PAD)
+        while True:
+            stats = component_stats(button_mask(img[oy:ey, ox:ex]))
+            b = stats[0]
+            big = (b[:, 3] - b[:, 2] > p["min_w"] // 2) | (b[:, 1] - b[:, 0] > p["min_h"] // 2)
+            grow = [oy > 0 and (big & (b[:, 0] == 0)).any(), ey < H and (big & (b[:, 1] == ey - oy)).any(),
+                    ox > 0 and (big & (b[:, 2] == 0)).any(), ex < W and (big & (b[:, 3] == ex - ox)).any()]
+            if not any(grow): break
+            dy, dx = ey - oy, ex - ox
+            oy, ey = (max(0, oy - dy) if grow[0] else oy), (min(H, ey + dy) if grow[1] else ey)
+            ox, ex = (max(0, ox - dx) if grow[2] else ox), (min(W, ex + dx) if grow[3] else ex)
+        for b in _detect(img[oy:ey, ox:ex], p, stats):
+            key = (ox + b["x"], oy + b["y"])
+            if key in seen: continue
+            seen.add(key)
+            found.append(dict(b, x=key[0], y=key[1]))
+    found.sort(key=lambda b: (b["y"] - b["h"] // 2, b["x"] - b["w"] // 2))   # 위→아래, 왼→오른쪽 (라벨 순서와 유사)
+    return found
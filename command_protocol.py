@@ -0,0 +1,113 @@
+"""
+command_protocol.py — 봇 → Brain 명령 프로토콜 (v1)
+명령은 mailbox에 타입이 있는 봉투(envelope)로 적재됩니다:
+    {"v": 1, "type": "ICON", "args": {"name": "accept_all"}}
+인자에 ':' 나 '__' 가 들어가도 깨지지 않고, 파싱과 디스패치는 각각 dict 조회 한 번입니다.
+기존 '__COMMAND:TYPE:...__' 문자열과 일반 텍스트는 decode() 의 호환 shim 이 변환합니다.
+decode() 는 큐에 들어 있는 어떤 입력에도 예외를 내지 않습니다 — 해석할 수 없으면 INVALID 명령
+(실행 쪽에서 알림만 보내고 ack → 큐가 막히지 않음)
+"""
+import json
+from typing import NamedTuple
+
+PROTOCOL_VERSION = 1
+LEGACY_PREFIX = "__COMMAND:"
+MOBILE_TAG = "[📱MOBILE]"
+INVALID = "INVALID"   # 해석 실패 — args: {"raw": 입력 일부, "error": 사유}
+
+
+class Command(NamedTuple):
+    type: str
+    args: dict
+
+
+def encode(cmd_type: str, **args) -> dict:
+    """mailbox 에 그대로 넣을 수 있는 봉투 생성"""
+    return {"v": PROTOCOL_VERSION, "type": cmd_type, "args": args}
+
+
+def to_json(cmd: Command) -> str:
+    return json.dumps({"v": PROTOCOL_VERSION, "type": cmd.type, "args": cmd.args},
+                      ensure_ascii=False, separators=(",", ":"))
+
+
+# ── 구버전 문자열 호환 ──────────────────────────────────────────────────────
+
+def _legacy_scroll(rest: str) -> dict:
+    parts = rest.split(":")
+    return {"direction": parts[0], "steps": int(parts[1]) if len(parts) > 1 else 1}
+
+
+def _legacy_click(rest: str) -> dict:
+    x, y = rest.split(":")[:2]
+    return {"x": int(x), "y": int(y)}
+
+
+# 봉투 인자 검증/정규화 (실행 단계나 스케줄러 병합에서 int() 가 터지지 않도록 디코드 시점에 확인)
+_ARG_CHECKS = {
+    "SCROLL": lambda args: dict(args, direction=str(args.get("direction", "DOWN")), steps=int(args.get("steps", 1))),
+    "CLICK": lambda args: dict(args, x=int(args["x"]), y=int(args["y"])),
+}
+
+
+_LEGACY_ARGS = {
+    "AUTO_WATCH_ON": lambda rest: {},
+    "AUTO_WATCH_OFF": lambda rest: {},
+    "CLICK_RUN_ONCE": lambda rest: {},
+    "CLICK_RUN_ALL": lambda rest: {},
+    "SCROLL": _legacy_scroll,
+    "CLICK": _legacy_click,
+    "ICON": lambda rest: {"name": rest},
+    "ICON_TYPE": lambda rest: {"text": rest},   # 텍스트는 ':' 로 자르지 않고 통째로
+}
+
+
+def _decode_legacy(raw: str) -> Command:
+    cmd_type, _, rest = raw[len(LEGACY_PREFIX):-2 if raw.endswith("__") else None].partition(":")   # 끝의 '__' 한 번만 제거
+    parse = _LEGACY_ARGS.get(cmd_type)
+    if parse is None: return Command(cmd_type, {"raw": rest})
+    return Command(cmd_type, parse(rest))
+
+
+def _decode_envelope(raw: dict) -> Command:
+    cmd_type, args = raw.get("type", "TEXT"), raw.get("args") or {}
+    if not isinstance(cmd_type, str) or not isinstance(args, dict): raise TypeError("잘못된 봉투 형식")
+    check = _ARG_CHECKS.get(cmd_type)
+    return Command(cmd_type, check(args) if check else args)
+
+
+def _decode(raw) -> Command:
+    # 흔한 순서대로: mailbox 가 JSON 을 풀어 둔 봉투(dict) → 구버전/일반 문자열 (문자열은 접두사 확인만, 파싱은 한 번)
+    if type(raw) is dict: return _decode_envelope(raw)
+    if isinstance(raw, Command): return raw
+    if isinstance(raw, dict): return _decode_envelope(raw)
+    if not isinstance(raw, str): raise TypeError(f"지원하지 않는 입력 타입 {type(raw).__name__}")
+    if raw.startswith(LEGACY_PREFIX): return _decode_legacy(raw)
+    if raw.startswith('{"v":'):
+        try: envelope = json.loads(raw)
+        except ValueError: envelope = None
+        if isinstance(envelope, dict): return _decode_envelope(envelope)
+    if raw.startswith(MOBILE_TAG):
+        return Command("TEXT", {"text": raw[len(MOBILE_TAG):].strip(), "source": "mobile"})
+    return Command("TEXT", {"text": raw})
+
+
+def decode(raw) -> Command:
+    """봉투(dict / JSON 문자열), 구버전 '__COMMAND:...__', 일반 텍스트를 Command 로 변환
+    예외를 내지 않음 — 인자 해석 실패(예: '__COMMAND:CLICK:abc__')는 Command(INVALID, {"raw", "error"})"""
+    try: return _decode(raw)
+    except Exception as e:
+        return Command(INVALID, {"raw": repr(raw)[:200], "error": f"{type(e).__name__}: {e}"})
+
+
+# ── 핸들러 레지스트리 ────────────────────────────────────────────────────────
+
+HANDLERS = {}
+
+
+def command_handler(cmd_type: str, needs_window: bool = True):
+    """@command_handler("ICON") 로 등록. needs_window 이면 VS Code 창 좌표를 함께 넘겨받음"""
+    def register(fn):
+        HANDLERS[cmd_type] = (fn, needs_window)
+        return fn
+    return register
@@ -0,0 +1,139 @@
+"""
+command_scheduler.py — inbound 명령 스케줄러 (execute_brain_task 앞단)
+- 긴급 명령(AUTO_WATCH_OFF, ICON:stop)은 대기 중인 다른 작업보다 먼저 실행하고,
+  실행 중인 긴 작업(5초 ICON 탐색 등)은 preempted() 로 중단시킵니다.
+- 연속된 스크롤은 방향을 합산한 한 번의 스크롤로, 같은 ICON 클릭/같은 토글은 한 번으로 병합합니다.
+- ack 는 claim 순서대로만 진행하므로 순서가 바뀌어 실행돼도 저널 오프셋이 앞질러 가지 않습니다.
+"""
+import threading
+
+from command_protocol import Command, decode
+
+MAX_SCROLL_STEPS = 10
+
+
+def is_urgent(cmd: Command) -> bool:
+    return cmd.type == "AUTO_WATCH_OFF" or (cmd.type == "ICON" and cmd.args.get("name") == "stop")
+
+
+def _merge_key(cmd: Command):
+    """같은 키끼리 인접하면 하나로 병합 (None 이면 병합 안 함)"""
+    if cmd.type == "SCROLL": return "SCROLL"
+    if cmd.type == "ICON": return ("ICON", cmd.args.get("name"))
+    if cmd.type in ("AUTO_WATCH_ON", "AUTO_WATCH_OFF"): return cmd.type
+    return None
+
+
+def _scroll_steps(cmd: Command) -> int:
+    count = int(cmd.args.get("steps", 1))
+    return count if cmd.args.get("direction") == "UP" else -count
+
+
+def coalesce(items: list) -> tuple:
+    """items([(token, Command)]) 앞쪽에서 병합 가능한 구간을 하나의 명령으로 합침
+    → (실행할 Command 또는 None(상쇄됨), 포함된 token 목록, 소비한 개수)"""
+    token, cmd = items[0]
+    key = _merge_key(cmd)
+    run = [items[0]]
+    if key is not None:
+        for nxt in items[1:]:
+            if _merge_key(nxt[1]) != key: break
+            run.append(nxt)
+    tokens = [t for t, _ in run]
+    if key == "SCROLL":
+        steps = sum(_scroll_steps(c) for _, c in run)
+        if steps == 0: return None, tokens, len(run)
+        steps = max(-MAX_SCROLL_STEPS, min(MAX_SCROLL_STEPS, steps))
+        cmd = Command("SCROLL", {"direction": "UP" if steps > 0 else "DOWN", "steps": abs(steps)})
+    return cmd, tokens, len(run)
+
+
+class CommandScheduler:
+    def __init__(self, claim, ack, execute):
+        """claim() → [(token, raw)], ack(token), execute(Command) → bool"""
+        self._claim = claim
+        self._ack = ack
+        self._execute = execute
+        self.pending = []      # 아직 실행하지 않은 (token, Command)
+        self._order = []       # ack 대기 token (claim 순서)
+        self._done = set()
+        self._known = set()
+        self._preempt = threading.Event()
+        self._lock = threading.RLock()   # preempted() 는 RPC 스레드에서도 호출될 수 있음
+        self.stats = {"received": 0, "executed": 0, "merged": 0, "preempted": 0}
+
+    def poll(self) -> bool:
+        """새 명령을 가져와 대기열에 추가. 긴급 명령이 들어왔으면 True"""
+        urgent = False
+        with self._lock:
+            for token, raw in self._claim():
+                if token in self._known: continue
+                command = decode(raw)
+                self._known.add(token)
+                self._order.append(token)
+                self.pending.append((token, command))
+                self.stats["received"] += 1
+                if is_urgent(command): urgent = True
+        if urgent: self._preempt.set()
+        return urgent
+
+    def preempted(self) -> bool:
+        """실행 중인 작업이 대기 루프에서 호출 — 긴급 명령이 대기 중이면 True"""
+        return self._preempt.is_set() or self.poll()
+
+    def _next(self) -> tuple:
+        with self._lock:
+            idx = next((i for i, (_, c) in enumerate(self.pending) if is_urgent(c)), 0)
+            command, tokens, used = coalesce(self.pending[idx:])
+            del self.pending[idx:idx + used]
+            self.stats["merged"] += used - 1
+            return command, tokens
+
+    def _finish(self, tokens: list) -> None:
+        with self._lock:
+            self._done.update(tokens)
+            while self._order and self._order[0] in self._done:
+                token = self._order.pop(0)
+                self._done.discard(token)
+                self._known.discard(token)
+                self._ack(token)
+
+    def run_once(self) -> None:
+        """대기 중인 명령을 모두 실행"""
+        self.poll()
+        while self.pending:
+            command, tokens = self._next()
+            self._preempt.clear()
+            try:
+                if command is not None:
+                    self.stats["executed"] += 1
+                    self._execute(command)
+                    if self._preempt.is_set() and not is_urgent(command): self.stats["preempted"] += 1
+            finally:
+                self._finish(tokens)
+            self.poll()
+
+
+class SingleFlight:
+    """같은 키의 작업이 실행 중이면 새로 실행하지 않고 그 결과를 함께 받음 (스냅샷 병합용)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event(), "result": None, "error": None}
+        if not leader:
+            call["done"].wait()
+        else:
+            try: call["result"] = fn()
+            except Exception as e: call["error"] = e
+            finally:
+                with self._lock: self._calls.pop(key, None)
+                call["done"].set()
+        if call["error"] is not None: raise call["error"]
+        return call["result"]
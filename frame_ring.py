@@ -0,0 +1,143 @@
+"""
+frame_ring.py — Brain → 봇 프레임 공유용 메모리 맵 링 버퍼
+Brain 의 감시 루프가 캡처한 최신 N개 프레임(타임스탬프, 창 좌표 포함)을 frames.ring 파일에 mmap 으로 기록하고,
+봇은 같은 파일을 mmap 해 최신 프레임을 복사 없이(numpy view) 읽습니다.
+/screenshot, /ss, /debug 는 새로 캡처하거나 창 포커스를 가져오지 않고 이 프레임을 바로 사용합니다.
+
+레이아웃: [파일 헤더 64B][슬롯 0: 슬롯 헤더 64B + 픽셀 capacity B][슬롯 1] ...
+- 쓰기: 슬롯 seq 를 0(기록 중)으로 → 픽셀/메타 기록 → seq 기록 → 파일 헤더의 latest 갱신
+- 읽기: latest 의 슬롯을 view 로 읽고, 사용 후 valid() 로 seq 가 그대로인지 확인 (seqlock)
+"""
+import os
+import mmap
+import time
+import struct
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RING_PATH = os.getenv("FRAME_RING_PATH", os.path.join(BASE_DIR, "frames.ring"))
+RING_SLOTS = int(os.getenv("FRAME_RING_SLOTS", "3"))
+RING_CAPACITY = 3840 * 2160 * 3          # 슬롯당 최대 픽셀 바이트 (4K RGB)
+STALE_AFTER = 3.0                        # 이보다 오래된 프레임은 쓰지 않고 새로 캡처 (초)
+
+MAGIC = b"FRNG"
+VERSION = 1
+_FILE = struct.Struct("<4sIIIQ")         # magic, version, slots, capacity, latest seq
+_SLOT = struct.Struct("<Qd4i4i")         # seq, timestamp, left, top, width, height, 창 rect(l, t, r, b)
+HEADER_SIZE = 64
+SLOT_HEADER_SIZE = 64
+
+
+class RingFrame:
+    """링에서 읽은 프레임 — pixels 는 mmap 위의 view 이므로 사용 후 ring.valid(frame) 확인"""
+
+    def __init__(self, seq, timestamp, left, top, pixels, window_rect):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.left = left
+        self.top = top
+        self.pixels = pixels
+        self.window_rect = window_rect
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.timestamp
+
+    @property
+    def region(self) -> tuple:
+        return self.left, self.top, self.pixels.shape[1], self.pixels.shape[0]
+
+    def view(self, region) -> np.ndarray:
+        """화면 좌표 region(x, y, w, h) 부분의 view (프레임 밖은 잘라냄)"""
+        x0, y0 = max(region[0], self.left) - self.left, max(region[1], self.top) - self.top
+        x1 = min(region[0] + region[2], self.left + self.pixels.shape[1]) - self.left
+        y1 = min(region[1] + region[3], self.top + self.pixels.shape[0]) - self.top
+        return self.pixels[y0:max(y0, y1), x0:max(x0, x1)]
+
+
+class FrameRing:
+    def __init__(self, path: str = RING_PATH, slots: int = RING_SLOTS, capacity: int = RING_CAPACITY,
+                 create: bool = False):
+        """create=True: 기록용(Brain) — 파일이 없거나 형식이 다르면 새로 만듦
+        create=False: 읽기용(봇) — 파일이 없으면 FileNotFoundError"""
+        self.path = path
+        size = HEADER_SIZE + slots * (SLOT_HEADER_SIZE + capacity)
+        if create:
+            fresh = not os.path.exists(path) or os.path.getsize(path) != size
+            with open(path, "a+b") as f:
+                if fresh:
+                    f.truncate(size)
+        self._file = open(path, "r+b" if create else "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_WRITE if create else mmap.ACCESS_READ)
+        if create:
+            magic, version, s, c, _ = _FILE.unpack_from(self._mm, 0)
+            if (magic, version, s, c) != (MAGIC, VERSION, slots, capacity):
+                self._mm[:HEADER_SIZE] = bytes(HEADER_SIZE)
+                _FILE.pack_into(self._mm, 0, MAGIC, VERSION, slots, capacity, 0)
+                for i in range(slots): _SLOT.pack_into(self._mm, self._slot_offset(i, capacity), 0, 0.0, *([0] * 8))
+        magic, version, self.slots, self.capacity, _ = _FILE.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"frame ring 형식이 아닙니다: {path}")
+        self.stats = {"published": 0, "read": 0, "torn": 0, "skipped": 0}
+
+    def _slot_offset(self, index: int, capacity: int = None) -> int:
+        return HEADER_SIZE + index * (SLOT_HEADER_SIZE + (capacity or self.capacity))
+
+    @property
+    def latest_seq(self) -> int:
+        return _FILE.unpack_from(self._mm, 0)[4]
+
+    # ── 쓰기 (Brain) ──
+
+    def publish(self, pixels: np.ndarray, left: int, top: int, window_rect=None, timestamp: float = None) -> int:
+        """RGB 프레임을 다음 슬롯에 기록하고 seq 반환 (용량 초과 시 0)"""
+        h, w = pixels.shape[:2]
+        if h * w * 3 > self.capacity:
+            self.stats["skipped"] += 1
+            return 0
+        seq = self.latest_seq + 1
+        off = self._slot_offset(seq % self.slots)
+        _SLOT.pack_into(self._mm, off, 0, 0.0, *([0] * 8))   # 기록 중 표시
+        dst = np.frombuffer(self._mm, np.uint8, h * w * 3, off + SLOT_HEADER_SIZE).reshape(h, w, 3)
+        np.copyto(dst, pixels[..., :3])
+        _SLOT.pack_into(self._mm, off, seq, time.time() if timestamp is None else timestamp,
+                        left, top, w, h, *(window_rect or (0, 0, 0, 0)))
+        header = _FILE.unpack_from(self._mm, 0)
+        _FILE.pack_into(self._mm, 0, *header[:4], seq)
+        self.stats["published"] += 1
+        return seq
+
+    # ── 읽기 (봇) ──
+
+    def get(self, seq: int):
+        """seq 프레임이 아직 링에 남아 있으면 RingFrame, 덮어써졌으면 None"""
+        if seq <= 0: return None
+        off = self._slot_offset(seq % self.slots)
+        slot_seq, ts, left, top, w, h, *rect = _SLOT.unpack_from(self._mm, off)
+        if slot_seq != seq or w * h * 3 > self.capacity: return None
+        pixels = np.frombuffer(self._mm, np.uint8, h * w * 3, off + SLOT_HEADER_SIZE).reshape(h, w, 3)
+        self.stats["read"] += 1
+        return RingFrame(seq, ts, left, top, pixels, tuple(rect) if any(rect) else None)
+
+    def latest(self, max_age: float = STALE_AFTER):
+        """가장 최근 프레임 (max_age 초보다 오래됐거나 없으면 None)"""
+        frame = self.get(self.latest_seq)
+        if frame is None or frame.age > max_age: return None
+        return frame
+
+    def valid(self, frame: RingFrame) -> bool:
+        """읽는 동안 Brain 이 같은 슬롯을 덮어쓰지 않았는지 확인"""
+        ok = _SLOT.unpack_from(self._mm, self._slot_offset(frame.seq % self.slots))[0] == frame.seq
+        if not ok: self.stats["torn"] += 1
+        return ok
+
+    def close(self) -> None:
+        self._mm.close()
+        self._file.close()
+
+
+def open_reader(path: str = RING_PATH):
+    """봇용 — 링 파일이 없거나(Brain 미실행) 형식이 다르면 None"""
+    try: return FrameRing(path)
+    except (FileNotFoundError, ValueError, OSError): return None
@@ -0,0 +1,376 @@
+"""
+icon_templates.py — 아이콘 템플릿 레지스트리
+.instruction/icon_*.png 를 한 번만 읽어 여러 배율의 그레이스케일/정규화 버전을 미리 만들어 두고,
+match(frame, names, region) 로 캡처된 프레임에서 바로 찾습니다. (시도마다 PNG 를 디스크에서 다시 읽지 않음)
+- 아이콘은 125% 배율에서 캡처됨 → 현재 DPI 에 맞는 배율 단계만 탐색 (DPI 가 바뀌어도 동작)
+- PNG 가 바뀌거나 새로 추가되면 자동으로 다시 로드 (mtime 확인은 RELOAD_CHECK 초에 한 번)
+- 그레이스케일로 후보를 찾은 뒤 최종 점수는 컬러 TM_CCOEFF_NORMED (pyautogui.locate 와 같은 점수)
+  → 기존 confidence 값(proceed 0.95 등)을 그대로 쓰고, 회색(비활성) 버튼과 파란(활성) 버튼 구분도 유지
+- 여러 아이콘은 한 프레임에 한 번에 매칭 (그레이 변환 공유 + 스레드 병렬 또는 FFT 공유)
+- 창 크기별로 마지막 위치를 기억해 그 주변 ROI 를 먼저 보고, 없으면 1/2 축소 영상에서 찾은 뒤
+  상위 후보 몇 곳 주변만 원본 해상도로 확인 (coarse-to-fine). 축소 템플릿은 2x2 위상 4가지의 평균이라
+  아이콘이 홀수 좌표에 있어도 축소 점수가 크게 떨어지지 않음
+"""
+import os
+import sys
+import time
+import glob
+import ctypes
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+try:
+    import cv2
+except ImportError:   # opencv 가 없으면 NumPy FFT 상관으로 대체 (느림)
+    cv2 = None
+
+ICON_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".instruction")
+TEMPLATE_DPI = float(os.getenv("ICON_TEMPLATE_DPI", "1.25"))   # 아이콘을 캡처한 화면 배율
+# 템플릿 배율 피라미드 (TEMPLATE_DPI 기준) — 100/125/150/175/200% 배율이 정확히 한 단계에 대응
+SCALES = (0.6, 0.7, 0.8, 0.9, 1.0, 1.1, 1.2, 1.4, 1.6)
+NEIGHBORS = int(os.getenv("ICON_SCALE_NEIGHBORS", "0"))   # 기대 배율 양옆으로 더 탐색할 단계 수 (단계당 비용 ×1)
+RELOAD_CHECK = 1.0     # PNG 변경 확인 주기 (초)
+ROI_MARGIN = 48        # 마지막 위치 주변 탐색 여유 (px)
+COARSE_MIN = 8         # 1/2 축소 후 템플릿이 이보다 작으면 coarse 탐색 생략
+COARSE_SLACK = 0.15    # coarse 단계 후보 임계값 완화폭 (축소로 점수가 떨어지는 만큼)
+COARSE_PEAKS = 3       # coarse 단계에서 원본 해상도로 확인할 후보 수 (템플릿 단계당)
+REFINE_PAD = 6         # coarse 후보를 원본 해상도로 확인할 때 주변 여유 (px)
+GRAY_SLACK = 0.10      # 그레이 점수가 임계값보다 이만큼 낮아도 컬러 점수로 판정 (두 점수가 조금씩 다르므로)
+COLOR_PAD = 1          # 컬러 점수를 볼 때 그레이 최고 위치 주변 여유 (px)
+MATCH_WORKERS = int(os.getenv("ICON_MATCH_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+
+def screen_dpi_scale() -> float:
+    """현재 화면 배율 (1.0 = 96 DPI). Windows 가 아니면 템플릿 배율과 같다고 가정"""
+    if sys.platform != "win32": return TEMPLATE_DPI
+    try: return ctypes.windll.user32.GetDpiForSystem() / 96.0
+    except Exception: return TEMPLATE_DPI
+
+
+def to_gray(pixels: np.ndarray) -> np.ndarray:
+    if pixels.ndim == 2: return pixels
+    if cv2 is not None: return cv2.cvtColor(np.ascontiguousarray(pixels[..., :3]), cv2.COLOR_RGB2GRAY)
+    return (pixels[..., :3] @ np.array([0.299, 0.587, 0.114])).astype(np.uint8)
+
+
+def _normalized(gray: np.ndarray) -> np.ndarray:
+    """평균 0, 노름 1 로 정규화한 float32 템플릿 (NumPy 상관용)"""
+    t = gray.astype(np.float32) - gray.mean()
+    norm = np.sqrt((t * t).sum())
+    return t / norm if norm > 0 else t
+
+
+def _resize(pixels: np.ndarray, scale: float) -> np.ndarray:
+    h, w = pixels.shape[:2]
+    size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    if cv2 is not None:
+        return cv2.resize(pixels, size, interpolation=cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC)
+    return np.asarray(Image.fromarray(pixels).resize(size, Image.LANCZOS))
+
+
+def half(gray: np.ndarray) -> np.ndarray:
+    """2x2 평균으로 1/2 축소 (프레임과 템플릿에 같은 방식 적용)"""
+    h, w = gray.shape[0] // 2 * 2, gray.shape[1] // 2 * 2
+    blocks = gray[:h, :w].reshape(h // 2, 2, w // 2, 2).astype(np.uint16)
+    return ((blocks.sum(axis=(1, 3)) + 2) // 4).astype(np.uint8)
+
+
+def half_template(gray: np.ndarray) -> np.ndarray:
+    """coarse 용 축소 템플릿 — 템플릿이 프레임의 짝수/홀수 좌표 어디에 놓여도 비슷하게 맞도록
+    2x2 블록 위상 4가지로 각각 축소한 뒤 평균 (위상 하나만 쓰면 가는 선 아이콘은 홀수 좌표에서 점수가 0.4 까지 떨어짐)"""
+    phases = [half(gray[py:, px:]) for py in (0, 1) for px in (0, 1)]
+    h, w = min(p.shape[0] for p in phases), min(p.shape[1] for p in phases)
+    return (sum(p[:h, :w].astype(np.uint16) for p in phases) + 2) // 4
+
+
+class Level:
+    """템플릿 한 배율: 컬러 / 그레이 / 정규화 그레이 (+ 1/2 축소 그레이 — coarse 탐색용)"""
+
+    def __init__(self, scale: float, rgb: np.ndarray, gray: np.ndarray = None):
+        self.scale = scale
+        self.rgb = rgb
+        self.gray = to_gray(rgb) if gray is None else gray
+        self.norm = _normalized(self.gray)
+        self.h, self.w = self.gray.shape
+        self.coarse = None
+        if rgb is not None and min(self.h, self.w) >= 2 * COARSE_MIN:
+            self.coarse = Level(scale, None, half_template(self.gray).astype(np.uint8))
+
+
+class Template:
+    def __init__(self, name: str, path: str, scales=SCALES):
+        self.name = name
+        self.path = path
+        self.mtime = os.path.getmtime(path)
+        with Image.open(path) as img:
+            rgb = np.asarray(img.convert("RGB"))
+        self.levels = [Level(s, _resize(rgb, s) if s != 1.0 else rgb) for s in scales]
+        self.last_scale = None   # 마지막으로 찾은 배율 (우선 탐색)
+
+    def candidates(self, expected: float) -> list:
+        """기대 배율에 가장 가까운 단계와 이웃 단계 (+ 마지막 적중 배율) 를 가까운 순으로"""
+        order = sorted(range(len(self.levels)), key=lambda i: abs(self.levels[i].scale - expected))
+        nearest = order[0]
+        picked = [self.levels[i] for i in order if abs(i - nearest) <= NEIGHBORS]
+        if self.last_scale is not None:
+            hit = next((lv for lv in self.levels if lv.scale == self.last_scale), None)
+            if hit is not None:
+                picked = [hit] + [lv for lv in picked if lv is not hit]
+        return picked
+
+
+class Match:
+    """화면 좌표의 매칭 결과"""
+
+    def __init__(self, name, x, y, w, h, score, scale):
+        self.name = name
+        self.x, self.y, self.w, self.h = x, y, w, h
+        self.score = score
+        self.scale = scale
+
+    @property
+    def center(self) -> tuple:
+        return self.x + self.w // 2, self.y + self.h // 2
+
+    def __repr__(self):
+        return f"Match({self.name}, {self.center}, score={self.score:.3f}, scale={self.scale})"
+
+
+class _SharedFFT:
+    """NumPy 경로에서 여러 템플릿이 공유하는 프레임 FFT 와 적분 영상 (프레임당 한 번 계산)"""
+
+    def __init__(self, gray: np.ndarray, levels: list):
+        self.img = gray.astype(np.float64)
+        ih, iw = gray.shape
+        self.shape = (ih + max(lv.h for lv in levels) - 1, iw + max(lv.w for lv in levels) - 1)
+        self.spectrum = np.fft.rfft2(self.img, self.shape)
+        self.s1 = np.pad(self.img.cumsum(0).cumsum(1), ((1, 0), (1, 0)))
+        self.s2 = np.pad((self.img * self.img).cumsum(0).cumsum(1), ((1, 0), (1, 0)))
+
+    def ncc(self, level: Level) -> np.ndarray:
+        """cv2.TM_CCOEFF_NORMED 와 같은 결과 (FFT 상관 / 창별 표준편차)"""
+        th, tw = level.h, level.w
+        ih, iw = self.img.shape
+        corr = np.fft.irfft2(self.spectrum * np.fft.rfft2(level.norm[::-1, ::-1], self.shape), self.shape)
+        corr = corr[th - 1:ih, tw - 1:iw]
+        win = lambda s: s[th:, tw:] - s[:-th, tw:] - s[th:, :-tw] + s[:-th, :-tw]
+        var = win(self.s2) - win(self.s1) ** 2 / (th * tw)
+        return np.where(var > 1e-6, corr / np.sqrt(np.maximum(var, 1e-6)), 0.0)
+
+
+def match_level(gray: np.ndarray, level: Level, shared: _SharedFFT = None):
+    """그레이 영상에서 level 의 최고 점수 위치 → (score, x, y) (영상이 템플릿보다 작으면 None)"""
+    if gray.shape[0] < level.h or gray.shape[1] < level.w: return None
+    if cv2 is not None:
+        result = cv2.matchTemplate(gray, level.gray, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (x, y) = cv2.minMaxLoc(result)
+        return float(score), x, y
+    result = (shared or _SharedFFT(gray, [level])).ncc(level)
+    y, x = np.unravel_index(int(result.argmax()), result.shape)
+    return float(result[y, x]), int(x), int(y)
+
+
+def match_peaks(gray: np.ndarray, level: Level, k: int, floor: float, shared: _SharedFFT = None) -> list:
+    """점수 floor 이상인 상위 k 개 위치 [(score, x, y)] — 찾을 때마다 템플릿 크기 주변을 지워 같은 자리 중복 방지"""
+    if gray.shape[0] < level.h or gray.shape[1] < level.w: return []
+    if cv2 is not None: result = cv2.matchTemplate(gray, level.gray, cv2.TM_CCOEFF_NORMED)
+    else: result = (shared or _SharedFFT(gray, [level])).ncc(level).astype(np.float32)
+    peaks = []
+    for _ in range(k):
+        y, x = np.unravel_index(int(result.argmax()), result.shape)
+        score = float(result[y, x])
+        if score < floor: break
+        peaks.append((score, int(x), int(y)))
+        result[max(0, y - level.h // 2):y + level.h // 2 + 1, max(0, x - level.w // 2):x + level.w // 2 + 1] = -1
+    return peaks
+
+
+_pool = None
+
+
+def search(gray: np.ndarray, levels: list, workers: int = None, peaks: int = 0, floor: float = -1.0) -> list:
+    """한 프레임(gray)에 여러 템플릿 단계를 한 번에 매칭 → levels 순서의 [(score, x, y) 또는 None]
+    (peaks > 0 이면 단계마다 match_peaks 결과 리스트)
+    - OpenCV: matchTemplate 는 GIL 을 놓으므로 스레드 풀에서 템플릿별로 병렬 실행
+    - NumPy: 프레임 FFT/적분 영상을 한 번만 계산해 모든 템플릿이 공유"""
+    global _pool
+    workers = MATCH_WORKERS if workers is None else workers
+    run = (lambda lv, shared=None: match_peaks(gray, lv, peaks, floor, shared)) if peaks else \
+        (lambda lv, shared=None: match_level(gray, lv, shared))
+    fits = [lv for lv in levels if lv.h <= gray.shape[0] and lv.w <= gray.shape[1]]
+    if cv2 is None:
+        shared = _SharedFFT(gray, fits) if fits else None
+        return [run(lv, shared) for lv in levels]
+    if workers <= 1 or len(levels) <= 1:
+        return [run(lv) for lv in levels]
+    if _pool is None: _pool = ThreadPoolExecutor(max_workers=MATCH_WORKERS, thread_name_prefix="icon-match")
+    return list(_pool.map(run, levels))
+
+
+def color_score(patch: np.ndarray, level: Level) -> float:
+    """템플릿과 같은 크기 patch 의 컬러 TM_CCOEFF_NORMED (채널별 평균을 빼고 세 채널을 합산 — OpenCV 다채널과 동일)"""
+    if cv2 is not None:
+        return float(cv2.matchTemplate(np.ascontiguousarray(patch[..., :3]), level.rgb, cv2.TM_CCOEFF_NORMED)[0, 0])
+    a = patch[..., :3].astype(np.float64).reshape(-1, 3)
+    b = level.rgb.astype(np.float64).reshape(-1, 3)
+    a -= a.mean(0)
+    b -= b.mean(0)
+    den = np.sqrt((a * a).sum() * (b * b).sum())
+    return float((a * b).sum() / den) if den > 1e-6 else 0.0
+
+
+def color_match(pixels: np.ndarray, level: Level, x: int, y: int, pad: int = COLOR_PAD):
+    """그레이 후보 (x, y) 주변 pad 안에서 컬러 점수가 가장 높은 위치 → (score, x, y)"""
+    x0, y0 = max(0, x - pad), max(0, y - pad)
+    crop = pixels[y0:y + level.h + pad, x0:x + level.w + pad, :3]
+    if crop.shape[0] < level.h or crop.shape[1] < level.w: return -1.0, x, y
+    if cv2 is not None:
+        _, score, _, (dx, dy) = cv2.minMaxLoc(cv2.matchTemplate(np.ascontiguousarray(crop), level.rgb, cv2.TM_CCOEFF_NORMED))
+        return float(score), x0 + dx, y0 + dy
+    return max((color_score(crop[dy:dy + level.h, dx:dx + level.w], level), x0 + dx, y0 + dy)
+               for dy in range(crop.shape[0] - level.h + 1) for dx in range(crop.shape[1] - level.w + 1))
+
+
+class TemplateRegistry:
+    def __init__(self, directory: str = ICON_DIR, pattern: str = "icon_*.png", scales=SCALES):
+        self.directory = directory
+        self.pattern = pattern
+        self.scales = scales
+        self._templates = {}
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self._state_lock = threading.Lock()   # _priors / stats / last_scale — 감시 스레드와 inbound 명령 스레드가 함께 씀
+        self._priors = {}   # (이름, 창 크기) → (창 기준 x, y, 배율)
+        self.stats = {"loads": 0, "matches": 0, "hits": 0, "roi_hits": 0, "roi_misses": 0,
+                      "coarse_hits": 0, "coarse_misses": 0}
+
+    def _name(self, path: str) -> str:
+        base = os.path.splitext(os.path.basename(path))[0]
+        return base[len("icon_"):] if base.startswith("icon_") else base
+
+    def refresh(self, force: bool = False) -> None:
+        """디렉터리를 다시 훑어 변경/추가/삭제된 PNG 반영 (RELOAD_CHECK 초에 한 번)"""
+        now = time.time()
+        if not force and now - self._checked < RELOAD_CHECK: return
+        with self._lock:
+            self._checked = now
+            seen = set()
+            for path in glob.glob(os.path.join(self.directory, self.pattern)):
+                name = self._name(path)
+                seen.add(name)
+                tpl = self._templates.get(name)
+                try:
+                    if tpl is None or os.path.getmtime(path) != tpl.mtime:
+                        self._templates[name] = Template(name, path, self.scales)
+                        self.stats["loads"] += 1
+                except (OSError, ValueError) as e:   # 저장 도중 등
+                    print(f"[!] 아이콘 로드 실패 ({path}): {e}")
+            for name in set(self._templates) - seen: del self._templates[name]
+
+    def hit_rates(self) -> dict:
+        """ROI / coarse 단계 적중률 (0~1, 시도가 없으면 None)"""
+        rate = lambda h, m: h / (h + m) if h + m else None
+        with self._state_lock: st = dict(self.stats)
+        return {"roi": rate(st["roi_hits"], st["roi_misses"]), "coarse": rate(st["coarse_hits"], st["coarse_misses"])}
+
+    def names(self) -> list:
+        self.refresh()
+        return sorted(self._templates)
+
+    def get(self, name: str):
+        self.refresh()
+        return self._templates.get(name)
+
+    def best(self, frame, names, region=None, confidence=0.8, dpi_scale: float = None, workers: int = None,
+             anchor=None) -> dict:
+        """frame(capture.Frame) 의 region(화면 좌표, 생략 시 전체) 에서 names 아이콘을 한 번에 매칭
+        → {이름: 가장 좋은 Match} (임계값 미달 포함 — 점수 확인/튜닝용)
+        confidence 는 숫자 하나 또는 {이름: 값}. 그레이 점수가 임계값 - GRAY_SLACK 을 넘은 후보는 컬러 점수로 판정
+        anchor: 창 rect (l, t, r, b) — 마지막 위치를 창 기준으로 기억 (생략 시 프레임 기준)"""
+        self.refresh()
+        if region is not None:
+            region = frame.clip(region)
+            if region is None: return {}
+        pixels = frame.view(region)
+        ox, oy = (region[0], region[1]) if region else (frame.left, frame.top)
+        gray = to_gray(pixels)   # 모든 아이콘이 그레이 변환을 공유
+        expected = (dpi_scale or screen_dpi_scale()) / TEMPLATE_DPI
+        ax, ay, ar, ab = anchor or (frame.left, frame.top, frame.left + frame.width, frame.top + frame.height)
+        geometry = (ar - ax, ab - ay)
+        need_of = lambda name: confidence.get(name, 0.8) if isinstance(confidence, dict) else confidence
+        templates = [tpl for tpl in map(self._templates.get, names) if tpl is not None]
+        best = {}
+
+        def offer(tpl, level, score, x, y) -> bool:
+            """gray 좌표 (x, y) 의 후보 반영 → 임계값 통과 시 True (판정은 컬러 점수 — 기존 pyautogui 와 같은 기준)"""
+            need = need_of(tpl.name)
+            if score >= need - GRAY_SLACK:
+                score, x, y = color_match(pixels, level, x, y)
+            cand = Match(tpl.name, ox + x, oy + y, level.w, level.h, score, level.scale)
+            top = tpl.name not in best or score > best[tpl.name].score
+            if top: best[tpl.name] = cand
+            if score < need: return False
+            if top:
+                with self._state_lock:
+                    tpl.last_scale = level.scale
+                    self._priors[(tpl.name, geometry)] = (cand.x - ax, cand.y - ay, level.scale)
+            return True
+
+        def around(tpl, level, x, y, pad):
+            """gray 의 (x, y) 주변 pad 만큼에서 level 매칭 → 통과 여부"""
+            x0, y0 = max(0, x - pad), max(0, y - pad)
+            crop = gray[y0:max(y0, y + level.h + pad), x0:max(x0, x + level.w + pad)]
+            hit = match_level(crop, level)
+            return hit is not None and offer(tpl, level, hit[0], x0 + hit[1], y0 + hit[2])
+
+        # 1) 같은 창 크기에서 마지막으로 찾은 위치 주변 ROI 먼저
+        pending = []
+        for tpl in templates:
+            with self._state_lock: prior = self._priors.get((tpl.name, geometry))
+            level = prior and next((lv for lv in tpl.levels if lv.scale == prior[2]), None)
+            if level is None:
+                pending.append(tpl)
+                continue
+            roi_hit = around(tpl, level, prior[0] + ax - ox, prior[1] + ay - oy, ROI_MARGIN)
+            with self._state_lock: self.stats["roi_hits" if roi_hit else "roi_misses"] += 1
+            if not roi_hit: pending.append(tpl)
+
+        # 2) 나머지는 1/2 축소 영상에서 한 번에 훑고, 상위 후보 주변만 원본 해상도로 확인
+        if pending:
+            small = half(gray)
+            jobs = [(tpl, lv) for tpl in pending for lv in tpl.candidates(expected)]
+            coarse = [(tpl, lv) for tpl, lv in jobs if lv.coarse is not None]
+            full = [(tpl, lv) for tpl, lv in jobs if lv.coarse is None]   # 너무 작은 템플릿
+            done = set()
+            for (tpl, level), hit in zip(full, search(gray, [lv for _, lv in full], workers)):
+                if hit is not None and tpl.name not in done and offer(tpl, level, *hit): done.add(tpl.name)
+            # 가장 좋은 한 곳만 보면 그 자리가 오탐일 때 더 약한 진짜 후보를 놓침 → 상위 COARSE_PEAKS 곳을 모두 확인
+            # (여러 곳이 통과하면 기존 pyautogui 처럼 점수가 가장 높은 곳)
+            for (tpl, level), hits in zip(coarse, search(small, [lv.coarse for _, lv in coarse], workers, COARSE_PEAKS)):
+                if tpl.name in done: continue
+                for score, x, y in hits:
+                    if score < need_of(tpl.name) - COARSE_SLACK: break
+                    if around(tpl, level, 2 * x, 2 * y, REFINE_PAD): done.add(tpl.name)
+                if tpl.name not in best and hits:   # 원본 해상도로 확인한 후보가 없으면 coarse 점수를 튜닝용 참고로
+                    score, x, y = hits[0]
+                    best[tpl.name] = Match(tpl.name, ox + 2 * x, oy + 2 * y, level.w, level.h, score, level.scale)
+            with self._state_lock:
+                self.stats["coarse_hits"] += len(done)
+                self.stats["coarse_misses"] += len({tpl.name for tpl in pending} - done)
+
+        with self._state_lock:
+            self.stats["matches"] += len(templates)
+            self.stats["hits"] += sum(1 for name, m in best.items() if m.score >= need_of(name))
+        return best
+
+    def match(self, frame, names, region=None, confidence=0.8, dpi_scale: float = None, anchor=None) -> dict:
+        """best() 중 임계값을 넘은 것만 → {이름: Match}"""
+        found = self.best(frame, names, region, confidence, dpi_scale, anchor=anchor)
+        need = lambda name: confidence.get(name, 0.8) if isinstance(confidence, dict) else confidence
+        return {name: m for name, m in found.items() if m.score >= need(name)}
+
+
+registry = TemplateRegistry()
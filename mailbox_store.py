@@ -0,0 +1,460 @@
+"""
+mailbox_store.py — 저널 기반 공유 mailbox 엔진
+mailbox.json 전체를 매번 읽고 다시 쓰는 대신, 추가 전용(append-only) 레코드 로그와
+큐별 소비자 오프셋, 주기적 압축(compaction)으로 동작합니다.
+- 적재(push)는 로그 끝에 한 줄을 붙이는 O(1) 연산입니다.
+- 모든 연산은 프로세스 간 파일 락 안에서 수행되므로 antigravity_bot.py / agent_brain.py /
+  send_reply.py 가 동시에 써도 메시지가 유실되지 않습니다.
+- 적재 시 localhost UDP 초인종(doorbell)을 울려 소비자를 즉시 깨웁니다. (실패 시 폴링)
+- MAILBOX_BACKEND=sqlite 이면 SQLite(WAL) 큐를 사용합니다. (claim/ack + 가시성 타임아웃)
+
+소비자는 claim() → 처리 → ack() 순서로 사용합니다. ack 전에 죽거나 전송에 실패하면
+메시지는 큐에 남아 다시 전달됩니다.
+저널의 claim 토큰은 압축과 무관한 논리 위치(지금까지 잘라낸 바이트 base + 파일 안 위치)라서
+claim 한 뒤 다른 ack 가 압축을 일으켜도 나중에 하는 ack 가 어긋나지 않습니다.
+"""
+import os
+import json
+import time
+import select
+import socket
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+    import fcntl
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MAILBOX_PATH = os.path.join(BASE_DIR, "mailbox.json")   # 구버전 파일 (최초 1회 이관)
+
+QUEUES = ("inbound", "outbound")
+COMPACT_BYTES = 256 * 1024   # 소비 완료된 로그가 이 크기를 넘으면 압축
+DOORBELL_PORT = int(os.getenv("MAILBOX_DOORBELL_PORT", "47710"))   # 큐 순서대로 +0, +1 ...
+MAILBOX_BACKEND = os.getenv("MAILBOX_BACKEND", "journal").lower()   # journal | sqlite
+VISIBILITY_TIMEOUT = 30.0    # claim 후 ack 없이 이 시간이 지나면 재전달 (sqlite)
+MAX_ATTEMPTS = 5             # 초과 시 "<queue>.dead" 로 이동 (sqlite)
+
+
+def _empty_box() -> dict:
+    return {"inbound": [], "outbound": [], "approval_request": None}
+
+
+@contextmanager
+def _file_lock(path: str):
+    """프로세스 간 배타 락 (Windows: msvcrt, 그 외: fcntl)"""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if msvcrt:
+            os.lseek(fd, 0, os.SEEK_SET)
+            # LK_LOCK은 10회 재시도 후 포기하므로 직접 반복
+            while True:
+                try:
+                    msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.01)
+        else:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        if msvcrt:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        else:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+class Doorbell:
+    """큐 소비자용 UDP 초인종 — 적재 즉시 wait()가 깨어나고, 바인드 실패 시 단순 폴링으로 동작"""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.sock = None
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            sock.bind(("127.0.0.1", port))
+            self.sock = sock
+        except OSError as e:
+            print(f"⚠️ mailbox doorbell 바인드 실패 (port {port}) — 폴링으로 동작: {e}")
+
+    def wait(self, timeout: float) -> bool:
+        """초인종이 울리면 True, timeout 경과 시 False"""
+        if self.sock is None:
+            time.sleep(timeout)
+            return False
+        ready, _, _ = select.select([self.sock], [], [], timeout)
+        if not ready: return False
+        # 쌓인 신호는 한 번에 비움 (한 번 깨어나면 큐 전체를 읽으므로)
+        self.sock.setblocking(False)
+        try:
+            while True: self.sock.recv(64)
+        except OSError:
+            pass
+        finally:
+            self.sock.setblocking(True)
+        return True
+
+    def close(self) -> None:
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+_ring_sock = None
+
+
+def _ring(port: int) -> None:
+    global _ring_sock
+    try:
+        if _ring_sock is None:
+            _ring_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        _ring_sock.sendto(b"\x01", ("127.0.0.1", port))
+    except OSError:
+        pass   # 소비자가 없거나 초인종이 꺼져 있어도 폴링이 처리
+
+
+class JournalMailbox:
+    """추가 전용 로그(<name>.log) + 메타(<name>.meta.json: 오프셋, 승인 요청) 저장소"""
+
+    def __init__(self, base_dir: str = BASE_DIR, name: str = "mailbox", doorbell_port: int = DOORBELL_PORT):
+        self.base_dir = base_dir
+        self.doorbell_port = doorbell_port
+        self.log_path = os.path.join(base_dir, f"{name}.log")
+        self.meta_path = os.path.join(base_dir, f"{name}.meta.json")
+        self.lock_path = os.path.join(base_dir, f"{name}.lock")
+        self.legacy_path = os.path.join(base_dir, f"{name}.json")
+
+    # ── 내부 유틸 ──────────────────────────────────────────────────────────
+
+    @contextmanager
+    def _locked(self):
+        with _file_lock(self.lock_path):
+            if os.path.exists(self.legacy_path):
+                self._migrate_legacy()
+            yield
+
+    def _read_meta(self) -> dict:
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            meta = {}
+        offsets = meta.get("offsets") or {}
+        meta["offsets"] = {q: int(offsets.get(q, 0)) for q in QUEUES}
+        meta["base"] = int(meta.get("base", 0))   # 압축/재작성으로 잘라낸 누적 바이트 (토큰 = base + 파일 위치)
+        meta.setdefault("approval_request", None)
+        return meta
+
+    def _write_meta(self, meta: dict) -> None:
+        tmp = self.meta_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp, self.meta_path)
+
+    def _append(self, records: list) -> None:
+        data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        # O_APPEND + 단일 write → 레코드가 중간에 섞이지 않음
+        with open(self.log_path, "ab") as f:
+            f.write(data.encode("utf-8"))
+
+    def _scan(self, start: int):
+        """start 바이트부터 (레코드 끝 위치, 레코드) 를 순서대로 반환"""
+        try:
+            f = open(self.log_path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            f.seek(start)
+            pos = start
+            for line in f:
+                if not line.endswith(b"\n"): break   # 기록 중인 꼬리(torn write)는 건너뜀
+                pos += len(line)
+                try: rec = json.loads(line)
+                except ValueError: continue
+                yield pos, rec
+
+    def _pending(self, meta: dict, queue: str):
+        start = meta["offsets"][queue]
+        end = start
+        items = []
+        for pos, rec in self._scan(start):
+            end = pos
+            if rec.get("q") == queue:
+                items.append(rec.get("msg"))
+        return items, end
+
+    def _rewrite(self, box: dict, approval) -> None:
+        records = [{"q": q, "msg": m} for q in QUEUES for m in box.get(q, [])]
+        meta = self._read_meta()
+        try: old_size = os.path.getsize(self.log_path)
+        except OSError: old_size = 0
+        tmp = self.log_path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records).encode("utf-8"))
+        os.replace(tmp, self.log_path)
+        # 이전 로그 전체를 잘라낸 것으로 취급 → 재작성 전에 받은 토큰은 모두 무시됨
+        self._write_meta({"offsets": {q: 0 for q in QUEUES}, "base": meta["base"] + old_size,
+                          "approval_request": approval})
+
+    def _maybe_compact(self, meta: dict) -> None:
+        """모든 소비자가 지나간 로그 앞부분을 잘라냅니다."""
+        low = min(meta["offsets"].values())
+        if low < COMPACT_BYTES: return
+        tmp = self.log_path + ".tmp"
+        with open(self.log_path, "rb") as src, open(tmp, "wb") as dst:
+            src.seek(low)
+            while True:
+                chunk = src.read(1 << 20)
+                if not chunk: break
+                dst.write(chunk)
+        os.replace(tmp, self.log_path)
+        meta["offsets"] = {q: off - low for q, off in meta["offsets"].items()}
+        meta["base"] += low
+
+    def _migrate_legacy(self) -> None:
+        try:
+            with open(self.legacy_path, "r", encoding="utf-8") as f:
+                box = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            box = _empty_box()
+        records = [{"q": q, "msg": m} for q in QUEUES for m in box.get(q, [])]
+        if records: self._append(records)
+        if box.get("approval_request") is not None:
+            meta = self._read_meta()
+            meta["approval_request"] = box["approval_request"]
+            self._write_meta(meta)
+        os.replace(self.legacy_path, self.legacy_path + ".migrated")
+
+    # ── 공개 API ───────────────────────────────────────────────────────────
+
+    def push(self, queue: str, message) -> None:
+        with self._locked():
+            self._append([{"q": queue, "msg": message}])
+        _ring(self.doorbell_port + QUEUES.index(queue))
+
+    def doorbell(self, queue: str) -> Doorbell:
+        """소비자 루프 시작 전에 만들어 두고 매 반복마다 wait(폴링 주기) 호출"""
+        return Doorbell(self.doorbell_port + QUEUES.index(queue))
+
+    def pop(self, queue: str) -> list:
+        """해당 큐의 대기 메시지를 모두 꺼내고 오프셋을 전진시킵니다."""
+        with self._locked():
+            meta = self._read_meta()
+            items, end = self._pending(meta, queue)
+            if end == meta["offsets"][queue]: return items
+            meta["offsets"][queue] = end
+            self._maybe_compact(meta)
+            self._write_meta(meta)
+            return items
+
+    def claim(self, queue: str) -> list:
+        """대기 메시지를 [(token, msg)] 로 반환 (오프셋은 ack 전까지 그대로)
+        저널은 큐당 소비자가 하나이므로 순서대로 ack 해야 합니다. token 은 압축 후에도 유효한 논리 위치"""
+        with self._locked():
+            meta = self._read_meta()
+            return [(meta["base"] + pos, rec.get("msg")) for pos, rec in self._scan(meta["offsets"][queue])
+                    if rec.get("q") == queue]
+
+    def ack(self, queue: str, token: int) -> None:
+        with self._locked():
+            meta = self._read_meta()
+            pos = token - meta["base"]   # 압축으로 이미 잘려 나간 위치면 0 이하 → 처리 완료된 것
+            if pos <= meta["offsets"][queue]: return
+            try: size = os.path.getsize(self.log_path)
+            except OSError: size = 0
+            if pos > size: return   # 재작성 등으로 무효가 된 토큰 — 오프셋을 파일 끝 너머로 옮기지 않음
+            meta["offsets"][queue] = pos
+            self._maybe_compact(meta)
+            self._write_meta(meta)
+
+    def read(self) -> dict:
+        """소비하지 않고 현재 상태를 mailbox.json 형식으로 반환"""
+        with self._locked():
+            meta = self._read_meta()
+            box = {q: self._pending(meta, q)[0] for q in QUEUES}
+            box["approval_request"] = meta["approval_request"]
+            return box
+
+    def write(self, box: dict) -> None:
+        """전체 상태를 box 내용으로 교체 (구버전 호환용, 로그도 함께 압축됨)"""
+        with self._locked():
+            self._rewrite(box, box.get("approval_request"))
+
+    def set_approval_request(self, value) -> None:
+        with self._locked():
+            meta = self._read_meta()
+            meta["approval_request"] = value
+            self._write_meta(meta)
+
+
+class SqliteMailbox:
+    """SQLite(WAL) 기반 내구성 큐 — 동시 쓰기 중에도 읽기가 막히지 않고, claim/ack 지원"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            queue TEXT NOT NULL,
+            body TEXT NOT NULL,
+            visible_at REAL NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_messages_queue ON messages (queue, visible_at, id);
+        CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT);
+    """
+
+    def __init__(self, base_dir: str = BASE_DIR, name: str = "mailbox", doorbell_port: int = DOORBELL_PORT,
+                 visibility_timeout: float = VISIBILITY_TIMEOUT, max_attempts: int = MAX_ATTEMPTS):
+        self.base_dir = base_dir
+        self.doorbell_port = doorbell_port
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.db_path = os.path.join(base_dir, f"{name}.db")
+        self.legacy_path = os.path.join(base_dir, f"{name}.json")
+        self._local = threading.local()   # sqlite3 연결은 스레드별로 하나씩
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.SCHEMA)
+            self._local.conn = conn
+            if os.path.exists(self.legacy_path):
+                self._migrate_legacy()
+        return conn
+
+    def _migrate_legacy(self) -> None:
+        try:
+            with open(self.legacy_path, "r", encoding="utf-8") as f:
+                box = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            box = _empty_box()
+        try:
+            os.replace(self.legacy_path, self.legacy_path + ".migrated")
+        except OSError:
+            return   # 다른 프로세스가 먼저 이관함
+        for q in QUEUES:
+            for m in box.get(q, []): self.push(q, m)
+        if box.get("approval_request") is not None:
+            self.set_approval_request(box["approval_request"])
+
+    # ── 공개 API (JournalMailbox 와 동일) ─────────────────────────────────
+
+    def push(self, queue: str, message) -> None:
+        self._db.execute("INSERT INTO messages (queue, body) VALUES (?, ?)",
+                         (queue, json.dumps(message, ensure_ascii=False)))
+        _ring(self.doorbell_port + QUEUES.index(queue))
+
+    def doorbell(self, queue: str) -> Doorbell:
+        return Doorbell(self.doorbell_port + QUEUES.index(queue))
+
+    def claim(self, queue: str, limit: int = 100) -> list:
+        """보이는 메시지를 최대 limit개 가져와 visibility_timeout 동안 숨깁니다."""
+        db, now = self._db, time.time()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            rows = db.execute(
+                "SELECT id, body, attempts FROM messages WHERE queue = ? AND visible_at <= ? ORDER BY id LIMIT ?",
+                (queue, now, limit)).fetchall()
+            claimed = []
+            for row_id, body, attempts in rows:
+                if attempts >= self.max_attempts:
+                    print(f"⚠️ mailbox: {queue} 메시지 #{row_id} {attempts}회 실패 → {queue}.dead 로 이동")
+                    db.execute("UPDATE messages SET queue = ? WHERE id = ?", (f"{queue}.dead", row_id))
+                    continue
+                claimed.append((row_id, json.loads(body)))
+            if claimed:
+                db.executemany("UPDATE messages SET visible_at = ?, attempts = attempts + 1 WHERE id = ?",
+                               [(now + self.visibility_timeout, row_id) for row_id, _ in claimed])
+            db.execute("COMMIT")
+            return claimed
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def ack(self, queue: str, token: int) -> None:
+        self._db.execute("DELETE FROM messages WHERE id = ? AND queue = ?", (token, queue))
+
+    def pop(self, queue: str) -> list:
+        items = self.claim(queue, limit=1 << 30)
+        if items:
+            self._db.executemany("DELETE FROM messages WHERE id = ?", [(row_id,) for row_id, _ in items])
+        return [msg for _, msg in items]
+
+    def read(self) -> dict:
+        db = self._db
+        box = {q: [json.loads(b) for (b,) in db.execute(
+            "SELECT body FROM messages WHERE queue = ? ORDER BY id", (q,))] for q in QUEUES}
+        row = db.execute("SELECT value FROM state WHERE key = 'approval_request'").fetchone()
+        box["approval_request"] = json.loads(row[0]) if row else None
+        return box
+
+    def write(self, box: dict) -> None:
+        db = self._db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("DELETE FROM messages WHERE queue IN (%s)" % ",".join("?" * len(QUEUES)), QUEUES)
+            db.executemany("INSERT INTO messages (queue, body) VALUES (?, ?)",
+                           [(q, json.dumps(m, ensure_ascii=False)) for q in QUEUES for m in box.get(q, [])])
+            db.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('approval_request', ?)",
+                       (json.dumps(box.get("approval_request")),))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+
+    def set_approval_request(self, value) -> None:
+        self._db.execute("INSERT OR REPLACE INTO state (key, value) VALUES ('approval_request', ?)",
+                         (json.dumps(value, ensure_ascii=False),))
+
+
+# ── 모듈 레벨 API (기존 read_mailbox/write_mailbox/push_inbound 대체) ─────────
+
+_mailbox = SqliteMailbox() if MAILBOX_BACKEND == "sqlite" else JournalMailbox()
+
+
+def read_mailbox() -> dict:
+    return _mailbox.read()
+
+
+def write_mailbox(box: dict) -> None:
+    _mailbox.write(box)
+
+
+def push_inbound(message) -> None:
+    _mailbox.push("inbound", message)
+
+
+def push_outbound(message) -> None:
+    _mailbox.push("outbound", message)
+
+
+def pop_inbound() -> list:
+    return _mailbox.pop("inbound")
+
+
+def pop_outbound() -> list:
+    return _mailbox.pop("outbound")
+
+
+def claim(queue: str) -> list:
+    return _mailbox.claim(queue)
+
+
+def ack(queue: str, token) -> None:
+    _mailbox.ack(queue, token)
+
+
+def doorbell(queue: str) -> Doorbell:
+    return _mailbox.doorbell(queue)
+
+
+def set_approval_request(value) -> None:
+    _mailbox.set_approval_request(value)
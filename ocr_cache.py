@@ -0,0 +1,352 @@
+"""
+ocr_cache.py — 줄 단위 증분 OCR (줄 해시 캐시)
+채팅 패널을 가로 줄(strip)로 나누고 줄마다 픽셀 해시를 계산해, 이전에 인식한 줄은 캐시 결과를 재사용합니다.
+새로 생기거나 바뀐 줄만 세로로 이어 붙여(mosaic) OCR 워커에 한 번에 보냅니다.
+- 줄 분할: 배경색(최빈 밝기)과 차이가 나는 픽셀이 있는 행을 잉크 행으로 보고, 짧은 공백은 같은 줄로 병합
+  배경이 칠해진 영역(코드 블록, diff 하이라이트)은 통째로 한 줄이 되므로, 중앙값의 TALL_LINE 배보다 높은 줄은
+  그 영역 자체의 배경색 기준 행 투영으로 다시 나눔. 그래도 높은 줄(이미지 등)은 박스 없이 readtext(검출)로 인식
+- 줄 박스 (OCR_LINE_BOXES=1, 선택): 줄 안의 열 투영으로 글자 구간(x0, x1)을 찾아, mosaic 에는 글자가 있는 부분만 잘라 넣음
+  → 워커는 이 작은 mosaic 만 확대하고 검출(CRAFT) 없이 박스 목록으로 recognize 한 번에 배치 인식
+- 밴드 병렬: mosaic 이 길고 워커가 여러 개면 줄 경계에서 가로 밴드로 나눠(위아래 겹침) 워커 풀에 동시에 보냄
+  겹친 구간의 중복 결과는 중심이 자기 밴드 담당 구간(own)에 있는 것만 남겨 제거
+- 나눠지지 않는 높은 줄은 줄 박스 모드에서도 같은 작업 안의 readtext 조각으로 따로 인식 (박스 하나로 recognize 하지 않음)
+- 캐시: 해시 → 줄 기준 상대 좌표의 OCR 결과와 인식 배율. 바이트 예산을 넘으면 오래 안 쓴 것부터 제거 (LRU)
+- 프로필(ocr_profile): 호출마다 배율 / 인식 영역(마지막 줄에서 위로 max_rows) / easyocr 옵션을 바꿀 수 있음
+  캐시 키는 배율·옵션과 무관 (줄 픽셀만) — 결과는 요청 배율로 좌표만 환산해 재사용하고,
+  요청 배율보다 낮은 배율로 인식된 줄은 다시 인식 (reuse=True 면 배율과 상관없이 재사용 → 프로필을 바꿔도 캐시가 그대로)
+- 디스크 캐시(선택): OCR_DISK_CACHE 에 sqlite 경로를 주면 재시작 후에도 재사용
+- 결과 좌표는 기존과 같이 '패널 전체를 scale 배 확대한 이미지' 기준 → format_ocr 임계값 그대로 사용
+"""
+import os
+import json
+import sqlite3
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import numpy as np
+
+INK_DELTA = 48      # 배경과 이만큼 밝기 차이가 나면 글자 픽셀
+LINE_GAP = 3        # 이 이하의 빈 행은 같은 줄로 병합 (px)
+LINE_PAD = 3        # 줄 위아래 여유 (px)
+SEGMENT_GAP = 24    # 줄 안에서 이보다 넓은 빈 열이면 다른 글자 구간 (단어 간격보다 충분히 넓게, px)
+SEGMENT_PAD = 4     # 글자 구간 좌우 여유 (px)
+TALL_LINE = 2.0     # 줄 높이 중앙값의 이 배수보다 높으면 '높은 줄' (다시 나누거나 readtext)
+LINE_HEIGHT = 24    # 줄이 적어 중앙값을 믿기 어려울 때(3줄 미만) 쓰는 기준 줄 높이 (px)
+MOSAIC_GAP = 12     # readtext(검출) mosaic 에서 줄 사이 간격 (px, 원본 기준)
+# 1 이면 줄 박스 recognize (검출 생략, 선택 사항). 기본은 mosaic 전체를 readtext (검출 포함) —
+# 줄 박스 경로의 정확도(CER)를 ocr_tuner.py bench 로 기존 2.0x 와 비교해 기록하기 전까지는 opt-in
+LINE_BOXES = os.getenv("OCR_LINE_BOXES", "0") == "1"
+BAND_MIN_HEIGHT = 480   # mosaic 이 이보다 낮으면 나누지 않음 (px, 원본 기준)
+BAND_OVERLAP = 32       # 밴드 위아래 겹침 (px) — 줄 경계에서 자르지 못한 경우 잘린 줄을 양쪽이 온전히 보도록
+CACHE_BYTES = int(os.getenv("OCR_CACHE_BYTES", str(4 * 1024 * 1024)))
+DISK_CACHE = os.getenv("OCR_DISK_CACHE", "")
+
+
+def background_level(gray: np.ndarray) -> int:
+    """가장 흔한 밝기값 (테마 배경색)"""
+    return int(np.bincount(gray.ravel(), minlength=256).argmax())
+
+
+def _row_runs(ink: np.ndarray) -> list:
+    """행별 잉크 여부 → 줄 [(y0, y1), ...] (짧은 공백 병합, 위아래 LINE_PAD)"""
+    edges = np.diff(np.concatenate(([0], ink.astype(np.int8), [0])))
+    starts, ends = np.nonzero(edges == 1)[0], np.nonzero(edges == -1)[0]
+    if len(starts) == 0: return []
+    keep = np.concatenate(([True], starts[1:] - ends[:-1] > LINE_GAP))   # 짧은 공백 병합
+    starts, ends = starts[keep], np.concatenate((ends[np.nonzero(keep)[0][1:] - 1], ends[-1:]))
+    h = len(ink)
+    return [(max(0, int(a) - LINE_PAD), min(h, int(b) + LINE_PAD)) for a, b in zip(starts, ends)]
+
+
+def line_height(strips: list) -> float:
+    """줄 높이 기준값 (중앙값, 줄이 3개 미만이면 LINE_HEIGHT)"""
+    if len(strips) < 3: return float(LINE_HEIGHT)
+    return float(np.median([y1 - y0 for y0, y1 in strips]))
+
+
+def is_tall(strip: tuple, height: float) -> bool:
+    return strip[1] - strip[0] > TALL_LINE * height
+
+
+def line_strips(gray: np.ndarray, bg: int = None) -> list:
+    """흑백 패널 → 글자 줄 [(y0, y1), ...] (위→아래)
+    높은 줄은 그 안의 배경색(칠해진 영역 색) 기준으로 다시 투영해 나눔 — 패널 배경과 영역 배경 둘 다와 다른 픽셀만 글자"""
+    if bg is None: bg = background_level(gray)
+    diff = np.abs(gray.astype(np.int16) - bg) > INK_DELTA
+    strips = _row_runs(diff.any(axis=1))
+    height = line_height(strips)
+    out = []
+    for y0, y1 in strips:
+        if is_tall((y0, y1), height):
+            fill = background_level(gray[y0:y1])
+            if fill != bg:
+                inner = _row_runs((diff[y0:y1] & (np.abs(gray[y0:y1].astype(np.int16) - fill) > INK_DELTA)).any(axis=1))
+                if inner:
+                    out += [(y0 + a, y0 + b) for a, b in inner]
+                    continue
+        out.append((y0, y1))
+    return out
+
+
+def line_segments(gray: np.ndarray, bg: int) -> list:
+    """한 줄(strip) 안의 글자 구간 [(x0, x1), ...] — 열 투영에서 SEGMENT_GAP 보다 넓은 공백으로 나눔"""
+    ink = (np.abs(gray.astype(np.int16) - bg) > INK_DELTA).any(axis=0)
+    cols = np.nonzero(ink)[0]
+    if len(cols) == 0: return []
+    cut = np.nonzero(np.diff(cols) > SEGMENT_GAP)[0]
+    starts, ends = cols[np.concatenate(([0], cut + 1))], cols[np.concatenate((cut, [len(cols) - 1]))] + 1
+    w = gray.shape[1]
+    return [(max(0, int(a) - SEGMENT_PAD), min(w, int(b) + SEGMENT_PAD)) for a, b in zip(starts, ends)]
+
+
+def build_mosaic(rgb: np.ndarray, gray: np.ndarray, strips: list, bg: int, boxes: bool = LINE_BOXES):
+    """줄들을 세로로 이어 붙인 mosaic → (mosaic, placements[(y_off, x_off)], horizontal_list)
+    boxes=True: 줄마다 글자 구간만 잘라 왼쪽 정렬, horizontal_list 는 mosaic 좌표의 [x_min, x_max, y_min, y_max]
+    boxes=False: 줄 전체 폭 그대로 (horizontal_list 는 빈 목록)"""
+    crops, placements, horizontal, y = [], [], [], 0
+    gap = 0 if boxes else MOSAIC_GAP   # 박스를 직접 주면 검출이 없으므로 줄 사이 간격이 필요 없음
+    for n, (y0, y1) in enumerate(strips):
+        if n: y += gap
+        x0, x1 = 0, rgb.shape[1]
+        if boxes:
+            segs = line_segments(gray[y0:y1], bg)
+            if segs:
+                x0, x1 = segs[0][0], segs[-1][1]
+                horizontal += [[a - x0, b - x0, y, y + (y1 - y0)] for a, b in segs]
+        crops.append(rgb[y0:y1, x0:x1])
+        placements.append((y, x0))
+        y += y1 - y0
+    mosaic = np.full((max(1, y), max(c.shape[1] for c in crops), 3), bg, np.uint8)
+    for (y_off, _), crop in zip(placements, crops):
+        mosaic[y_off:y_off + crop.shape[0], :crop.shape[1]] = crop
+    return mosaic, placements, horizontal
+
+
+def plan_bands(spans: list, height: int, count: int, overlap: int = BAND_OVERLAP) -> list:
+    """높이 height 의 이미지를 count 개 가로 밴드로 → [(y0, y1, own0, own1), ...]
+    경계는 가능한 한 줄(spans) 사이 공백의 가운데로 맞추고, 가까운 공백이 없으면 이상적인 위치에서 자름
+    own 구간들은 이미지를 겹침 없이 나누고, 밴드 자체는 위아래로 overlap 만큼 더 봄"""
+    count = max(1, min(count, height // max(1, overlap * 2)))
+    gaps = [(a[1] + b[0]) // 2 for a, b in zip(spans, spans[1:])]
+    cuts = [0]
+    for k in range(1, count):
+        ideal = height * k // count
+        near = min(gaps, key=lambda g: abs(g - ideal), default=None)
+        cut = near if near is not None and abs(near - ideal) <= height // (2 * count) else ideal
+        if cut > cuts[-1]: cuts.append(cut)
+    cuts.append(height)
+    return [(max(0, a - overlap), min(height, b + overlap), a, b) for a, b in zip(cuts, cuts[1:]) if b > a]
+
+
+def band_parts(mosaic: np.ndarray, horizontal: list, spans: list, count: int, boxes: bool) -> list:
+    """mosaic → 밴드별 작업 [(이미지, kwargs, y0, own0, own1)] — spans: mosaic 안의 줄 위치 [(y0, y1)]
+    boxes=True: 줄 박스를 중심 기준으로 밴드에 배정하고 밴드 높이를 배정된 박스가 다 들어가게 넓힘 (중복 인식 없음)"""
+    bands = plan_bands(spans, mosaic.shape[0], count)
+    parts = []
+    for y0, y1, own0, own1 in bands:
+        if boxes:
+            mine = [b for b in horizontal if own0 <= (b[2] + b[3]) / 2 < own1]
+            if not mine: continue
+            y0, y1 = min(own0, min(b[2] for b in mine)), max(own1, max(b[3] for b in mine))
+            kwargs = {"horizontal_list": [[b[0], b[1], b[2] - y0, b[3] - y0] for b in mine]}
+        else:
+            kwargs = {}
+        parts.append((mosaic[y0:y1], kwargs, y0, own0, own1))
+    return parts
+
+
+def merge_bands(results: list, parts: list, scale: float) -> list:
+    """밴드별 결과 → mosaic 좌표로 옮기고 겹친 구간 중복 제거 (결과 중심이 밴드 own 구간에 있는 것만)"""
+    merged = []
+    for items, (_, _, y0, own0, own1) in zip(results, parts):
+        for bbox, text, conf in _shift(items, y0 * scale):
+            cy = sum(p[1] for p in bbox) / len(bbox) / scale
+            if own0 <= cy < own1: merged.append((bbox, text, conf))
+    return merged
+
+
+def split_results(items: list, placements: list, scale: float) -> list:
+    """mosaic 인식 결과 → 줄별 결과 목록 (x 는 패널 좌표, y 는 줄 위쪽 기준, 모두 scale 배)"""
+    offsets = [y for y, _ in placements]
+    per_line = [[] for _ in placements]
+    for bbox, text, conf in items:
+        cy = sum(p[1] for p in bbox) / len(bbox) / scale
+        per_line[max(0, int(np.searchsorted(offsets, cy, side="right")) - 1)].append((bbox, text, conf))
+    return [_shift(v, -y * scale, x * scale) for (y, x), v in zip(placements, per_line)]
+
+
+def strip_key(gray: np.ndarray, tag: str = "") -> str:
+    """줄 픽셀 + 크기 → 캐시 키 (배율/옵션은 값 쪽에 기록)"""
+    digest = hashlib.blake2b(np.ascontiguousarray(gray).tobytes(), digest_size=16).hexdigest()
+    return f"{tag}{gray.shape[1]}x{gray.shape[0]}:{digest}"
+
+
+class _DiskCache:
+    def __init__(self, path: str):
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS lines (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._db.commit()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM lines WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, items: dict) -> None:
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO lines (key, value) VALUES (?, ?)",
+                                 [(k, json.dumps(v, ensure_ascii=False)) for k, v in items.items()])
+            self._db.commit()
+
+
+class LineCache:
+    """해시 → 줄 OCR 결과 {"scale": 인식 배율, "lines": [[bbox, text, conf]]} LRU (바이트 예산) + 선택적 디스크 캐시"""
+
+    def __init__(self, budget: int = CACHE_BYTES, disk_path: str = DISK_CACHE):
+        self.budget = budget
+        self._items: OrderedDict = OrderedDict()   # key → (결과, 바이트)
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.disk = _DiskCache(disk_path) if disk_path else None
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evicted": 0}
+
+    def get(self, key: str):
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                self._items.move_to_end(key)
+                self.stats["hits"] += 1
+                return item[0]
+        value = self.disk.get(key) if self.disk else None
+        if value is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["disk_hits"] += 1
+        self._store(key, value)
+        return value
+
+    def _store(self, key: str, value: dict) -> None:
+        size = len(key) + len(json.dumps(value, ensure_ascii=False).encode("utf-8"))
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None: self.bytes -= old[1]
+            self._items[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.budget and len(self._items) > 1:
+                _, (_, freed) = self._items.popitem(last=False)
+                self.bytes -= freed
+                self.stats["evicted"] += 1
+
+    def put(self, items: dict) -> None:
+        for key, value in items.items(): self._store(key, value)
+        if self.disk and items: self.disk.put(items)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+def _shift(results: list, dy: float, dx: float = 0.0) -> list:
+    return [([[x + dx, y + dy] for x, y in bbox], text, conf) for bbox, text, conf in results]
+
+
+def _rescale(results: list, ratio: float) -> list:
+    if ratio == 1.0: return results
+    return [([[x * ratio, y * ratio] for x, y in bbox], text, conf) for bbox, text, conf in results]
+
+
+class IncrementalOcr:
+    """OcrWorker 앞단 — 캐시에 없는 줄만 워커로 보내고 결과를 패널 좌표로 합침"""
+
+    def __init__(self, worker, cache: LineCache = None, scale: float = 2.0, boxes: bool = LINE_BOXES,
+                 bands: int = None):
+        self.worker = worker
+        self.cache = cache or LineCache()
+        self.scale = scale
+        self.boxes = boxes
+        self.bands = bands or getattr(worker, "processes", 1)   # 기본: 워커 프로세스 수만큼
+        self.stats = {"snapshots": 0, "lines": 0, "lines_ocr": 0, "full_hits": 0, "banded": 0, "tall": 0, "upgraded": 0}
+
+    def submit(self, image, key=None, then=None, profile: dict = None, reuse: bool = False) -> Future:
+        """RGB 이미지 → Future[then(결과)] — 결과는 [(bbox, text, conf)] (패널 전체 scale 배 좌표)
+        profile: ocr_profile.PROFILES 항목 (배율 / 인식 영역 / easyocr 옵션), 없으면 self.scale 로 패널 전체
+        reuse: 더 낮은 배율로 인식해 둔 줄도 그대로 사용 (자동 선택용 — 프로필 전환 시 다시 인식하지 않음)
+        fut.lines_ocr: 워커로 보낸 줄 수 (0 이면 전부 캐시) / fut.prep_ms: 워커에 보내기 전 줄 분할·해시·조회 시간"""
+        started = time.perf_counter()
+        scale = profile["scale"] if profile else self.scale
+        options = dict(profile["recognize"]) if profile else {}
+        if profile and not self.boxes: options.update(profile["detect"])   # 검출 임계값은 readtext 모드에서만
+        rgb = np.asarray(image)[..., :3]
+        gray = (rgb[..., 0].astype(np.uint16) * 77 + rgb[..., 1].astype(np.uint16) * 150
+                + rgb[..., 2].astype(np.uint16) * 29 >> 8).astype(np.uint8)
+        bg = background_level(gray)
+        strips = line_strips(gray, bg)
+        if profile and profile["max_rows"] is not None and strips:   # 마지막 줄에서 위로 max_rows 만 (잘린 줄은 제외)
+            top = strips[-1][1] - profile["max_rows"]
+            strips = [(y0, y1) for y0, y1 in strips if y0 >= top]
+        keys = [strip_key(gray[y0:y1], "box:" if self.boxes else "") for y0, y1 in strips]
+        cached = []
+        for k in keys:   # 요청 배율로 좌표 환산, 낮은 배율 결과는 reuse 일 때만
+            value = self.cache.get(k)
+            ok = value is not None and (reuse or value["scale"] >= scale)
+            if value is not None and not ok: self.stats["upgraded"] += 1
+            cached.append(_rescale(value["lines"], scale / value["scale"]) if ok else None)
+        missing = [i for i, c in enumerate(cached) if c is None]
+        self.stats["snapshots"] += 1
+        self.stats["lines"] += len(strips)
+        self.stats["lines_ocr"] += len(missing)
+
+        def assemble(found: dict) -> list:
+            results = []
+            for i, (y0, _) in enumerate(strips):
+                results += _shift(found[i] if i in found else cached[i], y0 * scale)
+            return then(results) if then else results
+
+        if not missing:
+            self.stats["full_hits"] += 1
+            fut = Future()
+            try: fut.set_result(assemble({}))
+            except Exception as e: fut.set_exception(e)
+            fut.lines_ocr = 0
+            fut.prep_ms = (time.perf_counter() - started) * 1000
+            return fut
+
+        # 캐시에 없는 줄만 이어 붙여 한 번에 인식 (줄 박스 모드면 검출 없이 recognize)
+        # 줄 박스 모드의 높은 줄은 박스 하나로 인식하면 여러 줄이 뭉개지므로 따로 모아 readtext 조각으로
+        height = line_height(strips)
+        tall = [i for i in missing if self.boxes and is_tall(strips[i], height)]
+        regular = [i for i in missing if i not in tall]
+        parts, merge, tall_placements = [], None, None
+        if regular:
+            lines = [strips[i] for i in regular]
+            mosaic, placements, horizontal = build_mosaic(rgb, gray, lines, bg, self.boxes)
+            if self.bands > 1 and mosaic.shape[0] >= BAND_MIN_HEIGHT:
+                spans = [(y, y + (y1 - y0)) for (y, _), (y0, y1) in zip(placements, lines)]
+                bands = band_parts(mosaic, horizontal, spans, self.bands, self.boxes)
+                self.stats["banded"] += 1
+                parts = [(img, dict(options, **kw)) for img, kw, *_ in bands]
+                merge = lambda results: merge_bands(results, bands, scale)
+            else:
+                parts = [(mosaic, dict(options, horizontal_list=horizontal) if self.boxes else options)]
+                merge = lambda results: results[0]
+        if tall:
+            mosaic, tall_placements, _ = build_mosaic(rgb, gray, [strips[i] for i in tall], bg, boxes=False)
+            parts.append((mosaic, dict(options, **(profile["detect"] if profile else {})), "readtext"))
+            self.stats["tall"] += len(tall)
+        prep_ms = (time.perf_counter() - started) * 1000
+
+        def split(results: list) -> list:
+            """조각별 결과 → 줄별로 나눠 캐시에 저장 후 합침"""
+            found = {}
+            if regular: found.update(zip(regular, split_results(merge(results[:len(results) - bool(tall)]), placements, scale)))
+            if tall: found.update(zip(tall, split_results(results[-1], tall_placements, scale)))
+            self.cache.put({keys[i]: {"scale": scale, "lines": [[b, t, c] for b, t, c in v]} for i, v in found.items()})
+            return assemble(found)
+
+        fut = self.worker.submit_many(parts, key, "recognize" if self.boxes else "readtext", scale, split)
+        fut.lines_ocr = len(missing)
+        fut.prep_ms = prep_ms
+        return fut
@@ -0,0 +1,130 @@
+"""
+ocr_profile.py — OCR 프로필 (fast / balanced / accurate) + 지연 시간 예산 기반 자동 선택
+프로필마다 확대 배율, 검출 임계값, 인식 옵션, 인식 영역 크기(마지막 줄에서 위로 몇 px), 최소 신뢰도를 정합니다.
+- accurate: 기존 설정 그대로 (2.0배, 패널 전체, conf 0.20) — 수동 /ocr, RPC 요청
+- balanced / fast: 배율을 낮추고 최신 메시지(마지막 줄) 쪽 일부만 인식, 검출 임계값을 높여 약한 영역은 건너뜀
+- 자동 알림: 예상 시간 = 준비 시간(줄 분할·해시, 공통 EWMA) + (프로필별 줄 하나당 시간 EWMA) x (스냅샷당 새 줄 수 EWMA) 로 보고, 예산 안에 끝날
+  것으로 예상되는 가장 정확한 프로필을 고름 (아무것도 안 맞으면 fast). 줄 캐시 때문에 워커로 가는 건 새 줄뿐이라
+  완료 시간 자체보다 줄당 시간이 프로필 비교에 맞음. 측정이 없는 프로필은 측정된 줄당 시간을 배율^2 비율로 환산하고,
+  건너뛰던 더 정확한 프로필도 PROBE_EVERY 회마다 한 번 다시 측정
+- 자동 선택은 줄 캐시를 배율과 상관없이 재사용(reuse) — 프로필을 바꾸거나 한 번 측정해 봐도 이미 읽은 줄은 다시
+  인식하지 않으므로 전환 비용이 새 줄뿐. 수동 지정(profile=...)은 그 배율보다 낮게 읽힌 줄을 다시 인식
+- 자동 선택 상태(last)와 통계는 자동 제출만 반영 — 수동 /ocr(accurate) 호출은 last_manual 에만 기록
+- 결과 Future 에는 사용한 프로필 이름(fut.profile)이 붙고, then(결과, 프로필) 로 후처리
+"""
+import os
+import time
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+
+ORDER = ("fast", "balanced", "accurate")   # 빠른 것 → 정확한 것
+PROFILES = {
+    # detect: readtext(검출 포함) 모드에서만 쓰는 CRAFT 임계값 / recognize: 두 모드 공통 인식 옵션
+    # max_rows: 마지막 글자 줄에서 위로 이만큼만 인식 (px, 원본 기준, None 이면 전체)
+    "fast":     {"scale": 1.0, "max_rows": 900, "min_conf": 0.35,
+                 "detect": {"text_threshold": 0.8, "low_text": 0.5}, "recognize": {"contrast_ths": 0.0}},
+    "balanced": {"scale": 1.5, "max_rows": 1600, "min_conf": 0.25,
+                 "detect": {"text_threshold": 0.7, "low_text": 0.4}, "recognize": {}},
+    "accurate": {"scale": 2.0, "max_rows": None, "min_conf": 0.20,
+                 "detect": {}, "recognize": {}},
+}
+for _name, _profile in PROFILES.items(): _profile["name"] = _name
+
+AUTO_BUDGET_MS = float(os.getenv("OCR_AUTO_BUDGET_MS", "4000"))   # 자동 알림 OCR 목표 시간 (ms)
+EWMA_ALPHA = 0.3     # 새 측정값 반영 비율
+PRIOR_LINE_MS = 150.0   # 측정값이 하나도 없을 때 1.0배 프로필의 줄당 시간 가정 (ms)
+PRIOR_LINES = 5.0       # 측정값이 없을 때 스냅샷당 새 줄 수 가정
+PROBE_EVERY = 20        # 더 정확한 프로필을 이만큼 연속으로 건너뛰면 한 번 다시 시도 (예상치 갱신)
+UPGRADE_MARGIN = 0.8    # 직전보다 정확한 프로필로 올릴 때는 예산의 이 비율 안에 들어와야 함 (예산 근처에서 왔다갔다 방지)
+
+
+class LatencyModel:
+    """준비 시간 EWMA + 줄당 시간 EWMA (프로필별, ms) x 새 줄 수 EWMA (공통) — 측정이 없는 프로필은 배율^2 비율로 환산
+    준비 시간은 배율과 무관하므로 따로 학습 (줄당 시간에 섞이면 배율^2 환산이 부풀려짐)"""
+
+    def __init__(self, alpha: float = EWMA_ALPHA):
+        self.alpha = alpha
+        self.line_ms: dict = {}   # 이름 → 줄당 ms (워커 시간만)
+        self.lines = None         # 스냅샷당 새 줄 수
+        self.prep_ms = 0.0        # 줄 분할·해시·조회
+        self._lock = threading.Lock()
+
+    def _blend(self, old, new):
+        return new if old is None else old + self.alpha * (new - old)
+
+    def observe(self, name: str, ms: float, lines: int, prep_ms: float = 0.0, auto: bool = True) -> None:
+        """ms: 전체 완료 시간 (prep_ms 포함)
+        auto=False: 수동 요청 (낮은 배율 줄을 다시 읽어 줄 수가 많음) — 줄 수 통계에는 넣지 않음"""
+        with self._lock:
+            self.prep_ms = self._blend(self.prep_ms or None, prep_ms)
+            self.line_ms[name] = self._blend(self.line_ms.get(name), max(0.0, ms - prep_ms) / lines)
+            if auto: self.lines = self._blend(self.lines, lines)
+
+    def predict(self, name: str) -> float:
+        scale = PROFILES[name]["scale"]
+        with self._lock:
+            lines = PRIOR_LINES if self.lines is None else self.lines
+            if name in self.line_ms: return self.prep_ms + self.line_ms[name] * lines
+            if not self.line_ms: return PRIOR_LINE_MS * scale ** 2 * lines
+            return self.prep_ms + lines * sum(ms * (scale / PROFILES[other]["scale"]) ** 2
+                                              for other, ms in self.line_ms.items()) / len(self.line_ms)
+
+
+class AdaptiveOcr:
+    """IncrementalOcr 앞단 — 프로필을 지정하거나 예산(ms)으로 고르고, 완료 시간을 학습"""
+
+    def __init__(self, ocr, budget_ms: float = AUTO_BUDGET_MS, model: LatencyModel = None):
+        self.ocr = ocr
+        self.budget_ms = budget_ms
+        self.model = model or LatencyModel()
+        self.last = None          # 자동 선택이 최근 고른 프로필 이름
+        self.last_manual = None   # 최근 수동 지정 프로필 이름
+        self.stats = {name: 0 for name in ORDER}   # 자동 선택 횟수
+        self.manual = {name: 0 for name in ORDER}
+        self._skipped = 0
+
+    def choose(self, budget_ms: float = None) -> str:
+        """예산 안에 끝날 것으로 예상되는 가장 정확한 프로필 (없으면 가장 빠른 것)"""
+        budget = self.budget_ms if budget_ms is None else budget_ms
+        rank = ORDER.index(self.last) if self.last in ORDER else len(ORDER)
+        fits = [name for i, name in enumerate(ORDER)
+                if self.model.predict(name) <= budget * (UPGRADE_MARGIN if i > rank else 1.0)]
+        name = fits[-1] if fits else ORDER[0]
+        if name == ORDER[-1]:
+            self._skipped = 0
+            return name
+        self._skipped += 1
+        if self._skipped < PROBE_EVERY: return name
+        self._skipped = 0
+        return ORDER[ORDER.index(name) + 1]   # 예상이 낡았을 수 있으니 한 단계 위를 한 번 측정
+
+    def submit(self, image, key=None, then=None, profile: str = None, budget_ms: float = None) -> Future:
+        """profile 을 주면 그대로, 없으면 예산으로 선택 → Future[then(결과, 프로필)] (fut.profile 에 이름)"""
+        auto = profile is None
+        name = self.choose(budget_ms) if auto else profile
+        chosen = PROFILES[name]
+        if auto:
+            self.last = name
+            self.stats[name] += 1
+        else:
+            self.last_manual = name
+            self.manual[name] += 1
+        warm = getattr(self.ocr.worker, "ready", True)   # 모델 로딩 대기 시간은 학습하지 않음
+        started = time.perf_counter()
+        fut = self.ocr.submit(np.asarray(image), key=key, then=(lambda results: then(results, chosen)) if then else None,
+                              profile=chosen, reuse=auto)
+        fut.profile = name
+
+        def learn(f):
+            # 전부 캐시에서 나온 결과(워커 미사용)나 취소/실패는 측정에서 제외
+            if not warm or f.cancelled() or f.exception() is not None or not getattr(f, "lines_ocr", 0): return
+            self.model.observe(name, (time.perf_counter() - started) * 1000, f.lines_ocr, getattr(f, "prep_ms", 0.0), auto)
+
+        fut.add_done_callback(learn)
+        return fut
+
+    def status(self) -> dict:
+        return {"last": self.last, "last_manual": self.last_manual, "budget_ms": self.budget_ms,
+                "expect_ms": {name: round(self.model.predict(name)) for name in ORDER}}
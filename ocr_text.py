@@ -0,0 +1,140 @@
+"""
+ocr_text.py — OCR 결과 후처리 규칙 (교정표 + UI 블랙리스트)
+ocr_corrections.json 의 교정표와 블랙리스트를 정규식 하나씩으로 미리 컴파일해 텍스트를 한 번만 훑습니다.
+- 교정: 단어들을 트라이 형태 정규식으로 묶어 같은 위치에서는 가장 긴 단어가 이김 (leftmost-longest)
+  → 규칙 순서와 무관하고, 이미 교정된 결과를 다시 교정하지 않음 (예: "습I니다" → "습니다")
+- keep: 교정 대상이 아닌 정상 단어 (예: "Antigravity" 안의 "Antigrav" 를 다시 늘리지 않도록)
+- 블랙리스트: 대소문자 무시 정규식 한 번 search
+- 파일이 바뀌면 자동으로 다시 로드 (mtime 확인은 RELOAD_CHECK 초에 한 번)
+- 리포트 조립: OCR 결과 [(bbox, text, conf)] → 블랙리스트 제거 + 줄 병합 + 교정 (Brain / ocr_tuner 공용)
+"""
+import os
+import re
+import json
+import time
+import threading
+
+from ocr_profile import PROFILES
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RULES_PATH = os.getenv("OCR_CORRECTIONS", os.path.join(BASE_DIR, "ocr_corrections.json"))
+RELOAD_CHECK = 5.0   # 규칙 파일 변경 확인 주기 (초)
+
+
+def trie_pattern(words) -> str:
+    """단어 목록 → 트라이 정규식 (공통 접두사 공유, 같은 시작 위치에서 가장 긴 단어 우선)"""
+    trie = {}
+    for word in words:
+        if not word: continue
+        node = trie
+        for ch in word: node = node.setdefault(ch, {})
+        node[""] = True
+
+    def emit(node) -> str:
+        end = "" in node
+        branches = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not branches: return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if end:   # 여기서 끝나는 단어도 있음 → 더 긴 쪽을 먼저 시도 (greedy ?)
+            return (body if len(branches) == 1 and len(body) == 1 else "(?:" + body + ")") + "?"
+        return body
+
+    return emit(trie)
+
+
+class TextRules:
+    def __init__(self, corrections: dict = None, blacklist=(), keep=()):
+        self.corrections = dict(corrections or {})
+        self.blacklist = list(blacklist)
+        self.keep = list(keep)
+        table = dict({w: w for w in self.keep}, **self.corrections)
+        self._table = table
+        self._fix = re.compile(trie_pattern(table)) if table else None
+        self._block = re.compile(trie_pattern(self.blacklist), re.IGNORECASE) if self.blacklist else None
+
+    def correct(self, text: str) -> str:
+        """교정표를 한 번의 훑기로 적용"""
+        if self._fix is None: return text
+        return self._fix.sub(lambda m: self._table[m.group(0)], text)
+
+    def blocked(self, text: str) -> bool:
+        """블랙리스트 UI 문구가 포함돼 있으면 True (대소문자 무시)"""
+        return self._block is not None and self._block.search(text) is not None
+
+
+def load_rules(path: str = RULES_PATH) -> TextRules:
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    return TextRules(data.get("corrections"), data.get("blacklist", ()), data.get("keep", ()))
+
+
+class RuleFile:
+    """규칙 파일 핸들 — current() 가 파일 변경 시 다시 컴파일한 TextRules 를 돌려줌"""
+
+    def __init__(self, path: str = RULES_PATH):
+        self.path = path
+        self._rules = TextRules()
+        self._mtime = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def current(self) -> TextRules:
+        now = time.time()
+        if now - self._checked < RELOAD_CHECK: return self._rules
+        with self._lock:
+            self._checked = now
+            try:
+                mtime = os.path.getmtime(self.path)
+                if mtime != self._mtime:
+                    self._rules, self._mtime = load_rules(self.path), mtime
+            except (OSError, ValueError) as e:   # 파일 없음 / 저장 도중 → 이전 규칙 유지
+                if self._mtime is not None: print(f"[!] OCR 규칙 다시 읽기 실패 (이전 규칙 유지): {e}")
+        return self._rules
+
+    def correct(self, text: str) -> str:
+        return self.current().correct(text)
+
+    def blocked(self, text: str) -> bool:
+        return self.current().blocked(text)
+
+
+rules = RuleFile()
+
+
+# ── 리포트 조립 ──────────────────────────────────────────────────────────────
+
+def join_lines(results, profile=PROFILES["accurate"], rule=rules) -> str:
+    """OCR 결과 [(bbox, text, conf)] → 블랙리스트를 뺀 블록을 줄 단위로 병합한 텍스트 (교정 전)
+    profile: 결과를 만든 OCR 프로필 — 신뢰도 하한 / 줄 병합 임계값(배율 비례)"""
+    # 유효한 텍스트 필터링
+    valid_blocks = []
+    for (bbox, text, conf) in results:
+        text = text.strip()
+        if len(text) < 1 or conf < profile["min_conf"]: continue
+        if rule.blocked(text): continue
+        valid_blocks.append({'y': bbox[0][1], 'x': bbox[0][0], 'text': text})
+    if not valid_blocks: return ""
+
+    # 스마트 문장 병합 (원본 15px = 2.0배 확대 기준 30px, 프로필 배율에 비례)
+    valid_blocks.sort(key=lambda b: b['y'])
+    lines = []
+    current_line = valid_blocks[0]['text']
+    last_y = valid_blocks[0]['y']
+    threshold = 15 * profile["scale"]
+    for block in valid_blocks[1:]:
+        if block['y'] - last_y > threshold:
+            lines.append(current_line)
+            current_line = block['text']
+        else:
+            current_line += " " + block['text']
+        last_y = block['y']
+    lines.append(current_line)
+    return "\n".join(lines)
+
+
+def format_ocr(results, profile=PROFILES["accurate"]) -> str:
+    """OCR 결과 → 블랙리스트 제거 + 줄 병합 + 교정된 리포트 텍스트 (머리말에 프로필 태그)"""
+    text = join_lines(results, profile)
+    if not text: return ""
+    corrected_text = rules.correct(text)
+    return f"📖 **Full Text OCR 전문 (AI 교정 · {profile['name']}):**\n\n{corrected_text.strip()[:2000]}"
@@ -1,16 +1,27 @@
+"""
+ocr_tuner.py — OCR 설정 튜닝 / 비교 / 오프라인 벤치마크
+- python ocr_tuner.py                       : 실행 중인 VS Code 채팅 패널로 확대/이진화 조합 비교 (Windows)
+- python ocr_tuner.py compare [png] [워커 수] : 기존 방식 vs 줄 박스 vs 밴드 병렬
+- python ocr_tuner.py bench <폴더> [옵션]     : 화면 없이 캡처 PNG + 정답 .txt 로 설정 조합별 CER / 지연 / 메모리
+easyocr 와 agent_brain(pyautogui, win32)은 필요한 명령에서만 임포트 — bench 는 Linux 헤드리스에서도 실행됨
+"""
 import os
 import sys
 import time
+import json
+import argparse
+import itertools
+import tracemalloc
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
-import easyocr
-import cv2
 
 # 프로젝트 경로 추가 (agent_brain 임포트용)
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from agent_brain import get_vscode_window_rect, clean_ocr_text, OCR_BLACKLIST
 
 def run_ocr_tuning():
+    import cv2
+    import easyocr
+    from agent_brain import get_vscode_window_rect, clean_ocr_text
     print("🧪 [OCR Tuner] 시스템 시작...")
     
     # 1. 윈도우 찾기 및 캡처
@@ -28,8 +39,8 @@ def run_ocr_tuning():
     chat_w, chat_h = w - 100, h - 65 - 200
     
     print(f"📸 캡처 영역: X={chat_x}, Y={chat_y}, W={chat_w}, H={chat_h}")
-    import pyautogui
-    img_pil = pyautogui.screenshot(region=(chat_x, chat_y, chat_w, chat_h))
+    from capture import screenshot
+    img_pil = screenshot(region=(chat_x, chat_y, chat_w, chat_h))
     
     # 디버그용 원본 저장
     if not os.path.exists(".debug"): os.makedirs(".debug")
@@ -99,5 +110,244 @@ def run_ocr_tuning():
 
     print("\n✅ 튜닝 테스트 완료. '.debug/tuner_target.png'와 'tuner_visualization.png'를 확인하세요.")
 
+def compare_line_boxes(image_path=None, processes=None):
+    """python ocr_tuner.py compare [이미지.png] [워커 수]
+    기존 방식(패널 전체 2.0x 확대 + readtext)과 줄 박스 방식(글자 구간만 2.0x 확대 + recognize 배치)을 비교
+    워커 수 ≥ 2 면 같은 줄 박스 방식을 밴드로 나눠 워커 프로세스 풀에서 병렬 인식한 결과도 비교
+    이미지 옆에 같은 이름의 .txt 정답이 있으면 두 결과의 정답 유사도도 출력"""
+    import difflib
+    import easyocr
+    from ocr_text import format_ocr
+    from ocr_worker import InlineWorker, OcrWorker, OCR_WORKERS, OCR_TIMEOUT
+    from ocr_cache import IncrementalOcr, LineCache
+
+    if image_path:
+        img_pil = Image.open(image_path).convert("RGB")
+    else:
+        from agent_brain import capture_chat_panel
+        img_pil, _ = capture_chat_panel()
+        if img_pil is None:
+            print("❌ VS Code 창을 찾을 수 없습니다.")
+            return
+    rgb = np.array(img_pil)
+    truth = None
+    if image_path and os.path.exists(os.path.splitext(image_path)[0] + ".txt"):
+        with open(os.path.splitext(image_path)[0] + ".txt", encoding="utf-8") as f: truth = f.read()
+
+    print("[*] EasyOCR 로드 중...")
+    inline = InlineWorker(easyocr.Reader(['ko', 'en']))
+    inline.submit(rgb[:64], scale=2.0)   # 첫 호출 워밍업 (모델 초기화 시간 제외)
+    runs = {
+        "기존 2.0x 전체 readtext": lambda: inline.submit(rgb, scale=2.0, then=format_ocr).result(),
+        "줄 박스 2.0x recognize": lambda: IncrementalOcr(inline, LineCache(), scale=2.0, boxes=True)
+                                           .submit(rgb, then=format_ocr).result(),
+    }
+    processes = processes or OCR_WORKERS
+    pool = None
+    if processes > 1:
+        print(f"[*] 워커 {processes}개 시작 (모델 로드)...")
+        pool = OcrWorker(processes=processes)
+        pool.start()
+        pool.wait_ready(OCR_TIMEOUT)
+        pool.submit(rgb[:64], scale=2.0).result(OCR_TIMEOUT)
+        runs[f"줄 박스 + 밴드 병렬 ×{processes}"] = lambda: IncrementalOcr(pool, LineCache(), scale=2.0, boxes=True) \
+            .submit(rgb, then=format_ocr).result(OCR_TIMEOUT)
+    texts = {}
+    for name, fn in runs.items():
+        t0 = time.time()
+        texts[name] = fn()
+        line = f"⏱️ {name:<24} {time.time() - t0:6.2f}s | {len(texts[name]):5d}자"
+        if truth: line += f" | 정답 유사도 {difflib.SequenceMatcher(None, truth, texts[name]).ratio():.3f}"
+        print(line)
+    base = next(iter(texts.values()))
+    for name, text in list(texts.items())[1:]:
+        print(f"🔁 기존 대비 유사도 ({name}): {difflib.SequenceMatcher(None, base, text).ratio():.3f}")
+    if pool: pool.close()
+    for name, text in texts.items():
+        print(f"\n--- {name} ---\n{text[:600]}")
+
+
+# ── 오프라인 벤치마크 (화면 없이 캡처 PNG + 정답 .txt) ─────────────────────────
+
+BENCH_MODES = ("panel", "lines", "boxes")   # panel: 패널 전체 readtext (기존) / lines: 줄 mosaic readtext / boxes: 줄 박스 recognize
+
+
+def edit_distance(a: str, b: str) -> int:
+    """레벤슈타인 거리 (삽입/삭제/치환 1)"""
+    if len(a) < len(b): a, b = b, a
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        prev = cur
+    return prev[-1]
+
+
+def char_error_rate(truth: str, text: str) -> float:
+    """CER = 편집 거리 / 정답 글자 수 — 공백은 한 칸으로 정규화 (줄 병합 차이는 오류로 세지 않음)"""
+    truth, text = " ".join(truth.split()), " ".join(text.split())
+    return edit_distance(truth, text) / max(1, len(truth))
+
+
+def load_dataset(directory: str) -> list:
+    """폴더의 *.png → [(이름, RGB 배열, 정답 또는 None)] — 정답은 같은 이름의 .txt (UTF-8)"""
+    items = []
+    for name in sorted(os.listdir(directory)):
+        if not name.lower().endswith(".png"): continue
+        path = os.path.join(directory, name)
+        truth_path = os.path.splitext(path)[0] + ".txt"
+        truth = None
+        if os.path.exists(truth_path):
+            with open(truth_path, encoding="utf-8") as f: truth = f.read()
+        items.append((name, np.array(Image.open(path).convert("RGB")), truth))
+    return items
+
+
+def sweep_configs(modes=("panel", "boxes"), scales=(1.5, 2.0), binarize=(False,), crops=(None,), profiles=()) -> list:
+    """설정 조합 (모드 x 배율 x 이진화 x 인식 영역) + ocr_profile 의 이름 있는 프로필 → 프로필 형식 dict 목록"""
+    from ocr_profile import PROFILES
+    from ocr_cache import LINE_BOXES
+
+    configs = []
+    for mode, scale, binary, crop in itertools.product(modes, scales, binarize, crops):
+        name = f"{mode} {scale:g}x" + (" bin" if binary else "") + (f" last{crop}" if crop else "")
+        configs.append({"name": name, "mode": mode, "scale": scale, "max_rows": crop, "min_conf": 0.20,
+                        "detect": {}, "recognize": {"binarize": True} if binary else {}})
+    for name in profiles:   # 실제 서비스 설정 그대로 (줄 박스 여부도 LINE_BOXES 따름)
+        configs.append(dict(PROFILES[name], name=f"profile {name}", mode="boxes" if LINE_BOXES else "lines"))
+    return configs
+
+
+def run_config(worker, config: dict, rgb: np.ndarray) -> list:
+    """설정 하나로 이미지 한 장 OCR (캐시 없이) → [(bbox, text, conf)]"""
+    from ocr_cache import IncrementalOcr, LineCache, line_strips, background_level
+
+    if config["mode"] != "panel":
+        ocr = IncrementalOcr(worker, LineCache(budget=0, disk_path=""), boxes=config["mode"] == "boxes", bands=1)
+        return ocr.submit(rgb, profile=config).result()
+    if config["max_rows"] is not None:   # IncrementalOcr 와 같은 규칙: 마지막 줄에서 위로 max_rows (잘린 줄 제외)
+        gray = rgb[..., 1]
+        strips = line_strips(gray, background_level(gray))
+        if strips:
+            top = strips[-1][1] - config["max_rows"]
+            rgb = rgb[min(y0 for y0, _ in strips if y0 >= top):]
+    return worker.submit(rgb, method="readtext", scale=config["scale"],
+                         **dict(config["recognize"], **config["detect"])).result()
+
+
+def _peak_rss_mb():
+    """프로세스 최대 RSS (MB) — 모델 로드와 앞서 실행한 설정이 모두 포함된 누적 최고치라 설정별 값이 아님.
+    resource 가 없는 Windows 에서는 None"""
+    try: import resource
+    except ImportError: return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_benchmark(dataset: list, configs: list, reader=None, repeat: int = 3, memory: bool = True, rule=None,
+                  log=print) -> list:
+    """설정별로 데이터셋 전체를 repeat 번 인식 → 결과 행 목록
+    CER: 교정 후(cer) / 교정 전(cer_raw), 지연: 이미지 한 장당 ms 의 p50 / p95 / 평균 (매번 빈 캐시),
+    메모리: 설정별 tracemalloc 최대치 (파이썬/numpy 할당, 시간 측정과 별도 실행)"""
+    from ocr_worker import InlineWorker
+    from ocr_text import rules, join_lines
+
+    if reader is None:
+        import easyocr
+        log("[*] EasyOCR 로드 중...")
+        reader = easyocr.Reader(['ko', 'en'])
+    rule = rule or rules.current()
+    worker = InlineWorker(reader)
+    worker.submit(dataset[0][1][:64], scale=2.0)   # 첫 호출 워밍업 (모델 초기화 시간 제외)
+    rows = []
+    for config in configs:
+        samples, images = [], {}
+        for name, rgb, truth in dataset:
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                results = run_config(worker, config, rgb)
+                samples.append((time.perf_counter() - t0) * 1000)
+            raw = join_lines(results, config, rule)
+            text = rule.correct(raw)
+            images[name] = {"chars": len(text), "cer": None, "cer_raw": None}
+            if truth is not None:
+                images[name].update(cer=round(char_error_rate(truth, text), 4), cer_raw=round(char_error_rate(truth, raw), 4))
+        peak = None
+        if memory:
+            tracemalloc.start()
+            for _, rgb, _ in dataset: run_config(worker, config, rgb)
+            peak = round(tracemalloc.get_traced_memory()[1] / 1e6, 1)
+            tracemalloc.stop()
+        scored = [v for v in images.values() if v["cer"] is not None]
+        row = {"config": config["name"], "mode": config["mode"], "scale": config["scale"],
+               "binarize": bool(config["recognize"].get("binarize")), "crop": config["max_rows"],
+               "cer": round(sum(v["cer"] for v in scored) / len(scored), 4) if scored else None,
+               "cer_raw": round(sum(v["cer_raw"] for v in scored) / len(scored), 4) if scored else None,
+               "p50_ms": round(float(np.percentile(samples, 50)), 1), "p95_ms": round(float(np.percentile(samples, 95)), 1),
+               "mean_ms": round(float(np.mean(samples)), 1), "peak_mb": peak,
+               "images": images}
+        rows.append(row)
+        log(f"  {row['config']:<26} CER {row['cer'] if row['cer'] is not None else '-'} | p50 {row['p50_ms']:.0f}ms")
+    return rows
+
+
+def print_table(rows: list) -> None:
+    fmt = lambda v, spec: "-" if v is None else format(v, spec)
+    print(f"\n{'설정':<26} {'CER':>7} {'교정전':>7} {'p50 ms':>9} {'p95 ms':>9} {'평균 ms':>9} {'peak MB':>8}")
+    for row in sorted(rows, key=lambda r: (r["cer"] is None, r["cer"] or 0, r["p50_ms"])):
+        print(f"{row['config']:<26} {fmt(row['cer'], '7.2%')} {fmt(row['cer_raw'], '7.2%')} {row['p50_ms']:9.1f} "
+              f"{row['p95_ms']:9.1f} {row['mean_ms']:9.1f} {fmt(row['peak_mb'], '8.1f')}")
+    rss = _peak_rss_mb()
+    if rss is not None: print(f"프로세스 최대 RSS {rss:.1f} MB (모델 + 모든 설정 누적 — 설정별 비교에는 peak MB 사용)")
+
+
+def bench_main(argv: list) -> None:
+    """python ocr_tuner.py bench <폴더> [--modes panel,boxes] [--scales 1.5,2.0] [--binarize 0,1] [--crops full,900]
+    [--profiles] [--repeat 3] [--no-memory] [--corrections 규칙.json] [--json 결과.json|-]"""
+    from ocr_text import load_rules
+
+    csv = lambda cast: lambda text: tuple(cast(v) for v in text.split(",") if v)
+    parser = argparse.ArgumentParser(prog="ocr_tuner.py bench", description="캡처 PNG + 정답 .txt 로 OCR 설정 비교 (화면 불필요)")
+    parser.add_argument("directory")
+    parser.add_argument("--modes", type=csv(str), default=("panel", "boxes"), help="panel,lines,boxes 중 선택")
+    parser.add_argument("--scales", type=csv(float), default=(1.5, 2.0))
+    parser.add_argument("--binarize", type=csv(lambda v: v == "1"), default=(False,), help="0,1")
+    parser.add_argument("--crops", type=csv(lambda v: None if v == "full" else int(v)), default=(None,),
+                        help="full 또는 마지막 줄에서 위로 px (예: full,900)")
+    parser.add_argument("--profiles", action="store_true", help="ocr_profile 의 fast/balanced/accurate 도 비교")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="tracemalloc 측정 실행 생략")
+    parser.add_argument("--corrections", help="다른 교정표/블랙리스트 JSON 으로 평가 (기본: ocr_corrections.json)")
+    parser.add_argument("--json", help="결과를 JSON 으로 저장 (- 면 표준 출력)")
+    args = parser.parse_args(argv)
+    bad = [m for m in args.modes if m not in BENCH_MODES]
+    if bad: parser.error(f"알 수 없는 모드: {', '.join(bad)}")
+
+    if not os.path.isdir(args.directory): parser.error(f"폴더가 없습니다: {args.directory}")
+    dataset = load_dataset(args.directory)
+    if not dataset: parser.error(f"PNG 가 없습니다: {args.directory}")
+    from ocr_profile import ORDER
+    configs = sweep_configs(args.modes, args.scales, args.binarize, args.crops, ORDER if args.profiles else ())
+    log = (lambda *a: print(*a, file=sys.stderr)) if args.json == "-" else print   # JSON 출력과 진행 표시 분리
+    log(f"[*] 이미지 {len(dataset)}장 (정답 {sum(t is not None for *_, t in dataset)}장) x 설정 {len(configs)}개 x {args.repeat}회")
+    try: import easyocr  # noqa: F401 — 설정 조합을 만든 뒤 모델 로드 전에 확인
+    except ImportError: parser.error("easyocr 가 설치되어 있지 않습니다 (pip install easyocr)")
+    rows = run_benchmark(dataset, configs, repeat=args.repeat, memory=not args.no_memory,
+                         rule=load_rules(args.corrections) if args.corrections else None, log=log)
+    if args.json == "-":
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return
+    print_table(rows)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f: json.dump(rows, f, ensure_ascii=False, indent=2)
+        print(f"\n[*] 저장: {args.json}")
+
+
 if __name__ == "__main__":
-    run_ocr_tuning()
+    if len(sys.argv) > 1 and sys.argv[1] == "compare":
+        compare_line_boxes(sys.argv[2] if len(sys.argv) > 2 else None, int(sys.argv[3]) if len(sys.argv) > 3 else None)
+    elif len(sys.argv) > 1 and sys.argv[1] == "bench":
+        bench_main(sys.argv[2:])
+    else:
+        run_ocr_tuning()
@@ -0,0 +1,301 @@
+"""
+ocr_worker.py — EasyOCR 전용 워커 프로세스 풀
+Brain 시작 시 별도 프로세스에서 easyocr.Reader 를 미리 로드해 두고, 이미지 작업을 큐로 받아 처리합니다.
+- 감시 스레드는 submit() 으로 Future 만 받고 바로 다음 단계(아이콘 클릭 등)로 진행
+- 같은 key 로 새 작업이 들어오면 아직 처리 전인 이전 작업은 취소 (오래된 프레임 OCR 생략)
+  취소 표시는 공유 메모리 플래그 → 어느 워커든 작업을 꺼낼 때 확인하고 건너뜀
+- processes > 1 (OCR_WORKERS, 기본 1) 이면 워커 여러 개가 같은 큐를 나눠 처리 — submit_many() 로 긴 패널을 밴드별로 병렬 인식
+- 확대/흑백 변환 같은 전처리도 워커에서 수행 (Brain 프로세스 CPU 사용 최소화)
+- 워커가 죽으면 대기 중인 Future 는 실패 처리되고 다음 submit() 때 다시 시작
+"""
+import os
+import time
+import queue
+import itertools
+import threading
+import traceback
+import multiprocessing as mp
+from concurrent.futures import Future
+
+import numpy as np
+
+OCR_LANGS = ("ko", "en")
+OCR_TIMEOUT = 120.0   # 동기 호출(result) 최대 대기 (초) — 모델 로딩 시간 포함
+RECOGNIZE_BATCH = 16  # recognize 배치 크기 (줄 박스 여러 개를 한 번에)
+# 워커 프로세스 수 — 기본 1 (모델 한 벌). 프로세스마다 모델을 따로 올리므로(수백 MB) 늘리려면 OCR_WORKERS 로 직접 지정
+# (코어 수에 따른 속도 향상은 아직 측정 전 — python ocr_tuner.py compare <이미지> N 으로 비교)
+OCR_WORKERS = max(1, int(os.getenv("OCR_WORKERS", "1")))
+CANCEL_SLOTS = 4096   # 취소 플래그 링 크기 (job id % CANCEL_SLOTS)
+
+
+# ── 워커 프로세스 ─────────────────────────────────────────────────────────────
+
+def _prepare(image: np.ndarray, scale: float, binarize: bool = False) -> np.ndarray:
+    """RGB 배열 → scale 배 LANCZOS 확대 후 흑백 (기존 get_local_ocr 전처리와 동일)
+    binarize: 확대 후 적응형 이진화 (ocr_tuner 비교용, cv2 필요)"""
+    from PIL import Image
+    img = Image.fromarray(image)
+    if scale != 1.0:
+        img = img.resize((int(img.width * scale), int(img.height * scale)), Image.Resampling.LANCZOS)
+    gray = np.array(img.convert("L"))
+    if binarize:
+        import cv2
+        gray = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
+    return gray
+
+
+def _plain(results: list) -> list:
+    """easyocr 결과의 numpy 값 → 피클/JSON 가능한 기본 타입"""
+    return [([[float(x), float(y)] for x, y in bbox], str(text), float(conf)) for bbox, text, conf in results]
+
+
+def run_job(reader, job: dict) -> list:
+    """작업 하나 실행 (워커 프로세스 / ocr_tuner 공용)
+    recognize: horizontal_list([x_min, x_max, y_min, y_max], 원본 좌표)를 scale 배로 바꿔 검출 없이 배치 인식
+    kwargs 의 binarize 는 전처리 옵션 (easyocr 에 넘기지 않음)"""
+    kwargs = dict(job["kwargs"])
+    img = _prepare(job["image"], job["scale"], kwargs.pop("binarize", False))
+    if job["method"] == "recognize":
+        s = job["scale"]
+        boxes = [[int(round(v * s)) for v in box] for box in kwargs.pop("horizontal_list", [])]
+        if not boxes: return []
+        kwargs.setdefault("batch_size", min(len(boxes), RECOGNIZE_BATCH))
+        return _plain(reader.recognize(img, horizontal_list=boxes, free_list=[], detail=1, paragraph=False, **kwargs))
+    return _plain(reader.readtext(img, **dict({"detail": 1, "paragraph": False}, **kwargs)))
+
+
+def _worker_main(jobs, results, cancelled, langs, threads) -> None:
+    try:
+        import easyocr
+        try:
+            import torch
+            torch.set_num_threads(threads)   # 워커끼리 코어를 나눠 씀 (과다 구독 방지)
+        except ImportError: pass
+        reader = easyocr.Reader(list(langs))
+    except Exception as e:
+        results.put(("error", None, f"{type(e).__name__}: {e}"))
+        return
+    results.put(("ready", None, {"pid": os.getpid()}))
+
+    while True:
+        job = jobs.get()
+        if job is None: return   # 종료 신호
+        if cancelled[job["id"] % CANCEL_SLOTS]:
+            results.put(("cancelled", job["id"], None))
+            continue
+        t0 = time.perf_counter()
+        try: results.put(("done", job["id"], (run_job(reader, job), time.perf_counter() - t0)))
+        except Exception as e: results.put(("failed", job["id"], f"{type(e).__name__}: {e}"))
+
+
+def gather(futures: list, combine) -> Future:
+    """여러 Future 가 모두 끝나면 combine([결과...]) 로 완료되는 Future (하나라도 취소/실패하면 그대로 전파)"""
+    out = Future()
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def done(_):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]: return
+        if any(f.cancelled() for f in futures):
+            out.cancel()
+            return
+        if not out.set_running_or_notify_cancel(): return
+        try: out.set_result(combine([f.result() for f in futures]))
+        except Exception as e: out.set_exception(e)
+
+    if not futures:
+        out.set_result(combine([]))
+    for f in futures: f.add_done_callback(done)
+    return out
+
+
+# ── Brain 쪽 핸들 ─────────────────────────────────────────────────────────────
+
+class OcrWorker:
+    def __init__(self, langs=OCR_LANGS, processes: int = OCR_WORKERS):
+        self.langs = tuple(langs)
+        self.processes = max(1, processes)
+        self._ctx = mp.get_context("spawn")   # torch 스레드가 있는 프로세스를 fork 하지 않음 (Windows 와 동일)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._procs = []
+        self._jobs = self._results = None
+        self._cancelled = None      # 공유 취소 플래그 (start 에서 생성)
+        self._futures: dict = {}    # job id → 조각 Future
+        self._by_key: dict = {}     # key → 최신 작업의 job id 목록
+        self._ready = threading.Event()
+        self.ready_count = 0
+        self.error = None
+        self.started_at = None
+        self.stats = {"submitted": 0, "done": 0, "failed": 0, "cancelled": 0, "last_ms": 0.0}
+
+    def start(self) -> None:
+        """워커 프로세스 시작 (이미 실행 중이면 무시) — 모델 로딩은 워커 안에서 비동기로 진행"""
+        with self._lock:
+            if self._procs and all(p.is_alive() for p in self._procs): return
+            for p in self._procs:
+                if p.is_alive(): p.terminate()
+            self._ready.clear()
+            self.ready_count = 0
+            self.error = None
+            self._jobs, self._results = self._ctx.Queue(), self._ctx.Queue()
+            if self._cancelled is None: self._cancelled = self._ctx.Array("b", CANCEL_SLOTS, lock=False)
+            threads = max(1, (os.cpu_count() or 1) // self.processes)
+            self._procs = [self._ctx.Process(target=_worker_main, name=f"ocr-worker-{i}", daemon=True,
+                                             args=(self._jobs, self._results, self._cancelled, self.langs, threads))
+                           for i in range(self.processes)]
+            for p in self._procs: p.start()
+            self.started_at = time.time()
+            threading.Thread(target=self._listen, args=(self._procs, self._results), daemon=True).start()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout: float = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def submit(self, image, key=None, method: str = "readtext", scale: float = 1.0, then=None, **kwargs) -> Future:
+        """image(RGB 배열 또는 PIL) OCR 작업 → Future
+        key: 같은 key 의 이전 미처리 작업은 취소됨 / then: 결과 리스트를 받아 Future 값을 만드는 후처리 (Brain 쪽에서 실행)
+        method: "readtext" 또는 "recognize" (kwargs 는 easyocr 에 그대로 전달)"""
+        return self.submit_many([(image, kwargs)], key, method, scale,
+                                lambda parts: then(parts[0]) if then else parts[0])
+
+    def submit_many(self, parts: list, key=None, method: str = "readtext", scale: float = 1.0, then=None) -> Future:
+        """[(image, kwargs), ...] 조각들을 워커 풀에 나눠 제출 → then([조각별 결과...]) 의 Future
+        조각을 (image, kwargs, method) 로 주면 그 조각만 다른 method (줄 박스 작업 안의 readtext 조각 등)
+        같은 key 로 다시 제출하면 이전 조각들 중 아직 처리 전인 것은 모두 취소"""
+        if self.error is None: self.start()
+        if self.error is not None:
+            fut = Future()
+            fut.set_exception(RuntimeError(f"OCR 워커 사용 불가: {self.error}"))
+            return fut
+        started = time.perf_counter()
+        ids = [next(self._ids) for _ in parts]
+        pieces = [Future() for _ in parts]
+        with self._lock:
+            if key is not None:
+                for old in self._by_key.get(key, ()):
+                    self._cancelled[old % CANCEL_SLOTS] = 1
+                    if old in self._futures: self._futures[old].cancel()
+                self._by_key[key] = ids
+            for job_id, piece in zip(ids, pieces):
+                self._cancelled[job_id % CANCEL_SLOTS] = 0
+                self._futures[job_id] = piece
+        for job_id, (image, kwargs, *own) in zip(ids, parts):
+            self._jobs.put({"id": job_id, "method": own[0] if own else method, "scale": scale, "kwargs": kwargs,
+                            "image": np.ascontiguousarray(np.asarray(image)[..., :3])})
+        self.stats["submitted"] += len(parts)
+
+        def combine(results):
+            self.stats["last_ms"] = (time.perf_counter() - started) * 1000
+            return then(results) if then else results
+
+        fut = gather(pieces, combine)
+        fut.job_ids = ids
+        return fut
+
+    def cancel(self, fut: Future) -> bool:
+        """처리 전인 작업 취소 (워커도 꺼낼 때 건너뜀)"""
+        ids = getattr(fut, "job_ids", ())
+        with self._lock:
+            for job_id in ids:
+                self._cancelled[job_id % CANCEL_SLOTS] = 1
+                if job_id in self._futures: self._futures[job_id].cancel()
+        return fut.cancel() or fut.cancelled()
+
+    def _listen(self, procs, results) -> None:
+        while True:
+            try: kind, job_id, payload = results.get(timeout=1.0)
+            except queue.Empty:
+                dead = [p for p in procs if not p.is_alive()]
+                if not dead: continue
+                self._fail_all(procs, f"워커 종료 (exit {dead[0].exitcode})")
+                return
+            except (EOFError, OSError):
+                self._fail_all(procs, "결과 큐 닫힘")
+                return
+            if kind == "ready":
+                self.ready_count += 1
+                self._ready.set()
+                print(f"[OCR] 워커 준비 완료 {self.ready_count}/{len(procs)} "
+                      f"(pid {payload['pid']}, {time.time() - self.started_at:.1f}초)")
+                continue
+            if kind == "error":
+                self.error = payload
+                print(f"[!] OCR 워커 시작 실패: {payload}")
+                self._fail_all(procs, payload)
+                return
+            with self._lock:
+                fut = self._futures.pop(job_id, None)
+            if fut is None: continue
+            if kind == "cancelled":
+                self.stats["cancelled"] += 1
+                fut.cancel()
+            elif kind == "failed":
+                self.stats["failed"] += 1
+                if fut.set_running_or_notify_cancel(): fut.set_exception(RuntimeError(payload))
+            elif fut.set_running_or_notify_cancel():   # 이미 취소된(대체된) 작업 결과는 버림
+                items, _ = payload
+                self.stats["done"] += 1
+                try: fut.set_result(items)
+                except Exception as e:
+                    traceback.print_exc()
+                    fut.set_exception(e)
+
+    def _fail_all(self, procs, reason: str) -> None:
+        with self._lock:
+            if procs is self._procs:
+                for p in procs:
+                    if p.is_alive(): p.terminate()
+                self._procs = []
+                self._ready.clear()
+            pending, self._futures, self._by_key = list(self._futures.values()), {}, {}
+        for fut in pending:
+            if fut.set_running_or_notify_cancel(): fut.set_exception(RuntimeError(f"OCR 워커 오류: {reason}"))
+
+    def status(self) -> dict:
+        """/status 표시용 — ready: 모델 로드 완료, loading: 로딩 경과 초, error: 시작 실패 사유"""
+        with self._lock:
+            alive = sum(1 for p in self._procs if p.is_alive())
+            pending = len(self._futures)
+        return {"ready": self.ready, "alive": bool(alive), "workers": f"{self.ready_count}/{len(self._procs) or self.processes}",
+                "error": self.error, "pending": pending,
+                "loading": round(time.time() - self.started_at, 1) if alive and not self.ready else None,
+                "last_ms": round(self.stats["last_ms"], 1)}
+
+    def close(self, timeout: float = 5.0) -> None:
+        with self._lock: procs, self._procs = self._procs, []
+        for _ in procs: self._jobs.put(None)
+        for p in procs:
+            p.join(timeout)
+            if p.is_alive(): p.terminate()
+
+
+class InlineWorker:
+    """호출한 스레드에서 바로 실행하는 OcrWorker 대용 (ocr_tuner 비교/벤치용) — submit 이 반환될 때 Future 도 완료"""
+
+    processes = 1
+
+    def __init__(self, reader):
+        self.reader = reader
+
+    def submit(self, image, key=None, method: str = "readtext", scale: float = 1.0, then=None, **kwargs) -> Future:
+        return self.submit_many([(image, kwargs)], key, method, scale,
+                                lambda parts: then(parts[0]) if then else parts[0])
+
+    def submit_many(self, parts: list, key=None, method: str = "readtext", scale: float = 1.0, then=None) -> Future:
+        fut = Future()
+        try:
+            results = [run_job(self.reader, {"method": own[0] if own else method, "scale": scale, "kwargs": kwargs,
+                                             "image": np.ascontiguousarray(np.asarray(image)[..., :3])})
+                       for image, kwargs, *own in parts]
+            fut.set_result(then(results) if then else results)
+        except Exception as e: fut.set_exception(e)
+        return fut
+
+
+worker = OcrWorker()
@@ -0,0 +1,143 @@
+"""
+outbound_dispatcher.py — Telegram 발신 전용 디스패처
+- 하나의 requests.Session 으로 연결(TLS) 재사용
+- 인접한 짧은 메시지는 4096자 한도 안에서 하나로 병합
+- 한도를 넘는 메시지는 줄/공백 경계에서 분할 — 조각별 전송 진행을 기록해 재시도 때 이미 보낸 조각은 다시 보내지 않음
+- 토큰 버킷으로 채팅별 전송 속도 제한, 429 응답의 retry_after 준수
+"""
+import time
+import threading
+
+import requests
+
+TELEGRAM_API = "https://api.telegram.org"
+MAX_MESSAGE_LEN = 4096
+JOIN_SEP = "\n\n"
+SEND_RATE = 1.0      # 초당 메시지 수 (Telegram 채팅별 권장치)
+SEND_BURST = 3       # 순간 허용량
+LINGER = 0.2         # 깨어난 직후 후속 메시지를 모으기 위한 대기 (초)
+
+
+class TokenBucket:
+    def __init__(self, rate: float = SEND_RATE, capacity: float = SEND_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self) -> None:
+        """토큰 하나를 얻을 때까지 대기"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self.blocked_until - now
+                if wait <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """서버가 retry_after 를 지정하면 그 시간 동안 전송 중지"""
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.tokens = 0
+
+
+def split_message(text: str, limit: int = MAX_MESSAGE_LEN) -> list:
+    """limit 이하 조각으로 분할 (줄바꿈 > 공백 > 강제 순으로 경계 선택)
+    경계 문자는 앞 조각 끝에 남김 → "".join(조각) == text (글자 손실 없음)"""
+    parts = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit) + 1
+        if cut <= limit // 2: cut = text.rfind(" ", 0, limit) + 1
+        if cut <= limit // 2: cut = limit
+        parts.append(text[:cut])
+        text = text[cut:]
+    if text: parts.append(text)
+    return parts
+
+
+def plan_batches(items: list, limit: int = MAX_MESSAGE_LEN) -> list:
+    """[(token, text)] → [(전송할 텍스트, 전송 성공 시 ack 할 token 목록, 조각 정보)]
+    조각 정보: 분할된 메시지면 (token, 조각 번호), 아니면 None"""
+    batches = []
+    buf, tokens = None, []
+    for token, text in items:
+        text = str(text)
+        if len(text) > limit:
+            if buf is not None: batches.append((buf, tokens, None))
+            buf, tokens = None, []
+            pieces = split_message(text, limit)
+            # 마지막 조각이 나간 뒤에 원본 메시지를 ack
+            batches.extend((p, [], (token, i)) for i, p in enumerate(pieces[:-1]))
+            batches.append((pieces[-1], [token], (token, len(pieces) - 1)))
+            continue
+        if buf is not None and len(buf) + len(JOIN_SEP) + len(text) <= limit:
+            buf += JOIN_SEP + text
+            tokens.append(token)
+        else:
+            if buf is not None: batches.append((buf, tokens, None))
+            buf, tokens = text, [token]
+    if buf is not None: batches.append((buf, tokens, None))
+    return batches
+
+
+class OutboundDispatcher:
+    def __init__(self, bot_token: str, chat_id: int, api_base: str = TELEGRAM_API,
+                 rate: float = SEND_RATE, burst: float = SEND_BURST):
+        self.url = f"{api_base}/bot{bot_token}/sendMessage"
+        self.chat_id = chat_id
+        self.session = requests.Session()
+        self.bucket = TokenBucket(rate, burst)
+        self.stats = {"requests": 0, "sent": 0, "rate_limited": 0, "failed": 0, "skipped_pieces": 0}
+        self.pieces_sent: dict = {}   # 분할 메시지 token → 이미 전달한 조각 수 (ack 전 재시도 시 중복 전송 방지)
+
+    def send(self, text: str) -> bool:
+        """True: 전달 완료(또는 재시도해도 소용없는 거부), False: 나중에 재시도"""
+        self.bucket.acquire()
+        self.stats["requests"] += 1
+        try:
+            res = self.session.post(self.url, json={"chat_id": self.chat_id, "text": text}, timeout=10)
+        except requests.RequestException as e:
+            print(f"[!] Outbound 전송 실패, 재시도 예정: {e}")
+            self.stats["failed"] += 1
+            return False
+        if res.status_code == 429:
+            try: retry_after = float(res.json().get("parameters", {}).get("retry_after", 1))
+            except ValueError: retry_after = 1.0
+            print(f"[!] Telegram 속도 제한 — {retry_after:.0f}초 후 재시도")
+            self.bucket.pause(retry_after)
+            self.stats["rate_limited"] += 1
+            return False
+        if res.status_code >= 500:
+            print(f"[!] Outbound 전송 실패 ({res.status_code}), 재시도 예정")
+            self.stats["failed"] += 1
+            return False
+        if res.status_code != 200:
+            print(f"[!] Outbound 메시지 거부됨 ({res.status_code}): {res.text[:200]}")
+        self.stats["sent"] += 1
+        return True
+
+    def dispatch(self, items: list, ack) -> bool:
+        """claim 한 [(token, text)] 를 병합/분할해 전송하고 성공분만 ack(token) 호출.
+        실패 시 즉시 멈추고 False (남은 메시지는 큐에 남아 재전달됨 — 분할 메시지는 보내지 못한 조각부터)"""
+        for text, tokens, piece in plan_batches(items):
+            if piece is not None and piece[1] < self.pieces_sent.get(piece[0], 0):
+                self.stats["skipped_pieces"] += 1
+                continue
+            while not self.send(text):
+                if self.bucket.blocked_until <= time.monotonic(): return False
+            if piece is not None: self.pieces_sent[piece[0]] = piece[1] + 1
+            for token in tokens:
+                ack(token)
+                self.pieces_sent.pop(token, None)
+        return True
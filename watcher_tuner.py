@@ -1,21 +1,37 @@
 import os
 import sys
+import json
 import time
+import tempfile
 import numpy as np
-import pyautogui
 from PIL import Image
 
 # 프로젝트 경로 추가
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from agent_brain import get_vscode_window_rect
+from capture import screenshot, ReplaySource
+from change_detector import ChangeDetector
+
+LEGACY_THRESHOLD = 0.7   # 기존 50x100 썸네일 평균 차이 임계값
+
+
+def legacy_thumb(pixels: np.ndarray) -> np.ndarray:
+    return np.array(Image.fromarray(pixels).resize((50, 100)).convert('L'))
+
+
+def legacy_diff(prev: np.ndarray, curr: np.ndarray) -> float:
+    return float(np.mean(np.abs(curr.astype(float) - prev.astype(float))))
+
 
 def run_watcher_tuner():
+    from agent_brain import get_vscode_window_rect
+
     print("🔬 [Watcher Tuner] 변화 감지 알고리즘 진단 시작...")
-    print("이 도구는 현재 채팅 영역의 변화값(diff)을 실시간으로 추적합니다.")
+    print("이 도구는 현재 채팅 영역의 변화값(diff)과 타일 감지기의 dirty 영역을 실시간으로 추적합니다.")
     print("AI가 답변 중일 때와 멈췄을 때의 값 차이를 확인해보세요.\n")
-    
+
     prev_thumb = None
-    
+    detector = ChangeDetector()
+
     # 디버그용 디렉토리
     if not os.path.exists(".debug"): os.makedirs(".debug")
 
@@ -27,30 +43,33 @@ def run_watcher_tuner():
                     print(f"[{time.strftime('%H:%M:%S')}] ⚠️ VS Code 창 미감지... 대기 중", end="\r")
                     time.sleep(2)
                     continue
-                
+
                 l, t, r, b = rect
                 w, h = r - l, b - t
-                
+
                 # 1. 채팅 영역 정의 (agent_brain과 동일: 우측 50%)
                 chat_x, chat_w = int(l + w * 0.50), int(w * 0.50)
-                
-                # 2. 캡처 및 썸네일 생성
-                current_chat = pyautogui.screenshot(region=(chat_x, t, chat_w, h))
-                curr_thumb = np.array(current_chat.resize((50, 100)).convert('L'))
-                
+
+                # 2. 캡처 → 기존 썸네일 diff 와 타일 해시 dirty 영역 비교
+                current_chat = screenshot(region=(chat_x, t, chat_w, h))
+                pixels = np.asarray(current_chat)
+                curr_thumb = legacy_thumb(pixels)
+                dirty = detector.update(pixels)
+
                 status = "STABLE"
                 diff = 0.0
-                
+
                 if prev_thumb is not None:
-                    diff = np.mean(np.abs(curr_thumb.astype(float) - prev_thumb.astype(float)))
-                    
-                    # 민감도 (0.7)
-                    if diff > 0.7:
+                    diff = legacy_diff(prev_thumb, curr_thumb)
+
+                    if dirty:
                         status = "✨ CHANGING"
                         current_chat.resize((200, 400)).save(".debug/watcher_diff_detect.png")
-                    
-                    print(f"[{time.strftime('%H:%M:%S')}] Diff: {diff:6.2f} | Status: {status}    ", end="\r")
-                
+
+                    area = sum(dw * dh for _, _, dw, dh in dirty)
+                    print(f"[{time.strftime('%H:%M:%S')}] Diff: {diff:6.2f} | Dirty: {len(dirty):2d}개 {area:7d}px "
+                          f"| 깜빡임 무시: {detector.stats['blink_suppressed']} | Status: {status}    ", end="\r")
+
                 # 3. 베이스라인 갱신 (agent_brain의 새로운 로직 반영)
                 # 여기서는 액션이 없지만, 구조를 맞춤
                 prev_thumb = curr_thumb
@@ -58,9 +77,106 @@ def run_watcher_tuner():
             except Exception as loop_e:
                 print(f"\n❌ 루프 에러: {loop_e}")
                 time.sleep(2)
-            
+
     except KeyboardInterrupt:
         print("\n\n✅ 진단 종료.")
 
+
+# ── 리플레이 벤치마크 (정확도 / 지연) ───────────────────────────────────────
+
+def make_synthetic_replay(out_dir: str, count: int = 300, size=(720, 1400), seed: int = 0) -> None:
+    """채팅 화면을 흉내 낸 프레임 시퀀스 + 정답 라벨(changed) 생성
+    이벤트: 변화 없음 / 커서 깜빡임(변화 아님) / 글자 몇 개 추가 / 새 줄 추가"""
+    rng = np.random.default_rng(seed)
+    w, h = size
+    screen = np.full((h, w, 3), 30, np.uint8)
+    cursor = (h - 60, 40)
+    line_y, line_x = 20, 20
+    cursor_on = False
+    frames = []
+    os.makedirs(out_dir, exist_ok=True)
+    for i in range(count):
+        event = rng.choice(["none", "blink", "chars", "line"], p=[0.45, 0.30, 0.15, 0.10]) if i else "none"
+        if event == "blink":
+            cursor_on = not cursor_on
+        elif event == "chars":   # 같은 줄에 글자 2~4개 (7px 폭)
+            n = int(rng.integers(2, 5))
+            if line_x + n * 8 < w - 20:
+                screen[line_y:line_y + 14, line_x:line_x + n * 8 - 1] = rng.integers(150, 230)
+                line_x += n * 8
+            else: event = "none"
+        elif event == "line":
+            line_y += 22
+            if line_y + 14 > h - 100:   # 화면이 가득 차면 위로 밀어냄 (스크롤)
+                screen[20:h - 122] = screen[42:h - 100]
+                screen[h - 122:h - 100] = 30
+                line_y -= 22
+            line_x = 20 + int(rng.integers(0, 5)) * 8
+            width = int(rng.integers(40, w - 60))
+            screen[line_y:line_y + 14, line_x:line_x + width] = rng.integers(150, 230)
+            line_x += width
+        shown = screen.copy()
+        if cursor_on: shown[cursor[0]:cursor[0] + 18, cursor[1]:cursor[1] + 2] = 220
+        name = f"frame_{i:05d}.png"
+        Image.fromarray(shown).save(os.path.join(out_dir, name))
+        frames.append({"file": name, "event": str(event), "changed": bool(event in ("chars", "line"))})
+    with open(os.path.join(out_dir, "frames.json"), "w", encoding="utf-8") as f:
+        json.dump({"origin": [0, 0], "frames": frames}, f, ensure_ascii=False, indent=1)
+
+
+def _score(label: str, predictions: list, truth: list, latencies: list) -> None:
+    lat = sorted(latencies)
+    p = lambda q: lat[min(len(lat) - 1, int(len(lat) * q))]
+    line = f"  {label:<22} p50={p(0.5):7.3f}ms  p95={p(0.95):7.3f}ms"
+    if truth:
+        tp = sum(1 for a, b in zip(predictions, truth) if a and b)
+        fp = sum(1 for a, b in zip(predictions, truth) if a and not b)
+        fn = sum(1 for a, b in zip(predictions, truth) if not a and b)
+        acc = sum(1 for a, b in zip(predictions, truth) if a == b) / len(truth)
+        line += f"  정확도={acc:6.1%}  놓침(FN)={fn:3d}  오탐(FP)={fp:3d}  (TP={tp})"
+    print(line)
+
+
+def run_replay_benchmark(directory: str = None) -> None:
+    """python watcher_tuner.py bench [리플레이 디렉터리]
+    디렉터리를 주지 않으면 합성 시퀀스를 만들어 사용. frames.json 의 'changed' 라벨이 있으면 정확도도 출력"""
+    synthetic = directory is None
+    if synthetic:
+        directory = tempfile.mkdtemp(prefix="watcher_replay_")
+        make_synthetic_replay(directory)
+    source = ReplaySource(directory, preload=True)
+    bounds = source.bounds()
+    # 녹화본이 창 전체라면 agent_brain 과 같은 우측 50% 채팅 영역만 비교
+    region = bounds if synthetic else \
+        (bounds[0] + bounds[2] // 2, bounds[1], bounds[2] - bounds[2] // 2, bounds[3])
+    frames = [source.grab(region) for _ in range(len(source.frames))]
+    truth = [f.get("changed") for f in source.frames[1:]]
+    if any(t is None for t in truth): truth = []
+    print(f"[watcher] 리플레이 {len(frames)}프레임 {region[2]}x{region[3]} ({directory})")
+
+    preds, lat = [], []
+    prev = legacy_thumb(frames[0])
+    for px in frames[1:]:
+        t0 = time.perf_counter()
+        curr = legacy_thumb(px)
+        preds.append(legacy_diff(prev, curr) > LEGACY_THRESHOLD)
+        lat.append((time.perf_counter() - t0) * 1000)
+        prev = curr
+    _score("썸네일 평균 diff", preds, truth, lat)
+
+    detector = ChangeDetector()
+    detector.update(frames[0])
+    preds, lat = [], []
+    for px in frames[1:]:
+        t0 = time.perf_counter()
+        preds.append(bool(detector.update(px)))
+        lat.append((time.perf_counter() - t0) * 1000)
+    _score(f"타일 해시 ({detector.tile}px)", preds, truth, lat)
+    print(f"  깜빡임으로 무시한 타일: {detector.stats['blink_suppressed']}")
+
+
 if __name__ == "__main__":
-    run_watcher_tuner()
+    if len(sys.argv) > 1 and sys.argv[1] == "bench":
+        run_replay_benchmark(sys.argv[2] if len(sys.argv) > 2 else None)
+    else:
+        run_watcher_tuner()
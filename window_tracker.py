@@ -0,0 +1,153 @@
+"""
+window_tracker.py — VS Code(Antigravity) 창 추적기
+매번 EnumWindows 로 모든 최상위 창을 훑고 포커스를 뺏은 뒤 0.5초 쉬는 대신,
+찾은 hwnd 와 rect 를 캐시하고 IsWindow/GetWindowRect 로 싸게 재검증합니다.
+- 창이 닫히면 캐시를 버리고 다시 열거합니다.
+- 이동/크기 변경/닫힘/재발견 시 등록된 리스너에 이벤트를 보냅니다.
+- 포커스는 focus=True 이고 실제로 전면 창이 아닐 때만 가져오며, 그때만 잠시 대기합니다.
+- restore=True 면 최소화된 창을 포커스 없이(SW_SHOWNOACTIVATE) 복원합니다 — 감시 루프용.
+"""
+import time
+import threading
+
+try:
+    import win32gui
+    import win32con
+except ImportError:   # Linux 등 — 창 추적 없이 리플레이/벤치마크만 사용
+    win32gui = win32con = None
+
+WINDOW_CLASS = "Chrome_WidgetWin_1"
+TITLE_KEYWORDS = ("visual studio code", "antigravity", "openclaw")
+BROWSER_SUFFIXES = (" - Chrome", " - Microsoft Edge")
+FOCUS_SETTLE = 0.15     # 포커스를 실제로 옮겼을 때 대기 (초)
+RESTORE_SETTLE = 0.5    # 최소화 복원 애니메이션 대기 (초)
+
+
+def is_vscode_window(hwnd) -> bool:
+    if not win32gui.IsWindowVisible(hwnd): return False
+    if win32gui.GetClassName(hwnd) != WINDOW_CLASS: return False
+    title = win32gui.GetWindowText(hwnd)
+    if not any(k in title.lower() for k in TITLE_KEYWORDS): return False
+    return not any(title.endswith(x) for x in BROWSER_SUFFIXES)
+
+
+def chat_panel_region(rect):
+    """창 좌표에서 채팅 본문 영역 (x, y, w, h) 계산 (Brain 캡처와 봇의 링 버퍼 크롭이 공용)"""
+    l, t, r, b = rect
+    w, h = r - l, b - t
+
+    # 🎯 이미지 캡처 영역 정밀 조절
+    # 1. 좌측 여백 건너뛰기: 오른쪽 35% 영역 중에서도 100px 더 오른쪽에서 시작 (사이드바/라인넘버 제거)
+    chat_x = int(l + w * 0.65) + 100
+    chat_w = int(w * 0.35) - 100
+
+    # 2. 상하단 헤더/푸터 건너뛰기
+    chat_y = t + 65 # 헤더 약 65px 무시
+    chat_h = h - 65 - 200 # 하단 입력창/푸터 약 200px 무시 (더 강화)
+    return chat_x, chat_y, chat_w, chat_h
+
+
+class WindowTracker:
+    def __init__(self, match=is_vscode_window):
+        self.match = match
+        self.hwnd = None
+        self.rect = None
+        self.title = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        self.stats = {"enumerations": 0, "hits": 0, "focus_changes": 0, "restores": 0}
+
+    def add_listener(self, fn) -> None:
+        """fn(event, hwnd, rect) — event: found / moved / resized / closed"""
+        self._listeners.append(fn)
+
+    def _emit(self, event: str) -> None:
+        for fn in self._listeners:
+            try: fn(event, self.hwnd, self.rect)
+            except Exception as e: print(f"[!] window listener 오류: {e}")
+
+    def _enumerate(self):
+        self.stats["enumerations"] += 1
+        found = []
+
+        def callback(hwnd, res):
+            try:
+                if self.match(hwnd): res.append(hwnd)
+            except Exception:
+                pass
+            return True
+
+        win32gui.EnumWindows(callback, found)
+        return found[0] if found else None
+
+    def invalidate(self) -> None:
+        with self._lock:
+            if self.hwnd is not None:
+                self.hwnd = self.rect = self.title = None
+                self._emit("closed")
+
+    def _revalidate(self) -> bool:
+        """캐시된 hwnd 가 아직 유효하면 rect 갱신 후 True"""
+        hwnd = self.hwnd
+        if hwnd is None: return False
+        try:
+            if not (win32gui.IsWindow(hwnd) and win32gui.IsWindowVisible(hwnd)):
+                raise OSError("window gone")
+            rect = win32gui.GetWindowRect(hwnd)
+        except Exception:
+            self.hwnd = self.rect = self.title = None
+            self._emit("closed")
+            return False
+        self.title = win32gui.GetWindowText(hwnd)
+        if win32gui.IsIconic(hwnd): return True   # 최소화 중에는 이전 rect 유지
+        if rect != self.rect:
+            old = self.rect
+            self.rect = rect
+            if old is not None:
+                same_size = (old[2] - old[0], old[3] - old[1]) == (rect[2] - rect[0], rect[3] - rect[1])
+                self._emit("moved" if same_size else "resized")
+        self.stats["hits"] += 1
+        return True
+
+    def _focus(self) -> None:
+        hwnd = self.hwnd
+        iconic = win32gui.IsIconic(hwnd)
+        if not iconic and win32gui.GetForegroundWindow() == hwnd: return
+        win32gui.ShowWindow(hwnd, win32con.SW_RESTORE if iconic else win32con.SW_SHOW)
+        try: win32gui.SetForegroundWindow(hwnd)
+        except Exception: pass
+        self.stats["focus_changes"] += 1
+        time.sleep(RESTORE_SETTLE if iconic else FOCUS_SETTLE)
+        self._revalidate()   # 복원 후 좌표 다시 읽기
+
+    def _restore(self) -> None:
+        """최소화된 창을 활성화하지 않고 복원 (전면 창/키보드 포커스는 그대로)"""
+        win32gui.ShowWindow(self.hwnd, win32con.SW_SHOWNOACTIVATE)
+        self.stats["restores"] += 1
+        time.sleep(RESTORE_SETTLE)
+        self._revalidate()
+
+    def get(self, focus: bool = False, restore: bool = False):
+        """(hwnd, rect, title) — 창이 없으면 (None, None, None)
+        focus=False 이고 최소화 상태면 restore=True 일 때만 포커스 없이 복원, 아니면 (None, None, None)"""
+        if win32gui is None: return None, None, None
+        with self._lock:
+            if not self._revalidate():
+                hwnd = self._enumerate()
+                if hwnd is None: return None, None, None
+                self.hwnd = hwnd
+                self.rect = None
+                self._revalidate()
+                self._emit("found")
+            if focus: self._focus()
+            elif win32gui.IsIconic(self.hwnd):
+                if restore: self._restore()
+                if win32gui.IsIconic(self.hwnd): return None, None, None   # 최소화 상태는 좌표가 무의미
+            return self.hwnd, self.rect, self.title
+
+    def focus(self) -> None:
+        """액션 직전에 호출 — 이미 전면이면 아무것도 하지 않음"""
+        self.get(focus=True)
+
+
+tracker = WindowTracker()